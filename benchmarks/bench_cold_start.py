@@ -0,0 +1,55 @@
+"""统计页面入口的冷启动导入耗时，以及每个页面模块第一次打开时的导入耗时
+
+每次在新的子进程中导入，相当于Streamlit进程第一次运行 warehouse_app.py；
+页面模块的耗时为入口导入完成之后再导入该模块的增量。
+
+用法: python benchmarks/bench_cold_start.py [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行：导入入口，再导入指定的页面模块，输出两段耗时
+_PROBE = """
+import importlib, sys, time
+start = time.perf_counter()
+import warehouse_app
+entry = time.perf_counter() - start
+start = time.perf_counter()
+if len(sys.argv) > 1:
+    importlib.import_module('warehouse_pages.' + sys.argv[1])
+print(entry, time.perf_counter() - start)
+"""
+
+
+def probe(module=None):
+    """在新的子进程中导入入口（和页面模块），返回 (入口耗时, 页面模块耗时)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    args = [sys.executable, '-c', _PROBE] + ([module] if module else [])
+    output = subprocess.run(args, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    entry, page = output.split()[-2:]
+    return float(entry), float(page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from warehouse_pages import PAGES
+
+    entry = [probe()[0] for _ in range(args.repeat)]
+    print(f"{'入口（登录页）':<24} {np.median(entry) * 1000:>9.1f} ms")
+    for (category, option), module in PAGES.items():
+        seconds = [probe(module)[1] for _ in range(args.repeat)]
+        print(f"{category + '/' + option:<24} {np.median(seconds) * 1000:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""统计紧凑类型对各数据表内存占用的影响，以及转换本身的耗时
+
+原始: execute_query 的结果（编号为int64，文本列为Python字符串对象）
+紧凑: compact_frame() 转换后（32位整数、重复文本为分类类型、时间为datetime64）
+
+用法: python benchmarks/bench_compact_frames.py [--size medium]
+"""
+import argparse
+import os
+import time
+
+import sqlite_backend
+from warehouse_core import COMPACT_REPORT_QUERIES, compact_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=list(sqlite_backend.SIZES), default='medium')
+    args = parser.parse_args()
+
+    path = sqlite_backend.create_database()
+    try:
+        sqlite_backend.populate(path, **sqlite_backend.SIZES[args.size])
+        db = sqlite_backend.make_db(path)
+        report = db.memory_report()
+
+        # 转换耗时：只计compact_frame，不含读取
+        seconds = []
+        for table in report['数据表']:
+            frame = db.execute_query(COMPACT_REPORT_QUERIES[table])
+            start = time.perf_counter()
+            compact_frame(frame)
+            seconds.append(time.perf_counter() - start)
+        report['转换(秒)'] = [round(s, 3) for s in seconds]
+        print(report.to_string(index=False))
+        total_before, total_after = report['原始(MB)'].sum(), report['紧凑(MB)'].sum()
+        print(f"合计 {total_before:.1f} MB -> {total_after:.1f} MB（{total_before / total_after:.1f}x）")
+        db.pool.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
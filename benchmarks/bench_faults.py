@@ -0,0 +1,128 @@
+"""数据库故障演练：在本地SQLite数据库上分阶段注入故障，统计读取的延迟、失败次数和返回过期缓存的次数
+
+阶段依次为 正常 -> 故障 -> 恢复。故障阶段默认数据库不可用（新连接等待 --connect-delay 秒后失败），
+也可用 --error-rate 改为随机通信错误、用 --latency 改为慢查询。
+缓存有效期设为1秒，故障阶段读取商品和用户时可以看到熔断后返回的过期缓存。
+
+用法: python benchmarks/bench_faults.py [--threads 16] [--phase 3] [--no-breaker] [--no-retry]
+"""
+import argparse
+import contextlib
+import os
+import threading
+import time
+
+import numpy as np
+
+import sqlite_backend
+import warehouse_core
+
+PHASES = ['正常', '故障', '恢复']
+
+
+def read_once(db, rng):
+    """随机执行一种读取，返回 (读取名称, 结果: 'ok'/'stale'/'failed')"""
+    choice = rng.random()
+    if choice < 0.4:
+        name, result = '商品信息', db.get_products()
+    elif choice < 0.6:
+        name, result = '用户列表', db.get_users()
+    else:
+        name, (result, _) = '入库记录分页', db.get_stock_in_records_page(limit=50)
+    if result is None:
+        return name, 'failed'
+    return name, 'stale' if 'stale_age' in result.attrs else 'ok'
+
+
+def worker(db, seed, state, results):
+    """循环读取直到演练结束，记录 (阶段, 读取名称, 延迟, 结果)"""
+    rng = np.random.default_rng(seed)
+    while not state['done']:
+        phase = state['phase']
+        start = time.perf_counter()
+        name, outcome = read_once(db, rng)
+        results.append((phase, name, time.perf_counter() - start, outcome))
+
+
+def run_drill(db, faults, args):
+    """启动读取线程，依次进入各阶段并注入故障，返回 (读取记录, 各阶段实际秒数)"""
+    state = {'phase': PHASES[0], 'done': False}
+    results, seconds = [], {}
+    threads = [threading.Thread(target=worker, args=(db, seed, state, results)) for seed in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for phase in PHASES:
+        state['phase'] = phase
+        if phase == '故障':
+            if args.error_rate is not None:
+                faults.error_rate = args.error_rate
+            elif args.latency is not None:
+                faults.latency = args.latency
+            else:
+                faults.down = True
+        elif phase == '恢复':
+            faults.down, faults.error_rate, faults.latency = False, 0.0, 0.0
+        started = time.perf_counter()
+        time.sleep(args.phase)
+        seconds[phase] = time.perf_counter() - started
+    state['done'] = True
+    for thread in threads:
+        thread.join()
+    return results, seconds
+
+
+def report(results, seconds):
+    """按阶段输出读取次数、每秒次数、失败与过期缓存次数以及延迟分位数"""
+    print(f"{'阶段':<6} {'次数':>8} {'次/秒':>9} {'失败':>7} {'过期缓存':>8} {'p50(ms)':>9} {'p99(ms)':>9} {'最大(ms)':>9}")
+    for phase in PHASES:
+        rows = [row for row in results if row[0] == phase]
+        if not rows:
+            continue
+        latencies = np.array([row[2] for row in rows]) * 1000
+        failed = sum(1 for row in rows if row[3] == 'failed')
+        stale = sum(1 for row in rows if row[3] == 'stale')
+        print(f"{phase:<6} {len(rows):>8} {len(rows) / seconds[phase]:>9.1f} {failed:>7} {stale:>8} "
+              f"{np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 99):>9.2f} {latencies.max():>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--phase', type=float, default=3.0, help="每个阶段的秒数")
+    parser.add_argument('--connect-delay', type=float, default=0.5, help="数据库不可用时建立连接的等待秒数")
+    parser.add_argument('--error-rate', type=float, default=None, help="故障阶段改为按该比例随机报通信错误")
+    parser.add_argument('--latency', type=float, default=None, help="故障阶段改为每条语句延迟该秒数")
+    parser.add_argument('--timeout', type=int, default=1, help="语句执行超时（秒）")
+    parser.add_argument('--no-breaker', action='store_true', help="关闭熔断")
+    parser.add_argument('--no-retry', action='store_true', help="关闭只读查询的重试")
+    args = parser.parse_args()
+
+    path = sqlite_backend.create_database()
+    try:
+        sqlite_backend.populate(path, **sqlite_backend.SIZES['small'])
+        warehouse_core.DB_QUERY_TIMEOUT = args.timeout  # 新建的本地连接使用该语句超时
+        faults = sqlite_backend.FaultInjector(connect_delay=args.connect_delay, seed=0)
+        breaker = warehouse_core.CircuitBreaker(failure_threshold=0 if args.no_breaker else
+                                                warehouse_core.DB_BREAKER_FAILURES,
+                                                reset_timeout=args.phase / 2)
+        cache = warehouse_core.QueryCache(ttl={}, default_ttl=1)
+        db = sqlite_backend.make_db(path, faults=faults, cache=cache, breaker=breaker)
+        if args.no_retry:
+            db.read_retries = 0
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            # 演练期间每次失败都会打印错误，不输出到终端
+            results, seconds = run_drill(db, faults, args)
+
+        report(results, seconds)
+        print("熔断器:", breaker.stats())
+        print("缓存:", cache.stats())
+        print("连接池:", db.pool.stats())
+        print(f"注入: 建立连接 {faults.connects} 次，执行语句 {faults.statements} 条，故障 {faults.faults} 次")
+        db.pool.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""对比 execute_query 的几种读取方式的吞吐量与峰值内存
+
+fetchall: 原来的 cursor.fetchall() + DataFrame.from_records
+columnar: 现在的 execute_query，fetchmany分批读取并按列构建数组
+stream:   iter_query 按批生成DataFrame，逐批处理不保留全部结果
+
+每种方式在独立的子进程中运行，峰值内存取子进程的最大常驻内存（RSS）增量。
+
+用法: python benchmarks/bench_fetch.py [--rows 1000000] [--batch-size 10000]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+
+import pandas as pd
+
+import sqlite_backend
+
+QUERY = "SELECT * FROM 入库记录"
+
+
+def run_fetchall(db, batch_size):
+    conn = db.pool.acquire()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(QUERY)
+        columns = [column[0] for column in cursor.description]
+        frame = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        cursor.close()
+    finally:
+        db.pool.release(conn)
+    return len(frame)
+
+
+def run_columnar(db, batch_size):
+    db.fetch_batch_size = batch_size
+    return len(db.execute_query(QUERY))
+
+
+def run_stream(db, batch_size):
+    total = 0
+    for chunk in db.iter_query(QUERY, batch_size=batch_size):
+        total += len(chunk)
+    return total
+
+
+MODES = {'fetchall': run_fetchall, 'columnar': run_columnar, 'stream': run_stream}
+
+
+def _max_rss_mb():
+    # Linux下ru_maxrss单位为KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(mode, path, batch_size, results):
+    db = sqlite_backend.make_db(path, max_size=1)
+    baseline = _max_rss_mb()
+    start = time.perf_counter()
+    rows = MODES[mode](db, batch_size)
+    elapsed = time.perf_counter() - start
+    results.put((mode, rows, elapsed, _max_rss_mb() - baseline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    path = sqlite_backend.create_database()
+    try:
+        sqlite_backend.populate(path, stock_in=args.rows)
+        results = multiprocessing.Queue()
+        print(f"{'方式':<10} {'行数':>10} {'耗时(秒)':>10} {'行/秒':>12} {'峰值RSS增量(MB)':>16}")
+        for mode in args.modes:
+            process = multiprocessing.Process(target=_worker, args=(mode, path, args.batch_size, results))
+            process.start()
+            mode, rows, elapsed, rss = results.get()
+            process.join()
+            print(f"{mode:<10} {rows:>10} {elapsed:>10.3f} {rows / elapsed:>12,.0f} {rss:>16.1f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
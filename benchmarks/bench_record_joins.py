@@ -0,0 +1,70 @@
+"""对比入库记录页面两种取数方式的耗时
+
+旧方式：分别读取入库记录、商品信息、用户账户三张整表，在pandas中合并并重命名
+新方式：WarehouseDB.get_stock_in_details() 一条SQL返回连接好的显示列
+
+用法: python benchmarks/bench_record_joins.py [--sizes 10000 100000 1000000] [--repeat 3]
+"""
+import argparse
+import os
+import time
+
+import sqlite_backend
+from warehouse_core import STOCK_IN_COLUMNS
+
+
+def merge_path(db):
+    """页面原来的取数方式"""
+    records = db.execute_query("SELECT * FROM 入库记录")
+    products = db.execute_query("SELECT * FROM 商品信息")
+    users = db.execute_query("SELECT * FROM 用户账户")
+    records = records.merge(products[['商品编号', '商品名称']], on='商品编号', how='left')
+    records = records.merge(users[['用户编号', '用户名']], left_on='操作员编号', right_on='用户编号', how='left')
+    records = records.rename(columns={'用户名': '操作员'})
+    return records[STOCK_IN_COLUMNS]
+
+
+def join_path(db):
+    """由SQL完成连接的取数方式"""
+    return db.get_stock_in_details()
+
+
+def best_of(func, db, repeat):
+    """重复执行取最短耗时"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(db)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'行数':>10} {'合并(秒)':>10} {'SQL连接(秒)':>12} {'加速比':>8}")
+    for size in args.sizes:
+        path = sqlite_backend.create_database()
+        try:
+            sqlite_backend.populate(path, products=max(100, size // 100), stock_in=size)
+            db = sqlite_backend.make_db(path)
+
+            merge_time, merged = best_of(merge_path, db, args.repeat)
+            join_time, joined = best_of(join_path, db, args.repeat)
+
+            # 两种方式应得到相同的结果
+            key = STOCK_IN_COLUMNS[0]
+            assert merged.sort_values(key).reset_index(drop=True).equals(
+                joined.sort_values(key).reset_index(drop=True)), "两种方式的结果不一致"
+
+            print(f"{size:>10} {merge_time:>10.3f} {join_time:>12.3f} {merge_time / join_time:>8.2f}x")
+            db.pool.close()
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""对比库存状态计算与低库存高亮的逐行apply实现和向量化实现
+
+状态: DataFrame.apply(get_stock_status, axis=1) 对比 classify_stock_status()
+高亮: 整表 Styler.apply(highlight_low_stock, axis=1) 渲染为HTML
+      对比 low_stock_mask() 后只渲染当前一页（FRAME_PAGE_SIZE 行）
+
+用法: python benchmarks/bench_stock_status.py [--rows 100000] [--repeat 3]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import sqlite_backend  # noqa: F401  设置导入路径
+from warehouse_core import LOW_STOCK_STYLE, classify_stock_status, low_stock_mask
+from warehouse_pages.components import FRAME_PAGE_SIZE
+
+
+def get_stock_status(row):
+    """原来的逐行实现"""
+    if row['安全库存'] == 0:
+        return "正常"
+    elif row['当前库存量'] > row['安全库存']:
+        return "充足"
+    elif row['当前库存量'] > row['安全库存'] * 0.5:
+        return "预警"
+    else:
+        return "严重不足"
+
+
+def highlight_low_stock(row):
+    """原来的逐行高亮实现"""
+    if row['安全库存'] > 0 and row['当前库存量'] < row['安全库存']:
+        return [LOW_STOCK_STYLE] * len(row)
+    return [''] * len(row)
+
+
+def make_inventory(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '商品编号': np.arange(1, rows + 1),
+        '商品名称': [f"商品{i:06d}" for i in range(rows)],
+        '单位': rng.choice(['个', '箱', '件'], size=rows),
+        '当前库存量': rng.integers(0, 200, size=rows),
+        '安全库存': rng.integers(0, 100, size=rows),
+    })
+
+
+def best_of(func, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def render_full(frame):
+    return frame.style.apply(highlight_low_stock, axis=1).to_html()
+
+
+def render_page(frame):
+    mask = low_stock_mask(frame)
+    view = frame.iloc[:FRAME_PAGE_SIZE]
+    styles = np.where(mask[:FRAME_PAGE_SIZE], LOW_STOCK_STYLE, '')
+    cell_styles = np.repeat(styles[:, None], view.shape[1], axis=1)
+    return view.style.apply(lambda _: cell_styles, axis=None).to_html()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    frame = make_inventory(args.rows)
+    apply_time, expected = best_of(lambda: frame.apply(get_stock_status, axis=1), args.repeat)
+    vector_time, actual = best_of(lambda: classify_stock_status(frame), args.repeat)
+    assert (actual.astype(str) == expected).all(), "两种实现的库存状态不一致"
+
+    full_time, _ = best_of(lambda: render_full(frame), 1)
+    page_time, _ = best_of(lambda: render_page(frame), args.repeat)
+
+    print(f"{args.rows} 行")
+    print(f"{'库存状态':<10} apply {apply_time:.3f}s  向量化 {vector_time:.4f}s  加速 {apply_time / vector_time:.0f}x")
+    print(f"{'低库存高亮':<10} 整表 {full_time:.3f}s  当前页 {page_time:.4f}s  加速 {full_time / page_time:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""对比业务操作逐条提交与工作单元一次提交的每秒操作数与提交次数
+
+每个业务操作为一次出库加一条同步写入的系统日志：
+逐条提交: db.stock_out(...) 和 db.log_action(..., sync=True) 各自提交
+工作单元: 在 db.transaction() 中执行同样两步，只提交一次
+
+使用本地SQLite数据库文件，提交时会真实落盘。
+
+用法: python benchmarks/bench_transactions.py [--actions 2000]
+"""
+import argparse
+import os
+import time
+
+import sqlite_backend
+import warehouse_core
+
+
+class CountingConnection:
+    """统计commit次数的连接代理"""
+
+    commits = 0
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        CountingConnection.commits += 1
+        return self._conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def make_db(path):
+    pool = warehouse_core.ConnectionPool(lambda: CountingConnection(sqlite_backend.connect(path)),
+                                        min_size=1, max_size=1)
+    return warehouse_core.WarehouseDB(pool=pool, cache=warehouse_core.QueryCache(),
+                                     auth_cache=warehouse_core.AuthCache())
+
+
+def action(db, i):
+    if db.stock_out(1 + i % 100, 1, 1, '基准测试客户') == 1:
+        db.log_action('出库', f"基准测试出库 {i}", 1, sync=True)
+
+
+def per_statement(db, i):
+    action(db, i)
+
+
+def unit_of_work(db, i):
+    with db.transaction():
+        action(db, i)
+
+
+def run(mode, path, actions):
+    db = make_db(path)
+    CountingConnection.commits = 0
+    start = time.perf_counter()
+    for i in range(actions):
+        mode(db, i)
+    elapsed = time.perf_counter() - start
+    db.pool.close()
+    return actions / elapsed, CountingConnection.commits / actions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--actions', type=int, default=2000)
+    args = parser.parse_args()
+
+    path = sqlite_backend.create_database()
+    try:
+        sqlite_backend.populate(path, products=100, stock_in=10000)
+        print(f"{'方式':<8} {'操作/秒':>10} {'提交/操作':>10}")
+        for name, mode in (('逐条提交', per_statement), ('工作单元', unit_of_work)):
+            rate, commits = run(mode, path, args.actions)
+            print(f"{name:<8} {rate:>10,.0f} {commits:>10.2f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""HTTP接口压测：并发发送请求，统计每秒请求数与p50/p99延迟
+
+默认在子进程中启动使用本地SQLite数据库的接口服务；指定 --url 时压测已运行的服务。
+请求按比例混合：按商品编号查库存（扫码）、搜索商品、分页读取入库记录，以及 --writes 比例的出库。
+本地SQLite数据库只允许一个写入者，写入比例较高时延迟主要反映SQLite的锁等待。
+
+用法: python benchmarks/load_test_api.py [--concurrency 32] [--duration 10] [--writes 0.1] [--url http://host:8000]
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+import sqlite_backend
+
+BENCH_DB_ENV = 'WAREHOUSE_BENCH_DB'
+
+
+def local_app():
+    """子进程中uvicorn使用的应用工厂：连接环境变量指定的SQLite数据库"""
+    import warehouse_api
+    return warehouse_api.create_app(sqlite_backend.make_db(os.environ[BENCH_DB_ENV],
+                                                           max_size=warehouse_api.API_WORKERS))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(path, port):
+    """在子进程中启动接口服务，等待端口可用"""
+    env = dict(os.environ, **{BENCH_DB_ENV: path})
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'load_test_api:local_app', '--factory',
+         '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+         '--app-dir', os.path.dirname(os.path.abspath(__file__))],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("接口服务启动失败")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("等待接口服务启动超时")
+
+
+def make_request(rng, products, writes):
+    """按比例随机生成一个请求，返回 (名称, 方法, 路径, 请求体)"""
+    if rng.random() < writes:
+        body = {'商品编号': int(rng.integers(1, products + 1)), '数量': 1, '客户名称': '压测客户'}
+        return 'POST /stock-out', 'POST', '/stock-out', json.dumps(body)
+    choice = rng.random()
+    if choice < 0.6:
+        return 'GET /inventory/{id}', 'GET', f"/inventory/{int(rng.integers(1, products + 1))}", None
+    if choice < 0.85:
+        query = quote(f"商品{int(rng.integers(0, products // 100 + 1)):04d}")
+        return 'GET /products?q=', 'GET', f"/products?q={query}&limit=20", None
+    return 'GET /records/stock-in', 'GET', '/records/stock-in?limit=50', None
+
+
+def client(host, port, headers, deadline, products, writes, seed, results):
+    """在一个保持连接上循环发送请求，记录 (名称, 延迟, 状态码)"""
+    rng = np.random.default_rng(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while time.perf_counter() < deadline:
+        name, method, path, body = make_request(rng, products, writes)
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body.encode() if body else None, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            status = 0
+        results.append((name, time.perf_counter() - start, status))
+    conn.close()
+
+
+def report(results, seconds):
+    """按请求类型输出请求数、每秒请求数、p50/p99延迟和错误数"""
+    print(f"{'请求':<22} {'次数':>8} {'请求/秒':>10} {'p50(ms)':>9} {'p99(ms)':>9} {'错误':>6}")
+    groups = {}
+    for name, latency, status in results:
+        groups.setdefault(name, []).append((latency, status))
+    groups['合计'] = [(latency, status) for _, latency, status in results]
+    for name, rows in groups.items():
+        latencies = np.array([latency for latency, _ in rows]) * 1000
+        errors = sum(1 for _, status in rows if not 200 <= status < 300)
+        print(f"{name:<22} {len(rows):>8} {len(rows) / seconds:>10.1f} "
+              f"{np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 99):>9.2f} {errors:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="已运行的接口服务地址，不指定时启动本地SQLite服务")
+    parser.add_argument('--user', default='user003', help="本地数据中user003为管理员")
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--writes', type=float, default=0.0, help="出库请求的比例")
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    process, path = None, None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        path = sqlite_backend.create_database()
+        sqlite_backend.populate(path, products=args.products, stock_in=args.records, stock_out=args.records // 4)
+        host, port = '127.0.0.1', free_port()
+        process = start_local_server(path, port)
+
+    token = base64.b64encode(f"{args.user}:{args.password}".encode()).decode()
+    headers = {'Authorization': f"Basic {token}", 'Content-Type': 'application/json'}
+    try:
+        results = []
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(host, port, headers, deadline, args.products,
+                                                         args.writes, seed, results))
+                   for seed in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report(results, time.perf_counter() - started)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if path is not None:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""端到端基准测试：逐个计时 WarehouseDB 的方法和各页面的取数路径，并与保存的基线比较
+
+数据由 sqlite_backend.populate() 按规模（--size）和随机种子生成，默认写入临时SQLite数据库；
+--database 复用已生成的数据库文件，--backend odbc 连接 WAREHOUSE_PRIMARY_DSN 指定的SQL Server（只运行读取用例）。
+
+每个用例先预热一次，再执行 --repeat 次计时（每次执行前清空查询缓存，进程内的台账、索引和汇总保持预热），
+报告中位与p95延迟、每秒执行次数，以及在tracemalloc下再执行一次得到的Python峰值内存。
+--save-baseline 把结果保存为基线；之后的运行与基线比较，延迟或峰值内存超过容差时列为退化并以状态码1退出。
+
+用法: python benchmarks/run_benchmarks.py [--size small] [--repeat 5] [--only 入库] [--save-baseline]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import sqlite_backend
+import warehouse_core
+from warehouse_core import LOG_COLUMNS, STOCK_IN_COLUMNS, STOCK_OUT_COLUMNS, classify_stock_status, low_stock_mask
+from warehouse_pages.components import FRAME_PAGE_SIZE
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+TOLERANCE = 0.25  # 相对基线的容差，超过时判定为退化
+MIN_TIME_DELTA = 0.002  # 延迟增加小于该值（秒）时不判定为退化，避免毫秒级用例的抖动
+MIN_MEMORY_DELTA = 1 << 20  # 峰值内存增加小于该值（字节）时不判定为退化
+BULK_ROWS = 1000  # 批量出入库用例每次写入的行数
+
+
+class Context:
+    """用例共用的数据库和样本参数"""
+
+    def __init__(self, db, size):
+        self.db = db
+        self.size = size
+        self.products = size['products']
+        self.users = size['users']
+        self.rng = np.random.default_rng(0)
+        self.counter = 0
+        # 合成数据的时间范围从2024年开始，按页面默认的一个月和半年取日期范围
+        self.month = (date(2024, 6, 1), date(2024, 6, 30))
+        self.half_year = (date(2024, 1, 1), date(2024, 6, 30))
+
+    def product_id(self):
+        return int(self.rng.integers(1, self.products + 1))
+
+    def next_name(self, prefix):
+        self.counter += 1
+        return f"{prefix}{os.getpid()}_{self.counter}"
+
+    def movements(self, party_column, party):
+        return pd.DataFrame({
+            '商品编号': self.rng.integers(1, self.products + 1, size=BULK_ROWS),
+            '数量': self.rng.integers(1, 5, size=BULK_ROWS),
+            party_column: party,
+        })
+
+    def deep_cursor(self, fetch_page, pages=10):
+        """翻到第pages页时使用的游标"""
+        cursor = None
+        for _ in range(pages):
+            page, cursor = fetch_page(cursor=cursor)
+            if cursor is None:
+                break
+        return cursor
+
+
+def consume(frames):
+    """读完流式查询，返回总行数"""
+    return sum(len(frame) for frame in frames)
+
+
+# ==================== 页面取数路径 ====================
+def page_products(ctx):
+    """商品管理/商品信息：商品列表合并库存量并标记低库存，取第一页"""
+    db = ctx.db
+    products = db.get_products()
+    inventory = db.get_inventory()
+    products = products.merge(inventory[['商品编号', '当前库存量']], on='商品编号', how='left')
+    highlight = low_stock_mask(products)
+    return products.iloc[:FRAME_PAGE_SIZE], highlight[:FRAME_PAGE_SIZE]
+
+
+def page_inventory(ctx):
+    """库存管理/当前库存：库存状态、预警列表和图表数据"""
+    inventory = ctx.db.get_inventory()
+    inventory['库存状态'] = classify_stock_status(inventory)
+    low_stock = inventory[inventory['库存状态'] != "充足"]
+    status_counts = inventory['库存状态'].value_counts().reset_index()
+    return (low_stock.iloc[:FRAME_PAGE_SIZE], inventory.iloc[:FRAME_PAGE_SIZE], status_counts,
+            inventory.nlargest(10, '当前库存量'), inventory.nsmallest(10, '当前库存量'))
+
+
+def page_trends(ctx):
+    """库存管理/出入库趋势：每日趋势、分类汇总和两个排行"""
+    db = ctx.db
+    start, end = ctx.half_year
+    return (db.get_daily_movements(start, end), db.get_category_movements(start, end),
+            db.get_top_movers(start, end, by='出库数量'), db.get_top_movers(start, end, by='入库数量'))
+
+
+def page_records(fetch_page, columns, **filters):
+    """记录查询页面：按筛选条件读取一页并取显示列"""
+    def run(ctx):
+        page, _ = getattr(ctx.db, fetch_page)(**filters)
+        return page[columns]
+    return run
+
+
+def page_live_tail(table):
+    """记录页面的实时刷新：首次读取最近记录，之后只读取新增记录"""
+    def run(ctx):
+        tail = warehouse_core.RecordTail(table)
+        tail.refresh(ctx.db)
+        return tail.refresh(ctx.db, force=True)
+    return run
+
+
+def page_export(ctx):
+    """记录页面的导出：半年的入库明细写为gzip压缩的CSV"""
+    start, end = ctx.half_year
+    return warehouse_core.export_records(ctx.db, '入库记录', io.BytesIO(), 'csv', 'gzip', start=start, end=end)
+
+
+# 用例: (名称, 类型, 函数)；类型为 read、write 或 page，odbc后端只运行 read 和 page
+CASES = [
+    ('execute_query', 'read', lambda ctx: ctx.db.execute_query("SELECT COUNT(*) AS 数量 FROM 入库记录")),
+    ('get_products', 'read', lambda ctx: ctx.db.get_products()),
+    ('get_product', 'read', lambda ctx: ctx.db.get_product(ctx.product_id())),
+    ('search_products', 'read', lambda ctx: ctx.db.search_products(f"商品{ctx.product_id() // 10:05d}")),
+    ('product_label', 'read', lambda ctx: ctx.db.product_label(ctx.product_id())),
+    ('get_inventory', 'read', lambda ctx: ctx.db.get_inventory()),
+    ('get_stock_level', 'read', lambda ctx: ctx.db.get_stock_level(ctx.product_id())),
+    ('validate_movements', 'read',
+     lambda ctx: ctx.db.validate_movements(ctx.movements('客户名称', '基准客户'), '客户名称', check_stock=True)),
+    ('get_users', 'read', lambda ctx: ctx.db.get_users()),
+    ('authenticate', 'read', lambda ctx: ctx.db.authenticate('user003', 'password')),
+    ('get_stock_in_records', 'read', lambda ctx: ctx.db.get_stock_in_records()),
+    ('get_stock_out_records', 'read', lambda ctx: ctx.db.get_stock_out_records()),
+    ('get_logs', 'read', lambda ctx: ctx.db.get_logs()),
+    ('get_stock_in_details', 'read', lambda ctx: ctx.db.get_stock_in_details()),
+    ('get_stock_out_details', 'read', lambda ctx: ctx.db.get_stock_out_details()),
+    ('get_log_details', 'read', lambda ctx: ctx.db.get_log_details()),
+    ('get_stock_in_records_page', 'read', lambda ctx: ctx.db.get_stock_in_records_page()),
+    ('get_stock_in_records_page/第10页', 'read',
+     lambda ctx: ctx.db.get_stock_in_records_page(cursor=ctx.stock_in_cursor)),
+    ('get_stock_in_records_page/筛选', 'read',
+     lambda ctx: ctx.db.get_stock_in_records_page(start=ctx.month[0], end=ctx.month[1], supplier='供应商0')),
+    ('get_stock_out_records_page', 'read', lambda ctx: ctx.db.get_stock_out_records_page()),
+    ('get_logs_page', 'read', lambda ctx: ctx.db.get_logs_page()),
+    ('get_logs_page/筛选', 'read',
+     lambda ctx: ctx.db.get_logs_page(start=ctx.month[0], end=ctx.month[1], action_type='登录')),
+    ('get_log_archives', 'read', lambda ctx: ctx.db.get_log_archives()),
+    ('get_latest_records', 'read', lambda ctx: ctx.db.get_latest_records('入库记录')),
+    ('get_records_since', 'read', lambda ctx: ctx.db.get_records_since('入库记录', ctx.stock_in_tail)),
+    ('get_daily_movements', 'read', lambda ctx: ctx.db.get_daily_movements(*ctx.half_year)),
+    ('get_category_movements', 'read', lambda ctx: ctx.db.get_category_movements(*ctx.half_year)),
+    ('get_top_movers', 'read', lambda ctx: ctx.db.get_top_movers(*ctx.half_year)),
+    ('iter_records', 'read', lambda ctx: consume(ctx.db.iter_records('出库记录', *ctx.half_year))),
+
+    ('page:商品信息', 'page', page_products),
+    ('page:入库记录', 'page', page_records('get_stock_in_records_page', STOCK_IN_COLUMNS)),
+    ('page:出库记录', 'page', page_records('get_stock_out_records_page', STOCK_OUT_COLUMNS)),
+    ('page:系统日志', 'page', page_records('get_logs_page', LOG_COLUMNS)),
+    ('page:当前库存', 'page', page_inventory),
+    ('page:出入库趋势', 'page', page_trends),
+    ('page:实时刷新', 'page', page_live_tail('入库记录')),
+    ('page:导出', 'page', page_export),
+
+    ('add_product', 'write',
+     lambda ctx: ctx.db.add_product(ctx.next_name('基准商品'), '型号', '个', 1, 10)),
+    ('update_product', 'write',
+     lambda ctx: ctx.db.update_product(1, '商品000001', '型号-1', '个', 2, 1)),
+    ('stock_in', 'write', lambda ctx: ctx.db.stock_in(ctx.product_id(), 10, 1, '基准供应商')),
+    ('stock_out', 'write', lambda ctx: ctx.db.stock_out(ctx.product_id(), 1, 1, '基准客户')),
+    ('bulk_stock_in', 'write', lambda ctx: ctx.db.bulk_stock_in(ctx.movements('供应商', '基准供应商'), 1)),
+    ('bulk_stock_out', 'write', lambda ctx: ctx.db.bulk_stock_out(ctx.movements('客户名称', '基准客户'), 1)),
+    ('log_action', 'write', lambda ctx: ctx.db.log_action('基准测试', "基准测试日志", 1, sync=True)),
+    ('add_user', 'write', lambda ctx: ctx.db.add_user(ctx.next_name('bench'), 'password', '操作员')),
+    ('set_password', 'write', lambda ctx: ctx.db.set_password(ctx.users, 'password')),
+    ('refresh_rollup', 'write', lambda ctx: ctx.db.refresh_rollup('入库')),
+    ('rollover_logs', 'write', lambda ctx: ctx.db.rollover_logs(now=datetime(2025, 1, 1))),
+]
+
+
+def reset_caches(db):
+    """清空查询缓存和登录缓存，使每次计时都读取数据库"""
+    db.cache.clear()
+    db.auth_cache.clear()
+
+
+def measure(ctx, func, repeat):
+    """返回一个用例的延迟列表与Python峰值内存（字节）"""
+    reset_caches(ctx.db)
+    func(ctx)  # 预热
+    latencies = []
+    for _ in range(repeat):
+        reset_caches(ctx.db)
+        start = time.perf_counter()
+        func(ctx)
+        latencies.append(time.perf_counter() - start)
+
+    reset_caches(ctx.db)
+    tracemalloc.start()
+    try:
+        func(ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return latencies, peak
+
+
+def summarize(latencies, peak):
+    latencies = np.array(latencies)
+    return {
+        'median': float(np.median(latencies)),
+        'p95': float(np.percentile(latencies, 95)),
+        'throughput': float(len(latencies) / latencies.sum()),
+        'peak_memory': int(peak),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """与基线比较，返回退化说明列表"""
+    if baseline is None:
+        return []
+    problems = []
+    base, now = baseline['median'], result['median']
+    if now > base * (1 + tolerance) and now - base > MIN_TIME_DELTA:
+        problems.append(f"延迟 {base * 1000:.1f}→{now * 1000:.1f}毫秒")
+    base, now = baseline['peak_memory'], result['peak_memory']
+    if now > base * (1 + tolerance) and now - base > MIN_MEMORY_DELTA:
+        problems.append(f"内存 {base / 2 ** 20:.1f}→{now / 2 ** 20:.1f}MB")
+    return problems
+
+
+def baseline_path(args):
+    return args.baseline or os.path.join(BASELINE_DIR, f"{args.backend}_{args.size}.json")
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def save_baseline(path, args, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': platform.platform(),
+        'python': platform.python_version(),
+        'size': args.size,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def make_db(args, size):
+    """按后端创建WarehouseDB，返回 (db, 临时数据库文件或None)"""
+    if args.backend == 'odbc':
+        pool = warehouse_core.ConnectionPool(warehouse_core.create_connection)
+        return warehouse_core.WarehouseDB(pool=pool, cache=warehouse_core.QueryCache(),
+                                         auth_cache=warehouse_core.AuthCache()), None
+    path, temporary = args.database, None
+    if path is None or not os.path.exists(path):
+        path = sqlite_backend.create_database(path)
+        temporary = None if args.database else path
+        started = time.perf_counter()
+        sqlite_backend.populate(path, seed=args.seed, **size)
+        print(f"生成 {args.size} 规模数据用时 {time.perf_counter() - started:.1f} 秒: {size}")
+    return sqlite_backend.make_db(path), temporary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=list(sqlite_backend.SIZES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--backend', choices=['sqlite', 'odbc'], default='sqlite')
+    parser.add_argument('--database', help="SQLite数据库文件，不存在时生成并保留，不指定时使用临时文件")
+    parser.add_argument('--only', help="只运行名称匹配该正则表达式的用例")
+    parser.add_argument('--no-writes', action='store_true', help="跳过写入用例")
+    parser.add_argument('--baseline', help="基线文件，默认为 benchmarks/baselines/<后端>_<规模>.json")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--output', help="把本次结果写入JSON文件")
+    args = parser.parse_args()
+
+    size = sqlite_backend.SIZES[args.size]
+    db, temporary = make_db(args, size)
+    try:
+        ctx = Context(db, size)
+        ctx.stock_in_cursor = ctx.deep_cursor(db.get_stock_in_records_page)
+        latest = db.get_latest_records('入库记录', 1)
+        ctx.stock_in_tail = int(latest['入库单号'].iloc[0]) - 100 if latest is not None and not latest.empty else 0
+
+        skip_writes = args.no_writes or args.backend == 'odbc'
+        baseline = {} if args.save_baseline else load_baseline(baseline_path(args))
+        results, regressions = {}, []
+        print(f"{'用例':<34} {'中位(毫秒)':>10} {'p95(毫秒)':>10} {'次/秒':>9} {'峰值内存(MB)':>12}  基线对比")
+        for name, kind, func in CASES:
+            if (args.only and not re.search(args.only, name)) or (skip_writes and kind == 'write'):
+                continue
+            latencies, peak = measure(ctx, func, args.repeat)
+            result = results[name] = summarize(latencies, peak)
+            problems = compare(result, baseline.get(name), args.tolerance)
+            if problems:
+                regressions.append(name)
+            note = "退化: " + "，".join(problems) if problems else ("正常" if name in baseline else "-")
+            print(f"{name:<34} {result['median'] * 1000:>10.2f} {result['p95'] * 1000:>10.2f} "
+                  f"{result['throughput']:>9.1f} {result['peak_memory'] / 2 ** 20:>12.2f}  {note}")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        if args.save_baseline:
+            save_baseline(baseline_path(args), args, results)
+            print(f"基线已保存: {baseline_path(args)}")
+        elif regressions:
+            print(f"{len(regressions)} 个用例相对基线退化（容差 {args.tolerance:.0%}）: {', '.join(regressions)}")
+            raise SystemExit(1)
+    finally:
+        db.pool.close()
+        if temporary is not None:
+            os.remove(temporary)
+
+
+if __name__ == '__main__':
+    main()
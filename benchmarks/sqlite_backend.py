@@ -0,0 +1,389 @@
+"""基准测试使用的本地SQLite数据库，表结构与仓库管理系统一致
+
+connect() 返回的连接把程序中的SQL Server语句改写为SQLite的等价写法后执行：
+TOP (?) 改为 LIMIT ?，商品入库存储过程改为插入入库记录，保存点、建表、MERGE和日志归档语句
+使用SQLite的对应语句，因此 WarehouseDB 的全部方法都可以在本地数据库上运行。
+传入 FaultInjector 时模拟数据库不可用、随机通信错误和慢查询，用于检验超时、重试和熔断。
+"""
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pyodbc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import warehouse_core  # noqa: E402
+
+SCHEMA_SQL = """
+CREATE TABLE 商品信息 (
+    商品编号 INTEGER PRIMARY KEY,
+    商品名称 TEXT NOT NULL,
+    规格型号 TEXT,
+    单位 TEXT NOT NULL,
+    分类编号 INTEGER,
+    安全库存 INTEGER DEFAULT 0
+);
+CREATE TABLE 用户账户 (
+    用户编号 INTEGER PRIMARY KEY,
+    用户名 TEXT NOT NULL UNIQUE,
+    密码 TEXT NOT NULL,
+    角色 TEXT NOT NULL
+);
+CREATE TABLE 入库记录 (
+    入库单号 INTEGER PRIMARY KEY,
+    商品编号 INTEGER NOT NULL,
+    数量 INTEGER NOT NULL,
+    入库时间 TEXT DEFAULT CURRENT_TIMESTAMP,
+    供应商 TEXT,
+    操作员编号 INTEGER
+);
+CREATE TABLE 出库记录 (
+    出库单号 INTEGER PRIMARY KEY,
+    商品编号 INTEGER NOT NULL,
+    数量 INTEGER NOT NULL,
+    出库时间 TEXT DEFAULT CURRENT_TIMESTAMP,
+    客户名称 TEXT,
+    操作员编号 INTEGER
+);
+CREATE TABLE 系统日志 (
+    日志编号 INTEGER PRIMARY KEY,
+    操作时间 TEXT DEFAULT CURRENT_TIMESTAMP,
+    操作类型 TEXT,
+    详细信息 TEXT,
+    用户编号 INTEGER
+);
+CREATE TABLE 复制心跳 (
+    编号 INTEGER PRIMARY KEY,
+    心跳值 INTEGER NOT NULL
+);
+CREATE INDEX IX_入库记录_商品编号 ON 入库记录 (商品编号);
+CREATE INDEX IX_出库记录_商品编号 ON 出库记录 (商品编号);
+CREATE INDEX IX_系统日志_操作时间 ON 系统日志 (操作时间);
+CREATE VIEW 当前库存 AS
+SELECT p.商品编号, p.商品名称, p.规格型号, p.单位, p.安全库存,
+       COALESCE(i.数量, 0) - COALESCE(o.数量, 0) AS 当前库存量
+FROM 商品信息 p
+LEFT JOIN (SELECT 商品编号, SUM(数量) AS 数量 FROM 入库记录 GROUP BY 商品编号) i ON i.商品编号 = p.商品编号
+LEFT JOIN (SELECT 商品编号, SUM(数量) AS 数量 FROM 出库记录 GROUP BY 商品编号) o ON o.商品编号 = p.商品编号;
+"""
+
+# populate()的数据规模
+SIZES = {
+    'small': dict(products=1000, users=50, stock_in=20000, stock_out=5000, logs=20000),
+    'medium': dict(products=20000, users=200, stock_in=500000, stock_out=125000, logs=500000),
+    'large': dict(products=100000, users=1000, stock_in=5000000, stock_out=1250000, logs=5000000),
+}
+
+UNITS = ['个', '箱', '件', '台', '包', '千克']
+ROLES = ['管理员', '经理', '操作员']
+SUPPLIERS = [f"供应商{i:02d}" for i in range(40)]
+CUSTOMERS = [f"客户{i:03d}" for i in range(200)]
+ACTIONS = ['登录', '退出', '商品添加', '商品修改', '出库', '用户添加']
+
+
+def create_database(path=None):
+    """创建空的SQLite数据库文件，返回文件路径"""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='warehouse_bench_', suffix='.db')
+        os.close(fd)
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_SQL)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _timestamps(rng, n):
+    """生成2024年以来按时间递增的时间字符串"""
+    seconds = np.sort(rng.integers(0, 3 * 365 * 86400, size=n))
+    stamps = np.datetime64('2024-01-01T00:00:00') + seconds.astype('timedelta64[s]')
+    # 与sqlite3对datetime参数的转换格式一致（日期和时间以空格分隔），按字符串比较时顺序正确
+    return np.char.replace(np.datetime_as_string(stamps, unit='s'), 'T', ' ').astype(object)
+
+
+def populate(path, products=1000, users=50, stock_in=10000, stock_out=0, logs=0, seed=42):
+    """按指定规模写入可复现的合成数据"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+
+    conn.executemany(
+        "INSERT INTO 商品信息 (商品编号, 商品名称, 规格型号, 单位, 分类编号, 安全库存) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f"商品{i:06d}", f"型号-{i % 97}", UNITS[i % len(UNITS)], int(i % 20) + 1, int(i % 50))
+         for i in range(1, products + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO 用户账户 (用户编号, 用户名, 密码, 角色) VALUES (?, ?, ?, ?)",
+        ((i, f"user{i:03d}", 'password', ROLES[i % len(ROLES)]) for i in range(1, users + 1)),
+    )
+
+    def movements(n, parties):
+        product_ids = rng.integers(1, products + 1, size=n).tolist()
+        quantities = rng.integers(1, 100, size=n).tolist()
+        party_ids = rng.integers(0, len(parties), size=n).tolist()
+        operators = rng.integers(1, users + 1, size=n).tolist()
+        times = _timestamps(rng, n).tolist()
+        return zip(product_ids, quantities, times, (parties[i] for i in party_ids), operators)
+
+    conn.executemany(
+        "INSERT INTO 入库记录 (商品编号, 数量, 入库时间, 供应商, 操作员编号) VALUES (?, ?, ?, ?, ?)",
+        movements(stock_in, SUPPLIERS),
+    )
+    conn.executemany(
+        "INSERT INTO 出库记录 (商品编号, 数量, 出库时间, 客户名称, 操作员编号) VALUES (?, ?, ?, ?, ?)",
+        movements(stock_out, CUSTOMERS),
+    )
+    if logs:
+        actions = rng.integers(0, len(ACTIONS), size=logs).tolist()
+        log_users = rng.integers(1, users + 1, size=logs).tolist()
+        conn.executemany(
+            "INSERT INTO 系统日志 (操作时间, 操作类型, 详细信息, 用户编号) VALUES (?, ?, ?, ?)",
+            ((t, ACTIONS[a], f"合成日志 {ACTIONS[a]}", u)
+             for t, a, u in zip(_timestamps(rng, logs).tolist(), actions, log_users)),
+        )
+    conn.commit()
+    conn.close()
+
+
+# ==================== SQL改写 ====================
+# 程序中固定不变的语句：原文 -> SQLite语句列表（依次执行）
+_STATEMENTS = {
+    warehouse_core.REPLICA_HEARTBEAT_SCHEMA_SQL: [
+        "CREATE TABLE IF NOT EXISTS 复制心跳 (编号 INTEGER PRIMARY KEY, 心跳值 INTEGER NOT NULL)",
+    ],
+    warehouse_core.ROLLUP_SCHEMA_SQL: [
+        """CREATE TABLE IF NOT EXISTS 每日出入库汇总 (
+            日期 TEXT NOT NULL,
+            商品编号 INTEGER NOT NULL,
+            入库数量 INTEGER NOT NULL DEFAULT 0,
+            入库笔数 INTEGER NOT NULL DEFAULT 0,
+            出库数量 INTEGER NOT NULL DEFAULT 0,
+            出库笔数 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (日期, 商品编号)
+        )""",
+        """CREATE TABLE IF NOT EXISTS 汇总进度 (
+            汇总名称 TEXT NOT NULL PRIMARY KEY,
+            最后单号 INTEGER NOT NULL DEFAULT 0,
+            更新时间 TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "INSERT OR IGNORE INTO 汇总进度 (汇总名称, 最后单号) VALUES ('入库', 0)",
+        "INSERT OR IGNORE INTO 汇总进度 (汇总名称, 最后单号) VALUES ('出库', 0)",
+    ],
+}
+for _kind, (_table, _key, _time_column, _quantity, _count) in warehouse_core.ROLLUP_SOURCES.items():
+    _STATEMENTS[warehouse_core._rollup_merge_sql(_kind)] = [f"""
+        INSERT INTO 每日出入库汇总 (日期, 商品编号, {_quantity}, {_count})
+        SELECT date({_time_column}), 商品编号, SUM(数量), COUNT(*)
+        FROM {_table}
+        WHERE {_key} > ? AND {_key} <= ?
+        GROUP BY date({_time_column}), 商品编号
+        ON CONFLICT (日期, 商品编号) DO UPDATE SET
+            {_quantity} = {_quantity} + excluded.{_quantity}, {_count} = {_count} + excluded.{_count}
+    """]
+
+_ARCHIVE_SCHEMA = re.compile(r"IF OBJECT_ID\(N'(\w+)', N'U'\) IS NULL\s+BEGIN\s+CREATE TABLE")
+_ARCHIVE_MOVE = re.compile(r"DELETE TOP \(\?\) FROM 系统日志\s+OUTPUT .*?INTO (\w+) ", re.S)
+_SAVEPOINT = re.compile(r"IF @@TRANCOUNT = 0 BEGIN TRANSACTION; SAVE TRANSACTION (\w+)")
+_ROLLBACK_TO = re.compile(r"ROLLBACK TRANSACTION (\w+)")
+_STOCK_IN_PROCEDURE = re.compile(r"EXEC 商品入库 @商品编号=\?, @数量=\?, @操作员编号=\?, @供应商=\?")
+_SELECT_TOP = re.compile(r"^(\s*SELECT) TOP \(\?\)")
+_REWRITES = [
+    (re.compile(r"WITH \(UPDLOCK\)"), ""),
+    (re.compile(r"GETDATE\(\)"), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bN'"), "'"),
+    (re.compile(r"CAST\((\w+) AS DATE\)"), r"date(\1)"),
+    (re.compile(r"FROM sys\.tables WHERE name LIKE \?"),
+     r"FROM sqlite_master WHERE type = 'table' AND name LIKE ? ESCAPE '\\'"),
+]
+
+
+def translate(query, params=()):
+    """把SQL Server语句改写为SQLite语句，返回 [(语句, 参数), ...]"""
+    params = list(params or ())
+    statements = _STATEMENTS.get(query)
+    if statements is not None:
+        return [(statement, params if '?' in statement else []) for statement in statements]
+
+    match = _ARCHIVE_SCHEMA.search(query)
+    if match:
+        table = match.group(1)
+        return [(f"CREATE TABLE IF NOT EXISTS {table} (日志编号 INTEGER PRIMARY KEY, 操作时间 TEXT NOT NULL, "
+                 f"操作类型 TEXT, 详细信息 TEXT, 用户编号 INTEGER)", []),
+                (f"CREATE INDEX IF NOT EXISTS IX_{table}_操作时间 ON {table} (操作时间, 日志编号)", [])]
+    match = _ARCHIVE_MOVE.search(query)
+    if match:
+        # 先复制再删除同一批日志（均在同一事务中），结果与DELETE ... OUTPUT INTO一致
+        limit, start, end = params
+        batch = "SELECT 日志编号 FROM 系统日志 WHERE 操作时间 >= ? AND 操作时间 < ? ORDER BY 日志编号 LIMIT ?"
+        return [(f"INSERT INTO {match.group(1)} ({warehouse_core.LOG_TABLE_COLUMNS}) "
+                 f"SELECT {warehouse_core.LOG_TABLE_COLUMNS} FROM 系统日志 WHERE 日志编号 IN ({batch})",
+                 [start, end, limit]),
+                (f"DELETE FROM 系统日志 WHERE 日志编号 IN ({batch})", [start, end, limit])]
+    match = _SAVEPOINT.search(query)
+    if match:
+        return [(f"SAVEPOINT {match.group(1)}", [])]
+    match = _ROLLBACK_TO.fullmatch(query.strip())
+    if match:
+        return [(f"ROLLBACK TO SAVEPOINT {match.group(1)}", [])]
+    if _STOCK_IN_PROCEDURE.search(query):
+        return [("INSERT INTO 入库记录 (商品编号, 数量, 操作员编号, 供应商) VALUES (?, ?, ?, ?)", params)]
+
+    if _SELECT_TOP.match(query):
+        # TOP的参数是语句中的第一个参数，改为LIMIT后移到最后
+        query = _SELECT_TOP.sub(r"\1", query) + " LIMIT ?"
+        params = params[1:] + params[:1]
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    if 'sqlite_master' in query:
+        params = [p.replace('[_]', '\\_') if isinstance(p, str) else p for p in params]
+    return [(query, params)]
+
+
+class FaultInjector:
+    """向本地数据库连接注入故障，模拟SQL Server变慢或重启
+
+    down为True时无法建立新连接（等待connect_delay秒后失败），已有连接上的语句报通信错误；
+    error_rate为语句随机报通信错误的比例；latency为每条语句额外的延迟（秒），
+    超过连接的timeout时等待timeout秒后报查询超时，与pyodbc设置Connection.timeout后的行为一致。
+    """
+
+    def __init__(self, down=False, error_rate=0.0, latency=0.0, connect_delay=0.0, seed=None):
+        self.down = down
+        self.error_rate = error_rate
+        self.latency = latency
+        self.connect_delay = connect_delay
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.connects = 0
+        self.statements = 0
+        self.faults = 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def connect_failed(self):
+        """建立连接前调用，数据库不可用时返回True"""
+        self._count('connects')
+        if not self.down:
+            return False
+        self._count('faults')
+        time.sleep(self.connect_delay)
+        return True
+
+    def before_execute(self, timeout):
+        """执行语句前调用，按设置抛出pyodbc错误或延迟"""
+        self._count('statements')
+        with self._lock:
+            failed = self.down or self._random.random() < self.error_rate
+        if failed:
+            self._count('faults')
+            raise pyodbc.OperationalError('08S01', "[08S01] 通信链接失败（注入的故障）")
+        if self.latency:
+            if timeout and self.latency > timeout:
+                time.sleep(timeout)
+                self._count('faults')
+                raise pyodbc.OperationalError('HYT00', "[HYT00] 查询超时（注入的故障）")
+            time.sleep(self.latency)
+
+
+class TranslatingCursor:
+    """执行前改写SQL Server语句的SQLite游标"""
+
+    def __init__(self, connection, faults=None, timeout=0):
+        self._connection = connection
+        self._cursor = connection.cursor()
+        self._rowcount = -1
+        self._faults = faults
+        self._timeout = timeout
+
+    def execute(self, query, params=()):
+        if self._faults is not None:
+            self._faults.before_execute(self._timeout)
+        statements = translate(query, params)
+        if statements[0][0].startswith('SAVEPOINT') and not self._connection.in_transaction:
+            # SQL Server在没有事务时由保存点语句开启事务
+            self._cursor.execute("BEGIN")
+        rowcount = 0
+        for statement, statement_params in statements:
+            self._cursor.execute(statement, statement_params)
+            rowcount = self._cursor.rowcount
+        # 多条语句改写时返回最后一条的影响行数（日志归档时为删除的行数）
+        self._rowcount = rowcount
+        return self
+
+    def executemany(self, query, seq_of_params):
+        if self._faults is not None:
+            self._faults.before_execute(self._timeout)
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            return self
+        statement = translate(query, seq_of_params[0])[0][0]
+        self._cursor.executemany(statement, [translate(query, params)[0][1] for params in seq_of_params])
+        self._rowcount = self._cursor.rowcount
+        return self
+
+    @property
+    def rowcount(self):
+        return self._rowcount
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TranslatingConnection:
+    """返回TranslatingCursor的SQLite连接；timeout为语句执行超时（秒），与pyodbc的Connection.timeout相同"""
+
+    def __init__(self, connection, faults=None):
+        self._connection = connection
+        self._faults = faults
+        self.timeout = warehouse_core.DB_QUERY_TIMEOUT
+
+    def cursor(self):
+        return TranslatingCursor(self._connection, self._faults, self.timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def connect(path, faults=None):
+    """建立可在连接池线程间共享、接受程序中SQL Server语句的SQLite连接
+
+    与create_connection()一致，无法连接（faults注入）时返回None。
+    """
+    if faults is not None and faults.connect_failed():
+        print("数据库连接失败: 注入的故障")
+        return None
+    return TranslatingConnection(sqlite3.connect(path, check_same_thread=False), faults)
+
+
+def replicate(primary_path, replica_path):
+    """把主库文件完整复制到副本文件，模拟副本追上主库"""
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    source.backup(target)
+    target.close()
+    source.close()
+
+
+def make_db(path, max_size=4, replica_path=None, session=None, faults=None, cache=None, breaker=None):
+    """创建使用本地SQLite数据库、独立缓存的WarehouseDB
+
+    replica_path不为None时以该文件作为只读副本，可用replicate()模拟复制进度；
+    faults为FaultInjector时主库连接按其设置注入故障。
+    """
+    pool = warehouse_core.ConnectionPool(lambda: connect(path, faults), min_size=1, max_size=max_size)
+    replica_pool = None
+    if replica_path is not None:
+        replica_pool = warehouse_core.ConnectionPool(lambda: connect(replica_path), min_size=1, max_size=max_size)
+    return warehouse_core.WarehouseDB(pool=pool, cache=cache if cache is not None else warehouse_core.QueryCache(),
+                                     auth_cache=warehouse_core.AuthCache(),
+                                     replica_pool=replica_pool, session=session, breaker=breaker)
@@ -0,0 +1,456 @@
+"""仓库管理系统的HTTP接口，供扫码枪、ERP等系统以JSON调用
+
+用法: uvicorn warehouse_api:create_app --factory --host 0.0.0.0 --port 8000
+
+认证使用HTTP Basic（用户名和密码与界面登录相同），各接口的权限与界面菜单的角色规则一致。
+阻塞的数据库调用在有界线程池中执行；同一时间窗口内到达的入库、出库请求合并为一次批量写入。
+"""
+import asyncio
+import base64
+import binascii
+import concurrent.futures
+import contextlib
+import json
+from datetime import datetime
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import warehouse_core
+
+API_WORKERS = warehouse_core.POOL_MAX_SIZE  # 执行数据库调用的线程数，与连接池上限一致
+API_MAX_PENDING = 500  # 等待数据库线程的最多调用数，超过时返回503
+API_BATCH_WINDOW = 0.005  # 出入库请求合并的等待时间（秒）
+API_BATCH_MAX_SIZE = 500  # 一批合并的最多出入库请求数
+API_MAX_PAGE_SIZE = 1000  # 列表接口单次返回的最多行数
+
+# 各出入库接口使用的批量写入方法和往来单位列
+MOVEMENT_KINDS = {
+    '入库': ('bulk_stock_in', '供应商'),
+    '出库': ('bulk_stock_out', '客户名称'),
+}
+
+
+class ApiError(Exception):
+    """返回给调用方的错误，包含HTTP状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class DatabaseWorkers:
+    """在有界线程池中执行阻塞的数据库调用，排队过多时直接拒绝"""
+
+    def __init__(self, workers=API_WORKERS, max_pending=API_MAX_PENDING):
+        self.max_pending = max_pending
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                              thread_name_prefix='warehouse-api')
+        self._pending = 0  # 只在事件循环线程中修改
+
+    async def run(self, func, *args):
+        """在线程池中执行func(*args)并等待结果"""
+        if self._pending >= self.max_pending:
+            raise ApiError(503, "服务繁忙，请稍后重试")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._pending -= 1
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class MovementBatcher:
+    """把短时间内到达的入库或出库请求合并，按操作员分组调用一次批量写入
+
+    sessions为 {操作员编号: 会话状态}，写入记录在该操作员的会话中，只使其随后的读取走主库。
+    """
+
+    def __init__(self, db, workers, kind, window=API_BATCH_WINDOW, max_size=API_BATCH_MAX_SIZE, sessions=None):
+        self.db = db
+        self.workers = workers
+        self.kind = kind
+        self.window = window
+        self.max_size = max_size
+        self.sessions = sessions if sessions is not None else {}
+        self.method, self.party_column = MOVEMENT_KINDS[kind]
+
+        self._items = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, product_id, quantity, operator_id, party):
+        """提交一条出入库请求，返回错误信息，成功时返回None"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append((product_id, quantity, operator_id, party, future))
+        if len(self._items) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        """把已收集的请求交给后台任务写入"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items:
+            task = asyncio.ensure_future(self._write(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, items):
+        """按操作员分组批量写入，把每行的结果交给对应的请求"""
+        groups = {}
+        for item in items:
+            groups.setdefault(item[2], []).append(item)
+
+        for operator_id, group in groups.items():
+            frame = pd.DataFrame({
+                '商品编号': [item[0] for item in group],
+                '数量': [item[1] for item in group],
+                self.party_column: [item[3] for item in group],
+            })
+            try:
+                errors = await self.workers.run(self._write_group, frame, operator_id)
+            except Exception as e:
+                for item in group:
+                    if not item[4].done():
+                        item[4].set_exception(e)
+                continue
+            for i, item in enumerate(group):
+                if not item[4].done():
+                    # 错误明细的行号从2开始（对应文件表头之后的第一行）
+                    item[4].set_result(errors.get(i + 2))
+
+    def _write_group(self, frame, operator_id):
+        """在数据库线程中执行批量写入并记录日志，返回 {行号: 错误}"""
+        with self.db.session_scope(self.sessions.setdefault(operator_id, {})):
+            written, errors = getattr(self.db, self.method)(frame, operator_id, continue_on_error=True)
+            if written:
+                self.db.log_action(f"接口{self.kind}", f"接口{self.kind}: {written} 行", operator_id)
+        return dict(zip(errors['行号'].tolist(), errors['错误'].tolist()))
+
+    async def drain(self):
+        """写入尚未提交的请求并等待完成（服务关闭时使用）"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def _frame_response(frame, **extra):
+    """把DataFrame转换为 {"rows": [...]} JSON响应；数据库不可用时返回的过期缓存带 "stale": true"""
+    rows = '[]' if frame is None or frame.empty else frame.to_json(
+        orient='records', date_format='iso', force_ascii=False)
+    stale = frame is not None and 'stale_age' in frame.attrs
+    if stale:
+        extra['stale'] = True
+    fields = ''.join(f', {json.dumps(key)}: {json.dumps(value, ensure_ascii=False, default=str)}'
+                     for key, value in extra.items())
+    response = Response(f'{{"rows": {rows}{fields}}}', media_type='application/json')
+    if stale:
+        response.headers['Warning'] = '110 - "Response is Stale"'
+    return response
+
+
+def _encode_cursor(cursor):
+    """把分页游标转换为字符串"""
+    if cursor is None:
+        return None
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in cursor]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(text):
+    """解析分页游标，时间值还原为datetime"""
+    if not text:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(text.encode()))
+    except (ValueError, binascii.Error):
+        raise ApiError(400, "cursor无效")
+
+    def restore(value):
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                return value
+        return value
+    return tuple(restore(value) for value in values)
+
+
+def _int_param(request, name, default=None, maximum=None):
+    """读取整数查询参数"""
+    value = request.query_params.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(400, f"参数{name}必须为整数")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _date_param(request, name):
+    """读取日期查询参数（YYYY-MM-DD）"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ApiError(400, f"参数{name}必须为YYYY-MM-DD格式的日期")
+
+
+async def _json_body(request):
+    """读取JSON请求体"""
+    try:
+        return await request.json()
+    except ValueError:
+        raise ApiError(400, "请求体不是有效的JSON")
+
+
+def create_app(db=None, workers=API_WORKERS, max_pending=API_MAX_PENDING,
+               batch_window=API_BATCH_WINDOW, batch_max_size=API_BATCH_MAX_SIZE):
+    """创建ASGI应用；db为None时使用共享连接池的WarehouseDB
+
+    所有调用方共用一个WarehouseDB，读己之写按用户分别记录：某个用户写入后只有该用户的读取暂时走主库。
+    """
+    db = db if db is not None else warehouse_core.WarehouseDB()
+    pool = DatabaseWorkers(workers, max_pending)
+    sessions = {}  # 用户编号 -> 会话状态
+    batchers = {kind: MovementBatcher(db, pool, kind, batch_window, batch_max_size, sessions)
+                for kind in MOVEMENT_KINDS}
+
+    def in_session(session, func):
+        """包装func，使其在数据库线程中使用给定的会话状态执行"""
+        def call(*args):
+            with db.session_scope(session):
+                return func(*args)
+        return call
+
+    def as_user(user, func):
+        """包装func，使其以该用户的会话状态执行"""
+        return in_session(sessions.setdefault(user['用户编号'], {}), func)
+
+    async def authenticate(request):
+        """校验HTTP Basic认证，返回用户信息"""
+        header = request.headers.get('authorization', '')
+        scheme, _, credentials = header.partition(' ')
+        if scheme.lower() != 'basic' or not credentials:
+            raise ApiError(401, "需要登录")
+        try:
+            username, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+        except (ValueError, binascii.Error):
+            raise ApiError(401, "认证信息无效")
+        if not username or not password:
+            raise ApiError(401, "认证信息无效")
+        # 登录时重新哈希密码的写入不记录到任何用户的会话中
+        user = await pool.run(in_session({}, db.authenticate), username, password)
+        if not user:
+            if db.unavailable():
+                raise ApiError(503, "数据库暂时不可用，请稍后重试")
+            raise ApiError(401, "用户名或密码错误")
+        return user
+
+    def endpoint(*permissions, admin_only=False):
+        """接口装饰器：认证、按界面菜单规则授权，并把ApiError转换为JSON错误响应"""
+        def decorator(handler):
+            async def wrapper(request):
+                try:
+                    user = await authenticate(request)
+                    role = user['角色']
+                    allowed = any(warehouse_core.has_permission(role, category, option)
+                                  for category, option in permissions)
+                    if not allowed or (admin_only and role != '管理员'):
+                        raise ApiError(403, "没有权限")
+                    return await handler(request, user)
+                except ApiError as e:
+                    response = JSONResponse({'error': e.message}, status_code=e.status)
+                    if e.status == 401:
+                        response.headers['WWW-Authenticate'] = 'Basic realm="warehouse"'
+                    return response
+            return wrapper
+        return decorator
+
+    def database_error(message):
+        """数据库读写失败的错误：数据库熔断中返回503，其他原因返回500"""
+        return ApiError(503 if db.unavailable() else 500, message)
+
+    product_readers = (("商品管理", "商品信息"), ("入库管理", "新增入库"), ("出库管理", "新增出库"))
+
+    @endpoint(*product_readers)
+    async def list_products(request, user):
+        limit = _int_param(request, 'limit', API_MAX_PAGE_SIZE, API_MAX_PAGE_SIZE)
+        query = request.query_params.get('q', '')
+
+        def load():
+            products = db.get_products()
+            if products is None:
+                raise database_error("读取商品失败")
+            if not query:
+                return products.head(limit)
+            ids = db.search_products(query, limit)
+            # 索引可能比商品缓存新，缓存中没有的编号直接跳过，其余按相关度排序
+            rank = {product_id: i for i, product_id in enumerate(ids)}
+            matched = products[products['商品编号'].isin(ids)]
+            return matched.sort_values('商品编号', key=lambda column: column.map(rank), ignore_index=True)
+        return _frame_response(await pool.run(as_user(user, load)))
+
+    @endpoint(*product_readers)
+    async def get_product(request, user):
+        product = await pool.run(as_user(user, db.get_product), int(request.path_params['product_id']))
+        if product is None:
+            raise ApiError(404, "商品不存在")
+        return _frame_response(product.to_frame().T)
+
+    def product_fields(body):
+        if not isinstance(body, dict) or not body.get('商品名称') or not body.get('单位'):
+            raise ApiError(400, "请填写必填字段（商品名称和单位）")
+        try:
+            return (body['商品名称'], body.get('规格型号', ''), body['单位'],
+                    int(body.get('分类编号', 1)), int(body.get('安全库存', 0)))
+        except (TypeError, ValueError):
+            raise ApiError(400, "分类编号和安全库存必须为整数")
+
+    @endpoint(("商品管理", "新增商品"))
+    async def add_product(request, user):
+        fields = product_fields(await _json_body(request))
+
+        def write():
+            with db.transaction() as tx:
+                result = db.add_product(*fields)
+                if result == 1:
+                    db.log_action('商品添加', f"添加商品: {fields[0]}", user['用户编号'])
+            # 工作单元回滚时写入并未生效，不能以块内的返回值为准
+            return result if tx.committed else None
+        if await pool.run(as_user(user, write)) != 1:
+            raise database_error("添加失败")
+        return JSONResponse({'ok': True}, status_code=201)
+
+    @endpoint(("商品管理", "商品信息"), admin_only=True)
+    async def update_product(request, user):
+        product_id = int(request.path_params['product_id'])
+        fields = product_fields(await _json_body(request))
+
+        def write():
+            with db.transaction() as tx:
+                result = db.update_product(product_id, *fields)
+                if result == 1:
+                    db.log_action('商品修改', f"修改商品: {fields[0]}", user['用户编号'])
+            return result if tx.committed else None
+        result = await pool.run(as_user(user, write))
+        if result == 0:
+            raise ApiError(404, "商品不存在")
+        if result != 1:
+            raise database_error("更新失败")
+        return JSONResponse({'ok': True})
+
+    @endpoint(("库存管理", "当前库存"))
+    async def list_inventory(request, user):
+        low_only = request.query_params.get('low') in ('1', 'true')
+
+        def load():
+            inventory = db.get_inventory()
+            if inventory is None:
+                raise database_error("读取库存失败")
+            inventory['库存状态'] = warehouse_core.classify_stock_status(inventory).astype(str)
+            return inventory[inventory['库存状态'] != '充足'] if low_only else inventory
+        return _frame_response(await pool.run(as_user(user, load)))
+
+    @endpoint(("库存管理", "当前库存"), ("出库管理", "新增出库"))
+    async def get_stock_level(request, user):
+        product_id = int(request.path_params['product_id'])
+        quantity = await pool.run(as_user(user, db.get_stock_level), product_id)
+        if quantity is None:
+            raise ApiError(404, "商品不存在")
+        return JSONResponse({'商品编号': product_id, '当前库存量': quantity})
+
+    def movement_endpoint(kind, category, option):
+        batcher = batchers[kind]
+        party_column = MOVEMENT_KINDS[kind][1]
+
+        @endpoint((category, option))
+        async def handler(request, user):
+            body = await _json_body(request)
+            items = body if isinstance(body, list) else [body]
+            if not items or not all(isinstance(item, dict) for item in items):
+                raise ApiError(400, "请求体应为对象或对象数组")
+            errors = await asyncio.gather(*(
+                batcher.submit(item.get('商品编号'), item.get('数量'), user['用户编号'], item.get(party_column, ''))
+                for item in items
+            ), return_exceptions=True)
+            for error in errors:
+                if isinstance(error, ApiError):
+                    raise error
+                if isinstance(error, Exception):
+                    raise ApiError(500, f"{kind}失败: {error}")
+            results = [{'ok': error is None, 'error': error} for error in errors]
+            status = 200 if all(result['ok'] for result in results) else 422
+            return JSONResponse(results if isinstance(body, list) else results[0], status_code=status)
+        return handler
+
+    def records_endpoint(fetch_page, category, option, filters):
+        @endpoint((category, option))
+        async def handler(request, user):
+            params = {name: parse(request, name) for name, parse in filters.items()}
+            limit = _int_param(request, 'limit', warehouse_core.RECORD_PAGE_SIZE, API_MAX_PAGE_SIZE)
+            cursor = _decode_cursor(request.query_params.get('cursor'))
+            start, end = _date_param(request, 'start'), _date_param(request, 'end')
+            page, next_cursor = await pool.run(as_user(
+                user, lambda: fetch_page(limit=limit, cursor=cursor, start=start, end=end, **params)))
+            if page is None:
+                raise database_error("读取记录失败")
+            return _frame_response(page, next_cursor=_encode_cursor(next_cursor))
+        return handler
+
+    @endpoint(("系统管理", "性能监控"))
+    async def metrics(request, user):
+        if db.metrics is None:
+            raise ApiError(404, "性能监控未开启")
+        if request.query_params.get('format') == 'json':
+            return Response(db.metrics.to_json(), media_type='application/json')
+        return Response(db.metrics.to_prometheus(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def text_param(request, name):
+        return request.query_params.get(name) or None
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        for batcher in batchers.values():
+            await batcher.drain()
+        pool.close()
+
+    routes = [
+        Route('/products', list_products, methods=['GET']),
+        Route('/products', add_product, methods=['POST']),
+        Route('/products/{product_id:int}', get_product, methods=['GET']),
+        Route('/products/{product_id:int}', update_product, methods=['PUT']),
+        Route('/inventory', list_inventory, methods=['GET']),
+        Route('/inventory/{product_id:int}', get_stock_level, methods=['GET']),
+        Route('/stock-in', movement_endpoint('入库', "入库管理", "新增入库"), methods=['POST']),
+        Route('/stock-out', movement_endpoint('出库', "出库管理", "新增出库"), methods=['POST']),
+        Route('/records/stock-in', records_endpoint(
+            db.get_stock_in_records_page, "入库管理", "入库记录",
+            {'product_id': _int_param, 'operator_id': _int_param, 'supplier': text_param}), methods=['GET']),
+        Route('/records/stock-out', records_endpoint(
+            db.get_stock_out_records_page, "出库管理", "出库记录",
+            {'product_id': _int_param, 'operator_id': _int_param, 'customer': text_param}), methods=['GET']),
+        Route('/logs', records_endpoint(
+            db.get_logs_page, "系统管理", "系统日志",
+            {'user_id': _int_param, 'action_type': text_param}), methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ]
+    app = Starlette(routes=routes, lifespan=lifespan)
+    app.state.db = db
+    app.state.workers = pool
+    return app
@@ -0,0 +1,122 @@
+"""仓库管理系统的命令行工具，用于定时任务等无需界面的操作
+
+用法:
+    python warehouse_cli.py reconcile [--range-size 10000] [--workers 8] [--restart]
+    python warehouse_cli.py rollover-logs [--hot-months 3]
+    python warehouse_cli.py rollup [--batch-size 100000]
+    python warehouse_cli.py export 入库记录 [--format parquet] [--start 2024-01-01] [--end 2024-12-31] [--product-id 1]
+"""
+import argparse
+import sys
+import time
+from datetime import date
+
+import warehouse_core
+
+
+def reconcile(args):
+    """按商品范围并行核对当前库存与出入库记录"""
+    summary = warehouse_core.reconcile_inventory(
+        warehouse_core.reconcile_db(),
+        output=args.output,
+        checkpoint=args.checkpoint,
+        range_size=args.range_size,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        resume=not args.restart,
+    )
+    print(f"核对完成: {summary['ranges']} 个商品范围，{summary['rows']} 行记录，"
+          f"{summary['discrepancies']} 个差异，耗时 {summary['seconds']:.1f} 秒"
+          f"（{summary['rows_per_second']:,.0f} 行/秒）")
+    if summary['discrepancies']:
+        print(f"差异明细已写入 {args.output}")
+        return 1
+    return 0
+
+
+def rollover_logs(args):
+    """把保留期之前的系统日志按月移入归档表"""
+    moved = warehouse_core.WarehouseDB().rollover_logs(args.hot_months, args.batch_size)
+    for table, rows in moved.items():
+        print(f"{table}: 归档 {rows} 行")
+    print(f"日志归档完成，共 {sum(moved.values())} 行")
+    return 0
+
+
+def rollup(args):
+    """把尚未汇总的全部出入库记录合并进每日出入库汇总，首次部署或长时间未刷新后运行"""
+    db = warehouse_core.WarehouseDB()
+    started = time.perf_counter()
+    rows = db.rollup.refresh(db, backfill=True, batch_size=args.batch_size)
+    if rows is None:
+        print("出入库汇总失败")
+        return 1
+    print(f"出入库汇总完成，共汇总 {rows} 个单号，耗时 {time.perf_counter() - started:.1f} 秒")
+    return 0
+
+
+def export(args):
+    """流式导出记录明细到CSV或Parquet文件"""
+    compression = args.compression or warehouse_core.EXPORT_FORMATS[args.format]
+    output = args.output or warehouse_core._export_file_name(args.table, args.format, compression)
+    if args.table == '系统日志':
+        filters = {'user_id': args.operator_id}
+    else:
+        filters = {'product_id': args.product_id, 'operator_id': args.operator_id}
+
+    started = time.perf_counter()
+    rows, _ = warehouse_core.export_records(
+        warehouse_core.WarehouseDB(), args.table, output, args.format, compression,
+        batch_size=args.batch_size, start=args.start, end=args.end, **filters,
+    )
+    seconds = time.perf_counter() - started
+    print(f"已导出 {rows} 行到 {output}，耗时 {seconds:.1f} 秒（{rows / max(seconds, 1e-9):,.0f} 行/秒）")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="仓库管理系统命令行工具")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('reconcile', help="由出入库记录重新计算库存并与当前库存核对")
+    command.add_argument('--output', default='reconcile_discrepancies.csv', help="差异明细CSV文件")
+    command.add_argument('--checkpoint', default=warehouse_core.RECONCILE_CHECKPOINT, help="核对进度文件")
+    command.add_argument('--range-size', type=int, default=warehouse_core.RECONCILE_RANGE_SIZE,
+                         help="每个核对任务的商品编号范围")
+    command.add_argument('--workers', type=int, default=warehouse_core.RECONCILE_WORKERS, help="核对进程数")
+    command.add_argument('--batch-size', type=int, default=warehouse_core.RECONCILE_BATCH_SIZE,
+                         help="流式读取记录的每批行数")
+    command.add_argument('--restart', action='store_true', help="忽略进度文件，从头核对")
+    command.set_defaults(handler=reconcile)
+
+    command = commands.add_parser('rollover-logs', help="把保留期之前的系统日志按月移入归档表")
+    command.add_argument('--hot-months', type=int, default=warehouse_core.LOG_HOT_MONTHS,
+                         help="系统日志表保留的月数（当月之前）")
+    command.add_argument('--batch-size', type=int, default=warehouse_core.LOG_ARCHIVE_BATCH_SIZE,
+                         help="每条语句移动的行数")
+    command.set_defaults(handler=rollover_logs)
+
+    command = commands.add_parser('rollup', help="把尚未汇总的出入库记录全部合并进每日出入库汇总")
+    command.add_argument('--batch-size', type=int, default=warehouse_core.ROLLUP_BATCH_SIZE,
+                         help="每个事务汇总的单号范围")
+    command.set_defaults(handler=rollup)
+
+    command = commands.add_parser('export', help="导出入库记录、出库记录或系统日志的明细")
+    command.add_argument('table', choices=list(warehouse_core.RECORD_SOURCES))
+    command.add_argument('--format', choices=list(warehouse_core.EXPORT_FORMATS), default='csv')
+    command.add_argument('--compression', help="压缩方式，默认CSV为gzip、Parquet为snappy；none表示不压缩")
+    command.add_argument('--output', help="输出文件，默认按表名和时间生成")
+    command.add_argument('--start', type=date.fromisoformat, help="开始日期（含），例如 2024-01-01")
+    command.add_argument('--end', type=date.fromisoformat, help="结束日期（含）")
+    command.add_argument('--product-id', type=int, help="只导出该商品的记录（系统日志不适用）")
+    command.add_argument('--operator-id', type=int, help="只导出该操作员的记录")
+    command.add_argument('--batch-size', type=int, default=warehouse_core.EXPORT_BATCH_SIZE,
+                         help="每批读取并写出的行数")
+    command.set_defaults(handler=export)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
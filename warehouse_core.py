@@ -0,0 +1,3335 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import atexit
+import base64
+import concurrent.futures
+import gzip
+import hashlib
+import heapq
+import hmac
+import io
+import json
+import os
+import pyodbc
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+# ==================== 数据库配置部分 ====================
+DB_PRIMARY_DSN = os.environ.get('WAREHOUSE_PRIMARY_DSN')  # 主库ODBC连接串，未设置时使用create_connection中的配置
+DB_REPLICA_DSN = os.environ.get('WAREHOUSE_REPLICA_DSN')  # 只读副本ODBC连接串，未设置时所有查询走主库
+DB_CONNECT_TIMEOUT = int(os.environ.get('WAREHOUSE_CONNECT_TIMEOUT', 5))  # 建立连接的超时时间（秒）
+DB_QUERY_TIMEOUT = int(os.environ.get('WAREHOUSE_QUERY_TIMEOUT', 30))  # 单条语句的执行超时时间（秒），0为不限制
+
+
+def create_connection(dsn=None):
+    server = 'localhost'  # 数据库服务器地址
+    database = '仓库管理系统'  # 数据库名称
+    username = 'your_username'  # 数据库用户名
+    password = 'your_password'  # 数据库密码
+    driver = '{ODBC Driver 17 for SQL Server}'  # ODBC 驱动
+
+    try:
+        conn = pyodbc.connect(
+            dsn or DB_PRIMARY_DSN or
+            f'DRIVER={driver};'
+            f'SERVER={server};'
+            f'DATABASE={database};'
+            f'UID={username};'
+            f'PWD={password}',
+            timeout=DB_CONNECT_TIMEOUT
+        )
+        # 语句执行超过该时间时驱动报HYT00错误，避免数据库变慢时查询线程无限等待
+        conn.timeout = DB_QUERY_TIMEOUT
+        print("数据库连接成功")
+        return conn
+    except Exception as e:
+        print(f"数据库连接失败: {str(e)}")
+        return None
+
+
+def create_replica_connection():
+    """连接只读副本"""
+    return create_connection(DB_REPLICA_DSN)
+
+
+# ==================== 连接池部分 ====================
+# 连接池配置
+POOL_MIN_SIZE = 2  # 预先建立的最少连接数
+POOL_MAX_SIZE = 10  # 同时存在的最多连接数
+POOL_CHECKOUT_TIMEOUT = 5.0  # 借用连接的最长等待时间（秒）
+POOL_MAX_USES = 1000  # 单个连接最多被借用的次数，超过后回收
+POOL_MAX_LIFETIME = 1800  # 单个连接最长存活时间（秒），超过后回收
+POOL_PROBE_QUERY = "SELECT 1"  # 借出前的连接存活检测语句
+POOL_PROBE_IDLE_SECONDS = 30  # 连接空闲超过该时间才在借出前做存活检测
+
+
+class _PooledConnection:
+    """连接池中的一个连接及其使用信息"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class ConnectionPool:
+    """线程安全的数据库连接池，由进程内所有会话共享"""
+
+    def __init__(self, factory, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_CHECKOUT_TIMEOUT, max_uses=POOL_MAX_USES,
+                 max_lifetime=POOL_MAX_LIFETIME, probe_query=POOL_PROBE_QUERY,
+                 probe_idle_seconds=POOL_PROBE_IDLE_SECONDS):
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_lifetime = max_lifetime
+        self.probe_query = probe_query
+        self.probe_idle_seconds = probe_idle_seconds
+
+        self._lock = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._closed = False
+        self._failure = threading.local()  # 本线程上一次借用失败的原因
+
+        # 统计信息
+        self._created = 0
+        self._recycled = 0
+        self._broken = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+        for _ in range(min_size):
+            with self._lock:
+                self._size += 1
+            entry = self._open()
+            if entry is None:
+                break
+            with self._lock:
+                self._idle.append(entry)
+
+    def _open(self):
+        """通过工厂函数建立新连接（调用方已预留名额），失败时返回None"""
+        conn = self.factory()
+        if conn is None:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            return None
+        with self._lock:
+            self._created += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, entry):
+        """关闭并丢弃一个连接"""
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    def _expired(self, entry):
+        """连接是否已达到回收条件"""
+        if self.max_uses and entry.uses >= self.max_uses:
+            return True
+        if self.max_lifetime and time.monotonic() - entry.created_at >= self.max_lifetime:
+            return True
+        return False
+
+    def _alive(self, entry):
+        """借出前检测连接是否可用"""
+        if not self.probe_query:
+            return True
+        if time.monotonic() - entry.last_used < self.probe_idle_seconds:
+            return True
+        try:
+            cursor = entry.conn.cursor()
+            try:
+                cursor.execute(self.probe_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout=None):
+        """从连接池借用一个连接，超时或无法连接时返回None，原因见last_failure()"""
+        self._failure.reason = None
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        wait_start = time.monotonic()
+
+        while True:
+            entry = None
+            with self._lock:
+                while not self._closed and not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._record_wait(waited, wait_start)
+                        print("获取数据库连接超时")
+                        self._failure.reason = 'timeout'
+                        return None
+                    waited = True
+                    self._lock.wait(remaining)
+                if self._closed:
+                    self._failure.reason = 'closed'
+                    return None
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    # 在锁内预留名额，避免并发建立连接时超过上限
+                    self._size += 1
+
+            if entry is None:
+                entry = self._open()
+                if entry is None:
+                    with self._lock:
+                        self._record_wait(waited, wait_start)
+                    self._failure.reason = 'connect'
+                    return None
+            elif self._expired(entry):
+                with self._lock:
+                    self._recycled += 1
+                self._discard(entry)
+                continue
+            elif not self._alive(entry):
+                with self._lock:
+                    self._broken += 1
+                self._discard(entry)
+                continue
+
+            with self._lock:
+                entry.uses += 1
+                self._in_use[id(entry.conn)] = entry
+                self._record_wait(waited, wait_start)
+            return entry.conn
+
+    def last_failure(self):
+        """本线程上一次acquire()返回None的原因：'timeout'（连接池已满，等待超时）、'connect'（无法建立连接）或'closed'"""
+        return getattr(self._failure, 'reason', None)
+
+    def _record_wait(self, waited, wait_start):
+        """记录等待次数与等待时间（调用方需持有锁）"""
+        if waited:
+            self._waits += 1
+            self._wait_time += time.monotonic() - wait_start
+
+    def release(self, conn, broken=False, dirty=True):
+        """归还连接；broken为True或连接状态异常时直接丢弃
+
+        dirty为True时（写入、工作单元之后或出错后，借用者可能留下未提交的事务）先回滚；
+        只执行了成功的SELECT时传入False，省去每次归还的一次往返。
+        """
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            return
+
+        if not broken and dirty:
+            try:
+                # 清理未提交的事务，保证下一个借用者拿到干净的连接
+                conn.rollback()
+            except Exception:
+                broken = True
+
+        if broken:
+            with self._lock:
+                self._broken += 1
+            self._discard(entry)
+        elif self._closed or self._expired(entry):
+            if not self._closed:
+                with self._lock:
+                    self._recycled += 1
+            self._discard(entry)
+        else:
+            with self._lock:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                self._lock.notify()
+
+    def stats(self):
+        """返回连接池统计信息"""
+        with self._lock:
+            return {
+                'size': self._size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'created': self._created,
+                'recycled': self._recycled,
+                'broken': self._broken,
+                'waits': self._waits,
+                'wait_time': self._wait_time,
+                'timeouts': self._timeouts,
+            }
+
+    def close(self):
+        """关闭连接池中的所有空闲连接，借出的连接归还时关闭"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+
+@st.experimental_singleton
+def get_connection_pool():
+    """获取进程内共享的连接池"""
+    return ConnectionPool(create_connection)
+
+
+@st.experimental_singleton
+def get_replica_pool():
+    """获取进程内共享的只读副本连接池，未配置副本时返回None"""
+    if not DB_REPLICA_DSN:
+        return None
+    return ConnectionPool(create_replica_connection)
+
+
+# ==================== 故障处理部分 ====================
+DB_READ_RETRIES = 2  # 只读查询遇到暂时性错误时的最多重试次数；写入不重试
+DB_RETRY_BASE_DELAY = 0.1  # 第一次重试前的最长等待时间（秒），之后每次翻倍，实际等待在其中随机取值
+DB_RETRY_MAX_DELAY = 2.0  # 单次重试等待时间的上限（秒）
+DB_TRANSIENT_SQLSTATES = {'08S01', '08001', '08004', 'HYT01', '40001'}  # 可重试的错误：连接中断、无法连接、连接超时、死锁
+DB_TIMEOUT_SQLSTATE = 'HYT00'  # 语句执行超时：不重试，避免数据库繁忙时加重负载
+DB_BREAKER_FAILURES = 5  # 连续失败达到该次数后熔断，0为不熔断
+DB_BREAKER_RESET_TIMEOUT = 15.0  # 熔断后经过该时间（秒）放行一次试探查询
+
+
+def _sqlstate(error):
+    """返回数据库错误的SQLSTATE，其他错误返回None"""
+    if isinstance(error, pyodbc.Error) and error.args and isinstance(error.args[0], str):
+        return error.args[0]
+    return None
+
+
+def _is_connection_error(error):
+    """连接与通信错误（OperationalError、InterfaceError，含语句超时）：归还时丢弃连接，并计入熔断
+
+    连接池已满时等待连接超时、SQL语句本身的错误不计入，连接池饱和不会使熔断器打开。
+    """
+    return isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError))
+
+
+def _is_retryable_error(error):
+    """只读查询可以重试的暂时性错误"""
+    state = _sqlstate(error)
+    return (_is_connection_error(error) or state in DB_TRANSIENT_SQLSTATES) and state != DB_TIMEOUT_SQLSTATE
+
+
+def _retry_delay(attempt, base=DB_RETRY_BASE_DELAY, cap=DB_RETRY_MAX_DELAY):
+    """第attempt次重试前的等待时间：指数增长的上限内随机取值，避免多个线程同时重试"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+_NO_CONNECTION = pyodbc.OperationalError('08001', "无法获取数据库连接")
+_POOL_EXHAUSTED = RuntimeError("获取数据库连接超时（连接池已满）")
+_CIRCUIT_OPEN = RuntimeError("数据库暂时不可用（已熔断）")
+
+
+class CircuitBreaker:
+    """数据库熔断器
+
+    连续failure_threshold次数据库不可用类的失败后熔断，熔断期间查询直接失败、不再等待连接；
+    经过reset_timeout后放行一次试探查询，成功则恢复，失败则重新计时。
+    """
+
+    def __init__(self, failure_threshold=DB_BREAKER_FAILURES, reset_timeout=DB_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = 'closed'  # closed: 正常；open: 熔断；half_open: 等待试探查询的结果
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False  # 半开状态下是否已放行试探查询
+
+        # 统计信息
+        self._opens = 0
+        self._rejected = 0
+
+    def allow(self):
+        """是否放行一次查询；熔断期间及半开状态下试探查询未结束时返回False"""
+        # 正常状态下不加锁，每条查询只多一次属性读取
+        if not self.failure_threshold or self._state == 'closed':
+            return True
+        with self._lock:
+            if self._state == 'closed':
+                return True
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = 'half_open'
+                self._trial = False
+            if self._state == 'half_open' and not self._trial:
+                self._trial = True
+                return True
+            self._rejected += 1
+            return False
+
+    def is_open(self):
+        """是否处于熔断中（不改变状态，也不占用试探名额）"""
+        with self._lock:
+            return self._state == 'open' and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def record_success(self):
+        """查询得到了数据库的响应（包括语句本身的错误），清零失败次数并恢复"""
+        if self._state == 'closed' and not self._failures:
+            return
+        with self._lock:
+            if self._state != 'closed':
+                print("数据库已恢复，解除熔断")
+            self._state = 'closed'
+            self._failures = 0
+            self._trial = False
+
+    def record_skipped(self):
+        """查询没有到达数据库（如连接池已满），不计成功或失败，只交还半开状态下的试探名额"""
+        if self._state == 'closed':
+            return
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        """记录一次数据库不可用类的失败，达到阈值或试探失败时熔断"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state == 'closed':
+                    print(f"数据库连续 {self._failures} 次失败，熔断 {self.reset_timeout:g} 秒")
+                    self._opens += 1
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def stats(self):
+        """返回熔断器统计信息"""
+        with self._lock:
+            return {
+                'state': self._state,
+                'failures': self._failures,
+                'opens': self._opens,
+                'rejected': self._rejected,
+                'open_for': time.monotonic() - self._opened_at if self._state != 'closed' else None,
+            }
+
+
+@st.experimental_singleton
+def get_circuit_breaker():
+    """获取进程内共享的主库熔断器"""
+    return CircuitBreaker()
+
+
+# ==================== 读写分离部分 ====================
+REPLICA_MAX_STALENESS = 5.0  # 允许副本落后主库的最长时间（秒），超过时读取回退到主库
+REPLICA_CHECK_INTERVAL = 10.0  # 检查副本延迟的间隔（秒）
+READ_YOUR_WRITES_WINDOW = REPLICA_MAX_STALENESS  # 会话写入后在此时间内的读取走主库（秒）
+
+# 延迟检查：每次检查向主库写入心跳值（毫秒时间戳），再从副本读出已同步的心跳值
+REPLICA_HEARTBEAT_SCHEMA_SQL = """
+IF OBJECT_ID(N'复制心跳', N'U') IS NULL
+    CREATE TABLE 复制心跳 (编号 INT NOT NULL PRIMARY KEY, 心跳值 BIGINT NOT NULL);
+"""
+REPLICA_HEARTBEAT_READ_SQL = "SELECT 心跳值 FROM 复制心跳 WHERE 编号 = 1"
+REPLICA_HEARTBEAT_UPDATE_SQL = "UPDATE 复制心跳 SET 心跳值 = ? WHERE 编号 = 1"
+REPLICA_HEARTBEAT_INSERT_SQL = "INSERT INTO 复制心跳 (编号, 心跳值) VALUES (1, ?)"
+
+
+class ReplicaMonitor:
+    """只读副本的延迟监测
+
+    副本延迟取最早一个尚未同步到副本的心跳的等待时间；副本不可达、没有心跳或延迟超过上限时
+    判定为不可用，读取回退到主库，直到下一次检查恢复。同时记录各数据表最近一次写入的时间，
+    写入后上限时间内的缓存查询走主库，避免把副本上的旧数据写入共享缓存。
+    """
+
+    def __init__(self, max_staleness=REPLICA_MAX_STALENESS, check_interval=REPLICA_CHECK_INTERVAL):
+        self.max_staleness = max_staleness
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._checking = False
+        self._schema_checked = False
+        self._pending = deque()  # 已写入主库、尚未在副本上看到的心跳值
+        self._healthy = None  # 尚未检查
+        self._lag = None
+        self._checked_at = None
+        self._table_writes = {}  # 数据表 -> 最近写入时间
+        self._fallbacks = 0
+
+    def usable(self, db):
+        """副本当前是否可以承担读取；到达检查间隔时先检查（同一时刻只有一个线程检查）"""
+        with self._lock:
+            due = self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+            check = due and not self._checking
+            if check:
+                self._checking = True
+        if check:
+            try:
+                self.check(db)
+            finally:
+                with self._lock:
+                    self._checking = False
+        with self._lock:
+            return bool(self._healthy)
+
+    def check(self, db):
+        """读取副本上的心跳计算延迟，再向主库写入新的心跳；返回延迟秒数，副本不可用时返回None"""
+        if not self._schema_checked:
+            # 心跳表由程序在主库上创建，通过复制出现在副本上
+            db._execute(db.pool, REPLICA_HEARTBEAT_SCHEMA_SQL, None, False)
+            self._schema_checked = True
+        replica = db._execute(db.replica_pool, REPLICA_HEARTBEAT_READ_SQL, None, True)
+        now_ms = int(time.time() * 1000)
+        lag = None
+        with self._lock:
+            if replica is not None and not replica.empty:
+                seen = int(replica['心跳值'].iloc[0])
+                while self._pending and self._pending[0] <= seen:
+                    self._pending.popleft()
+                if self._pending:
+                    lag = (now_ms - self._pending[0]) / 1000
+                elif self._checked_at is None:
+                    # 首次检查时还没有写入过心跳，按副本上已有的心跳估计
+                    lag = max(0.0, (now_ms - seen) / 1000)
+                else:
+                    lag = 0.0
+            was_healthy = self._healthy
+            self._lag = lag
+            self._healthy = lag is not None and lag <= self.max_staleness
+            self._checked_at = time.monotonic()
+
+        updated = db._execute(db.pool, REPLICA_HEARTBEAT_UPDATE_SQL, (now_ms,), False)
+        if updated == 0:
+            updated = db._execute(db.pool, REPLICA_HEARTBEAT_INSERT_SQL, (now_ms,), False)
+        if updated:
+            with self._lock:
+                self._pending.append(now_ms)
+        if was_healthy != self._healthy:
+            print("只读副本已恢复，读取回到副本" if self._healthy
+                  else f"只读副本不可用或延迟过大（延迟: {lag}），读取暂时回退到主库")
+        return lag
+
+    def mark_failed(self):
+        """副本查询失败时标记为不可用，等待下一次检查"""
+        with self._lock:
+            self._healthy = False
+            self._fallbacks += 1
+
+    def note_write(self, *tables):
+        """记录数据表的写入时间"""
+        now = time.monotonic()
+        with self._lock:
+            for table in tables:
+                self._table_writes[table] = now
+
+    def recent_write(self, table):
+        """数据表是否在副本允许的延迟内被写入过"""
+        with self._lock:
+            written = self._table_writes.get(table)
+        return written is not None and time.monotonic() - written < self.max_staleness
+
+    def stats(self):
+        """返回副本监测统计信息"""
+        with self._lock:
+            return {
+                'healthy': self._healthy,
+                'lag': self._lag,
+                'pending_heartbeats': len(self._pending),
+                'fallbacks': self._fallbacks,
+                'age': None if self._checked_at is None else time.monotonic() - self._checked_at,
+            }
+
+
+@st.experimental_singleton
+def get_replica_monitor():
+    """获取进程内共享的副本延迟监测"""
+    return ReplicaMonitor()
+
+
+# ==================== 性能监控部分 ====================
+PERF_MONITOR_ENABLED = os.environ.get('WAREHOUSE_PERF_MONITOR', '1') != '0'  # 是否记录查询与页面耗时
+PERF_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # 耗时直方图分桶上限（秒）
+PERF_MAX_SERIES = 500  # 最多分别统计的查询指纹数，超出的查询并入"其他"
+PERF_FINGERPRINT_LENGTH = 300  # 查询指纹的最大长度
+PERF_TOP_N = 20  # 性能监控页面显示的最慢查询和页面数
+
+_SQL_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_SQL_NUMBER_LITERAL = re.compile(r"(?<![\w\]])-?\d+(?:\.\d+)?\b")
+_SQL_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SQL_WHITESPACE = re.compile(r"\s+")
+
+
+def _fingerprint_uncached(query):
+    """把SQL中的字面量替换为?、合并空白，得到同一类查询共用的指纹"""
+    text = _SQL_STRING_LITERAL.sub('?', query)
+    text = _SQL_NUMBER_LITERAL.sub('?', text)
+    text = _SQL_VALUE_LIST.sub('(?)', text)
+    text = _SQL_WHITESPACE.sub(' ', text).strip()
+    return text[:PERF_FINGERPRINT_LENGTH]
+
+
+_fingerprints = {}  # 查询文本 -> 指纹；程序中的查询文本种类有限
+
+
+def query_fingerprint(query):
+    """返回查询指纹"""
+    fingerprint = _fingerprints.get(query)
+    if fingerprint is None:
+        fingerprint = _fingerprint_uncached(query)
+        if len(_fingerprints) < PERF_MAX_SERIES * 4:
+            _fingerprints[query] = fingerprint
+    return fingerprint
+
+
+def _frame_nbytes(frame):
+    """按每个值8字节估计结果大小（数值、时间列的实际大小，文本列只计引用）；逐列统计会明显拖慢小查询"""
+    rows, columns = frame.shape
+    return rows * columns * 8
+
+
+class _Series:
+    """一个查询指纹或页面的累计耗时直方图"""
+
+    __slots__ = ('buckets', 'count', 'total', 'max', 'rows', 'bytes', 'errors')
+
+    def __init__(self, bucket_count):
+        self.buckets = [0] * (bucket_count + 1)  # 最后一个桶为超过最大上限的次数
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def quantile(self, bounds, q):
+        """按直方图估计分位数，在所在桶内线性插值"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                low = bounds[i - 1] if i > 0 else 0.0
+                high = bounds[i] if i < len(bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class PerformanceMetrics:
+    """进程内的查询、页面与启动耗时统计，可导出为Prometheus文本格式或JSON"""
+
+    kinds = ('query', 'page', 'startup')  # 统计类型：数据库查询、页面渲染、启动与重新运行的各阶段
+
+    def __init__(self, buckets=PERF_BUCKETS, max_series=PERF_MAX_SERIES):
+        self.bounds = tuple(buckets)
+        self.max_series = max_series
+
+        self._lock = threading.Lock()
+        self._series = {kind: {} for kind in self.kinds}  # 类型 -> 名称 -> _Series
+        self._started = time.time()
+
+    def _observe(self, kind, name, seconds, rows=0, nbytes=0, error=False):
+        index = 0
+        bounds = self.bounds
+        while index < len(bounds) and seconds > bounds[index]:
+            index += 1
+        with self._lock:
+            series = self._series[kind]
+            item = series.get(name)
+            if item is None:
+                if len(series) >= self.max_series:
+                    name = '其他'
+                    item = series.get(name)
+                if item is None:
+                    item = series[name] = _Series(len(bounds))
+            item.buckets[index] += 1
+            item.count += 1
+            item.total += seconds
+            if seconds > item.max:
+                item.max = seconds
+            item.rows += rows
+            item.bytes += nbytes
+            if error:
+                item.errors += 1
+
+    def observe_query(self, query, seconds, result):
+        """记录一次查询的耗时、返回行数和结果的大致字节数；result为None表示查询失败"""
+        if isinstance(result, pd.DataFrame):
+            rows, nbytes = len(result), _frame_nbytes(result)
+        elif isinstance(result, int):
+            rows, nbytes = max(result, 0), 0
+        else:
+            rows, nbytes = 0, 0
+        self._observe('query', query_fingerprint(query), seconds, rows, nbytes, error=result is None)
+
+    def observe_stream(self, query, seconds, rows, nbytes, error=False):
+        """记录一次流式查询的总耗时与总行数"""
+        self._observe('query', query_fingerprint(query), seconds, rows, nbytes, error)
+
+    def observe_page(self, page, seconds):
+        """记录一次页面渲染的耗时"""
+        self._observe('page', page, seconds)
+
+    def observe_startup(self, phase, seconds):
+        """记录一次启动或重新运行中某个阶段的耗时，如'冷启动/导入模块'、'重新运行'"""
+        self._observe('startup', phase, seconds)
+
+    def reset(self):
+        """清空全部统计"""
+        with self._lock:
+            self._series = {kind: {} for kind in self.kinds}
+            self._started = time.time()
+
+    def _snapshot(self, kind):
+        with self._lock:
+            return [(name, item.count, item.total, item.max, item.rows, item.bytes, item.errors,
+                     list(item.buckets)) for name, item in self._series[kind].items()]
+
+    def summary(self, kind='query', top=None, order_by='p95'):
+        """返回统计表：次数、总耗时、平均与p50/p95/p99/最大耗时（毫秒）、行数、字节数，按order_by降序"""
+        records = []
+        for name, count, total, maximum, rows, nbytes, errors, buckets in self._snapshot(kind):
+            item = _Series(len(self.bounds))
+            item.buckets, item.count, item.max = buckets, count, maximum
+            records.append({
+                '名称': name,
+                '次数': count,
+                '总耗时(秒)': round(total, 3),
+                '平均(毫秒)': round(total / count * 1000, 2),
+                'p50(毫秒)': round(item.quantile(self.bounds, 0.50) * 1000, 2),
+                'p95(毫秒)': round(item.quantile(self.bounds, 0.95) * 1000, 2),
+                'p99(毫秒)': round(item.quantile(self.bounds, 0.99) * 1000, 2),
+                '最大(毫秒)': round(maximum * 1000, 2),
+                '行数': rows,
+                '字节数': nbytes,
+                '失败': errors,
+            })
+        columns = ['名称', '次数', '总耗时(秒)', '平均(毫秒)', 'p50(毫秒)', 'p95(毫秒)', 'p99(毫秒)',
+                   '最大(毫秒)', '行数', '字节数', '失败']
+        frame = pd.DataFrame(records, columns=columns)
+        if kind != 'query':
+            frame = frame.drop(columns=['行数', '字节数', '失败'])
+        sort_column = {'p95': 'p95(毫秒)', 'total': '总耗时(秒)', 'count': '次数'}.get(order_by, order_by)
+        frame = frame.sort_values(sort_column, ascending=False).reset_index(drop=True)
+        return frame.head(top) if top else frame
+
+    def to_json(self):
+        """导出为JSON文本，直方图为各桶的非累计次数"""
+        data = {'started': self._started, 'buckets': list(self.bounds)}
+        for kind in self.kinds:
+            data[kind] = [
+                {'name': name, 'count': count, 'sum': total, 'max': maximum, 'rows': rows,
+                 'bytes': nbytes, 'errors': errors, 'histogram': buckets}
+                for name, count, total, maximum, rows, nbytes, errors, buckets in self._snapshot(kind)
+            ]
+        return json.dumps(data, ensure_ascii=False)
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        lines = []
+        for kind, label, help_text in (('query', 'query', "数据库查询耗时"), ('page', 'page', "页面渲染耗时"),
+                                       ('startup', 'phase', "启动与重新运行各阶段耗时")):
+            metric = f"warehouse_{kind}_duration_seconds"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            snapshot = self._snapshot(kind)
+            for name, count, total, _, _, _, _, buckets in snapshot:
+                name = _prometheus_label(name)
+                cumulative = 0
+                for bound, n in zip(self.bounds, buckets):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {count}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {total:.6f}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {count}')
+            if kind == 'query':
+                for metric, index, help_text in (('warehouse_query_rows_total', 4, "查询返回或影响的行数"),
+                                                 ('warehouse_query_bytes_total', 5, "查询结果的大致字节数"),
+                                                 ('warehouse_query_errors_total', 6, "查询失败次数")):
+                    lines.append(f"# HELP {metric} {help_text}")
+                    lines.append(f"# TYPE {metric} counter")
+                    for item in snapshot:
+                        lines.append(f'{metric}{{query="{_prometheus_label(item[0])}"}} {item[index]}')
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_label(value):
+    """转义Prometheus标签值"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+@st.experimental_singleton
+def get_performance_metrics():
+    """获取进程内共享的性能统计"""
+    return PerformanceMetrics()
+
+
+# ==================== 查询缓存部分 ====================
+# 查询缓存配置
+CACHE_MAX_ENTRIES = 256  # 缓存的最多查询结果数，超过后按最近最少使用淘汰
+CACHE_TTL = {  # 各数据表查询结果的有效期（秒）
+    '商品信息': 300,
+    '用户账户': 300,
+}
+CACHE_DEFAULT_TTL = 60  # 未单独配置的数据表使用的有效期（秒）
+CACHE_STALE_TTL = 3600  # 过期结果继续保留的时间（秒），数据库不可用时作为过期数据返回
+
+
+class QueryCache:
+    """线程安全的查询结果缓存，按数据表设置有效期并在写入后失效"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=None, default_ttl=CACHE_DEFAULT_TTL,
+                 stale_ttl=CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = dict(CACHE_TTL if ttl is None else ttl)
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (数据表, 查询键) -> (过期时间, 写入时间, 结果)
+        self._generations = {}  # 数据表 -> 失效次数，用于丢弃失效前开始的查询结果
+        self._hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+
+    def get(self, table, key):
+        """读取缓存结果，未命中或已过期时返回None"""
+        cache_key = (table, key)
+        with self._lock:
+            item = self._entries.get(cache_key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires_at, _, value = item
+            now = time.monotonic()
+            if now >= expires_at:
+                # 过期结果保留stale_ttl，供数据库不可用时读取
+                if now >= expires_at + self.stale_ttl:
+                    del self._entries[cache_key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self._hits += 1
+        # 缓存由所有会话共享，返回副本避免页面修改影响其他会话
+        return value.copy() if isinstance(value, pd.DataFrame) else value
+
+    def get_stale(self, table, key):
+        """读取缓存结果（包括已过期但仍保留的），返回 (结果, 已缓存的秒数)，没有时返回None
+
+        数据表被写入失效后的结果不会保留，因此不会返回已知被修改过的数据。
+        """
+        with self._lock:
+            item = self._entries.get((table, key))
+            if item is None:
+                return None
+            expires_at, stored_at, value = item
+            now = time.monotonic()
+            if now >= expires_at + self.stale_ttl:
+                del self._entries[(table, key)]
+                return None
+            self._stale_hits += 1
+        return (value.copy() if isinstance(value, pd.DataFrame) else value), now - stored_at
+
+    def generation(self, table):
+        """返回数据表当前的失效次数"""
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def put(self, table, key, value, ttl=None, generation=None):
+        """写入缓存结果；查询期间数据表已失效时不写入"""
+        if ttl is None:
+            ttl = self.ttl.get(table, self.default_ttl)
+        if isinstance(value, pd.DataFrame):
+            value = value.copy()
+        with self._lock:
+            if generation is not None and self._generations.get(table, 0) != generation:
+                return
+            now = time.monotonic()
+            self._entries[(table, key)] = (now + ttl, now, value)
+            self._entries.move_to_end((table, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tables):
+        """清除指定数据表的全部缓存结果"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            for cache_key in [k for k in self._entries if k[0] in tables]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        """清除全部缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._hits, 'misses': self._misses,
+                    'stale_hits': self._stale_hits}
+
+
+@st.experimental_singleton
+def get_query_cache():
+    """获取进程内共享的查询缓存"""
+    return QueryCache()
+
+
+# ==================== 用户认证部分 ====================
+# 密码哈希配置
+PASSWORD_HASH_ALGORITHM = 'pbkdf2_sha256'
+PASSWORD_HASH_ITERATIONS = 260000  # 哈希迭代次数（工作因子），调整后旧密码在下次登录时自动重新哈希
+PASSWORD_SALT_BYTES = 16
+AUTH_CACHE_TTL = 30  # 登录成功结果的缓存时间（秒）
+AUTH_NEGATIVE_CACHE_TTL = 5  # 登录失败结果的缓存时间（秒）
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def hash_password(password, iterations=PASSWORD_HASH_ITERATIONS):
+    """生成加盐的密码哈希，格式为 算法$迭代次数$盐$哈希"""
+    salt = os.urandom(PASSWORD_SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{PASSWORD_HASH_ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password, stored):
+    """校验密码，返回 (是否正确, 是否需要重新哈希)；空密码或账户没有设置密码时一律不通过"""
+    if not password or not stored or not isinstance(stored, str):
+        return False, False
+    if not stored.startswith(PASSWORD_HASH_ALGORITHM + '$'):
+        # 兼容尚未迁移的明文密码，校验通过后需要重新哈希
+        ok = hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+        return ok, ok
+
+    try:
+        _, iterations, salt, expected = stored.split('$')
+        iterations = int(iterations)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), _b64decode(salt), iterations)
+        ok = hmac.compare_digest(digest, _b64decode(expected))
+    except ValueError:
+        return False, False
+    return ok, ok and iterations != PASSWORD_HASH_ITERATIONS
+
+
+class AuthCache(QueryCache):
+    """登录结果缓存，密码只以带密钥的摘要形式作为缓存键"""
+
+    def __init__(self, max_entries=1024):
+        # 登录结果过期后不保留，数据库不可用时不以旧结果放行登录
+        super().__init__(max_entries=max_entries, ttl={'用户账户': AUTH_CACHE_TTL}, stale_ttl=0)
+        self._secret = os.urandom(32)
+
+    def key(self, username, password):
+        """生成登录结果的缓存键"""
+        fingerprint = hmac.new(self._secret, password.encode('utf-8'), hashlib.sha256).digest()
+        return username, fingerprint
+
+
+@st.experimental_singleton
+def get_auth_cache():
+    """获取进程内共享的登录结果缓存"""
+    return AuthCache()
+
+
+# ==================== 记录分页部分 ====================
+RECORD_PAGE_SIZE = 100  # 记录页面每页显示的行数
+
+
+def _as_datetime(value, next_day=False):
+    """把日期筛选值转换为datetime；next_day为True时取下一天零点，用作不含端点的结束时间"""
+    if isinstance(value, datetime):
+        return value
+    if next_day:
+        value = value + timedelta(days=1)
+    return datetime.combine(value, datetime.min.time())
+
+
+def _to_python(value):
+    """把pandas/numpy标量转换为数据库驱动可接受的Python对象"""
+    if hasattr(value, 'to_pydatetime'):
+        return value.to_pydatetime()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _seek_condition(key_columns):
+    """生成按键集倒序翻页的查询条件，例如 (a < ? OR (a = ? AND b < ?))"""
+    parts = []
+    for i, column in enumerate(key_columns):
+        equals = [f"{c} = ?" for c in key_columns[:i]]
+        parts.append("(" + " AND ".join(equals + [f"{column} < ?"]) + ")")
+    return "(" + " OR ".join(parts) + ")"
+
+
+def _seek_params(cursor):
+    """与_seek_condition对应的参数"""
+    params = []
+    for i in range(len(cursor)):
+        params.extend(cursor[:i + 1])
+    return params
+
+
+def _like_prefix(value):
+    """生成按前缀匹配的LIKE参数（配合 ESCAPE '\\'），值中的\\、%、_、[按字面匹配"""
+    return re.sub(r'([\\%_\[])', r'\\\1', value) + '%'
+
+
+# ==================== 结果读取部分 ====================
+FETCH_BATCH_SIZE = 10000  # 每次从游标读取的行数
+
+# 游标描述中的Python类型对应的numpy类型
+_COLUMN_DTYPES = {int: 'int64', float: 'float64', bool: 'bool', datetime: 'datetime64[us]'}
+# NULL可以直接表示为NaN/NaT的类型
+_NULLABLE_TYPES = {float, datetime}
+
+
+def _column_array(values, type_code):
+    """把一列值转换为数组；数值和时间类型直接使用对应的numpy类型，其余保存为对象数组"""
+    if type_code is None:
+        # 驱动未提供列类型时按第一个非空值判断
+        type_code = next((type(v) for v in values if v is not None), None)
+    dtype = _COLUMN_DTYPES.get(type_code)
+    if dtype is not None and (type_code in _NULLABLE_TYPES or None not in values):
+        try:
+            return np.array(values, dtype=dtype)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _fetch_batches(cursor, batch_size):
+    """用fetchmany分批读取结果，每批转换为按列存放的数组后即释放行对象"""
+    type_codes = [column[1] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield [_column_array(values, type_code) for values, type_code in zip(zip(*rows), type_codes)]
+
+
+def _frame_from_columns(columns, arrays):
+    """由列数组构建DataFrame，允许重复列名"""
+    frame = pd.DataFrame(dict(enumerate(arrays)))
+    frame.columns = columns
+    return frame
+
+
+def _fetch_frame(cursor, batch_size):
+    """分批读取全部结果并逐列拼接为一个DataFrame"""
+    columns = [column[0] for column in cursor.description]
+    parts = [[] for _ in columns]
+    for arrays in _fetch_batches(cursor, batch_size):
+        for column_parts, array in zip(parts, arrays):
+            column_parts.append(array)
+    if not parts or not parts[0]:
+        return pd.DataFrame(columns=columns)
+
+    arrays = []
+    for column_parts in parts:
+        arrays.append(column_parts[0] if len(column_parts) == 1 else np.concatenate(column_parts))
+        # 拼接后立即释放分块，降低峰值内存
+        column_parts.clear()
+    return _frame_from_columns(columns, arrays)
+
+
+# ==================== 记录明细部分 ====================
+# 记录页面直接由SQL连接出商品名称和操作员，避免读取整张商品表、用户表后在pandas中合并
+STOCK_IN_DETAIL_SQL = """
+    SELECT r.入库单号, r.商品编号, p.商品名称, r.数量, r.入库时间, r.供应商,
+           r.操作员编号, u.用户名 AS 操作员
+    FROM 入库记录 r
+    LEFT JOIN 商品信息 p ON p.商品编号 = r.商品编号
+    LEFT JOIN 用户账户 u ON u.用户编号 = r.操作员编号
+"""
+STOCK_OUT_DETAIL_SQL = """
+    SELECT r.出库单号, r.商品编号, p.商品名称, r.数量, r.出库时间, r.客户名称,
+           r.操作员编号, u.用户名 AS 操作员
+    FROM 出库记录 r
+    LEFT JOIN 商品信息 p ON p.商品编号 = r.商品编号
+    LEFT JOIN 用户账户 u ON u.用户编号 = r.操作员编号
+"""
+LOG_DETAIL_TEMPLATE = """
+    SELECT l.日志编号, l.操作时间, l.操作类型, l.详细信息, l.用户编号, u.用户名
+    FROM {source} l
+    LEFT JOIN 用户账户 u ON u.用户编号 = l.用户编号
+"""
+LOG_DETAIL_SQL = LOG_DETAIL_TEMPLATE.format(source='系统日志')
+
+# 各记录表的明细查询，以及增量读取使用的自增单号列
+RECORD_SOURCES = {
+    '入库记录': (STOCK_IN_DETAIL_SQL, '入库单号'),
+    '出库记录': (STOCK_OUT_DETAIL_SQL, '出库单号'),
+    '系统日志': (LOG_DETAIL_SQL, '日志编号'),
+}
+
+# 各记录页面显示的列
+STOCK_IN_COLUMNS = ['入库单号', '商品名称', '数量', '入库时间', '供应商', '操作员']
+STOCK_OUT_COLUMNS = ['出库单号', '商品名称', '数量', '出库时间', '客户名称', '操作员']
+LOG_COLUMNS = ['操作时间', '操作类型', '详细信息', '用户名']
+
+
+# ==================== 紧凑类型部分 ====================
+COMPACT_FRAMES = os.environ.get('WAREHOUSE_COMPACT_FRAMES', '1') != '0'  # 是否把读取的数据表转换为紧凑类型
+# 编号和数量列使用与数据库INT一致的32位整数；值超出范围或含NULL时保持原类型
+COMPACT_INT_COLUMNS = {
+    '商品编号': 'int32', '入库单号': 'int32', '出库单号': 'int32', '日志编号': 'int32',
+    '用户编号': 'int32', '操作员编号': 'int32', '分类编号': 'int32',
+    '数量': 'int32', '安全库存': 'int32', '当前库存量': 'int32',
+}
+COMPACT_TIME_COLUMNS = {'入库时间', '出库时间', '操作时间'}  # 驱动返回文本时解析为datetime64
+# 取值重复较多的文本列，不同取值占行数的比例不超过上限时转换为分类类型
+COMPACT_CATEGORY_COLUMNS = {'单位', '规格型号', '角色', '操作类型', '供应商', '客户名称', '商品名称', '操作员', '用户名'}
+COMPACT_MIN_ROWS = 1000  # 行数少于此值的结果不转换：节省很少，逐列转换的开销却与单页查询相当
+COMPACT_CATEGORY_MAX_RATIO = 0.5  # 不同取值数/行数的上限
+
+
+def _compact_column(series, name):
+    """按列名把一列转换为紧凑类型，不适用时原样返回"""
+    dtype = COMPACT_INT_COLUMNS.get(name)
+    if dtype is not None:
+        if series.dtype.kind in 'iu' and series.dtype.itemsize > np.dtype(dtype).itemsize:
+            info = np.iinfo(dtype)
+            if series.empty or (series.min() >= info.min and series.max() <= info.max):
+                return series.astype(dtype)
+        return series
+    if series.dtype != object:
+        return series
+    if name in COMPACT_TIME_COLUMNS:
+        converted = pd.to_datetime(series, errors='coerce')
+        # 只有全部非空值都能解析时才转换
+        return converted if converted.count() == series.count() else series
+    if name in COMPACT_CATEGORY_COLUMNS and series.nunique() <= len(series) * COMPACT_CATEGORY_MAX_RATIO:
+        return series.astype('category')
+    return series
+
+
+def compact_frame(frame):
+    """把查询结果中的编号、数量、时间和重复文本列转换为紧凑类型（原地修改并返回）"""
+    if frame is None or len(frame) < COMPACT_MIN_ROWS:
+        return frame
+    for i, name in enumerate(frame.columns):
+        column = frame.iloc[:, i]
+        converted = _compact_column(column, name)
+        if converted is not column:
+            frame.isetitem(i, converted)
+    return frame
+
+
+def frame_memory(frame):
+    """DataFrame占用的内存（字节），包含文本列中的字符串"""
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+# 内存占用报告统计的数据表及其查询（与各页面读取的列一致）
+COMPACT_REPORT_QUERIES = {
+    '商品信息': "SELECT * FROM 商品信息",
+    '用户账户': "SELECT 用户编号, 用户名, 角色 FROM 用户账户",
+    '当前库存': "SELECT * FROM 当前库存",
+    '入库记录': f"SELECT * FROM ({STOCK_IN_DETAIL_SQL}) AS 入库明细",
+    '出库记录': f"SELECT * FROM ({STOCK_OUT_DETAIL_SQL}) AS 出库明细",
+    '系统日志': f"SELECT * FROM ({LOG_DETAIL_SQL}) AS 日志明细",
+}
+
+
+# ==================== 日志归档部分 ====================
+LOG_HOT_MONTHS = 3  # 系统日志表保留的月数（当月之前），更早的日志按月移入归档表
+LOG_ARCHIVE_BATCH_SIZE = 10000  # 归档时每条语句移动的行数，避免长时间锁表
+LOG_ARCHIVE_PREFIX = '系统日志_'  # 归档表名前缀，表名形如 系统日志_202401
+LOG_TABLE_COLUMNS = '日志编号, 操作时间, 操作类型, 详细信息, 用户编号'
+
+LOG_ARCHIVE_SCHEMA_SQL = """
+IF OBJECT_ID(N'{table}', N'U') IS NULL
+BEGIN
+    CREATE TABLE {table} (
+        日志编号 BIGINT NOT NULL PRIMARY KEY,
+        操作时间 DATETIME NOT NULL,
+        操作类型 NVARCHAR(50),
+        详细信息 NVARCHAR(MAX),
+        用户编号 INT
+    );
+    CREATE INDEX IX_{table}_操作时间 ON {table} (操作时间, 日志编号);
+END
+"""
+
+# 日志归档时在一条语句中删除并写入归档表，单批内不会丢失或重复
+LOG_ARCHIVE_MOVE_SQL = f"""
+    DELETE TOP (?) FROM 系统日志
+    OUTPUT DELETED.日志编号, DELETED.操作时间, DELETED.操作类型, DELETED.详细信息, DELETED.用户编号
+    INTO {{table}} ({LOG_TABLE_COLUMNS})
+    WHERE 操作时间 >= ? AND 操作时间 < ?
+"""
+
+
+def _month_start(value):
+    """返回日期所在月份的第一天"""
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(month, months):
+    """月份加减，month为某月第一天"""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def log_archive_table(month):
+    """返回某月日志的归档表名"""
+    return f"{LOG_ARCHIVE_PREFIX}{month:%Y%m}"
+
+
+def log_archive_month(table):
+    """由归档表名解析月份，不是归档表时返回None"""
+    match = re.fullmatch(rf"{LOG_ARCHIVE_PREFIX}(\d{{4}})(\d{{2}})", table)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1)
+
+
+def log_hot_cutoff(now=None, hot_months=LOG_HOT_MONTHS):
+    """返回系统日志表保留的最早时间，早于它的日志可以归档"""
+    return _add_months(_month_start(now or datetime.now()), -hot_months)
+
+
+def log_detail_sql(archives=()):
+    """生成系统日志明细查询；archives为需要与系统日志表一并查询的归档表"""
+    if not archives:
+        return LOG_DETAIL_SQL
+    union = " UNION ALL ".join(f"SELECT {LOG_TABLE_COLUMNS} FROM {table}" for table in ('系统日志', *archives))
+    return LOG_DETAIL_TEMPLATE.format(source=f"({union})")
+
+
+# ==================== 批量出入库部分 ====================
+BULK_WRITE_BATCH_SIZE = 5000  # executemany每批发送的行数
+BULK_ERROR_COLUMNS = ['行号', '错误']
+
+
+def _bulk_errors(rows):
+    """把 (行号, 错误) 列表转换为错误明细表"""
+    return pd.DataFrame(rows, columns=BULK_ERROR_COLUMNS)
+
+
+# ==================== 角色权限部分 ====================
+# 管理员的完整菜单；其他角色的菜单见ROLE_MENUS，界面和API按同一规则授权
+MENU_OPTIONS = {
+    "商品管理": ["商品信息", "新增商品"],
+    "入库管理": ["入库记录", "新增入库"],
+    "出库管理": ["出库记录", "新增出库"],
+    "库存管理": ["当前库存", "出入库趋势"],
+    "系统管理": ["用户管理", "系统日志", "性能监控"]
+}
+ROLE_MENUS = {
+    '操作员': {
+        "入库管理": ["新增入库"],
+        "出库管理": ["新增出库"],
+        "库存管理": ["当前库存"]
+    },
+    '经理': {
+        "商品管理": ["商品信息"],
+        "入库管理": ["入库记录", "新增入库"],
+        "出库管理": ["出库记录", "新增出库"],
+        "库存管理": ["当前库存", "出入库趋势"]
+    },
+}
+
+
+def menu_for_role(role):
+    """返回角色可用的菜单"""
+    return ROLE_MENUS.get(role, MENU_OPTIONS)
+
+
+def has_permission(role, category, option):
+    """角色是否可以使用某个菜单功能"""
+    return option in menu_for_role(role).get(category, [])
+
+
+# ==================== 审计日志部分 ====================
+# 审计日志配置
+AUDIT_LOG_ASYNC = True  # 是否由后台线程批量写入系统日志
+AUDIT_QUEUE_MAX_SIZE = 10000  # 待写入日志的最大条数，队列满时调用方等待
+AUDIT_ENQUEUE_TIMEOUT = 1.0  # 队列满时最长等待时间（秒），超时后改为同步写入
+AUDIT_FLUSH_SIZE = 200  # 累积到该条数立即写入
+AUDIT_FLUSH_INTERVAL = 2.0  # 最长写入间隔（秒）
+AUDIT_RETRY_BASE_DELAY = 1.0  # 写入失败后第一次重试前的最长等待时间（秒），之后每次翻倍
+AUDIT_RETRY_MAX_DELAY = 60.0  # 重试等待时间的上限（秒）；因连接错误未写入的日志一直重试，不会丢弃
+AUDIT_SPOOL_PATH = os.environ.get('WAREHOUSE_AUDIT_SPOOL', 'audit_log_spool.jsonl')  # 退出时仍未写入的日志暂存文件
+AUDIT_REJECT_PATH = os.environ.get('WAREHOUSE_AUDIT_REJECTS', 'audit_log_rejected.jsonl')  # 数据库拒绝写入的日志（不重试）
+AUDIT_SYNC_ACTIONS = {'用户添加'}  # 需要同步写入的审计关键操作
+AUDIT_INSERT_ROWS = 500  # 单条INSERT写入的最多行数（SQL Server单条语句最多2100个参数）
+
+_AUDIT_STOP = object()
+
+
+class AuditLogWriter:
+    """后台批量写入系统日志，队列有界，达到条数或时间阈值时用多行INSERT一次写入
+
+    因连接错误写入失败的一批日志按指数退避一直重试，重试期间不再从队列取出新日志，队列满时由提交方等待或同步写入；
+    退出时仍无法写入的日志追加到暂存文件，下次启动写入线程时重新写入数据库。
+    语句本身出错（如某一行违反约束）时改为逐行写入，只有数据库拒绝的行追加到拒收文件，不重试。
+    """
+
+    def __init__(self, pool, max_size=AUDIT_QUEUE_MAX_SIZE, flush_size=AUDIT_FLUSH_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL, enqueue_timeout=AUDIT_ENQUEUE_TIMEOUT,
+                 spool_path=AUDIT_SPOOL_PATH, reject_path=AUDIT_REJECT_PATH):
+        self.pool = pool
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spool_path = spool_path
+        self.reject_path = reject_path
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._closed = False
+        self._stopping = threading.Event()
+        self._failures = 0  # 连续写入失败次数
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._written = 0
+        self._retried = 0
+        self._spooled = 0
+        self._invalid = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._retry = self._load_spool()
+
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, action_type, details, user_id):
+        """提交一条日志；队列已满且等待超时或写入线程已关闭时返回False，由调用方同步写入"""
+        if self._closed:
+            return False
+        entry = (action_type, details, None if user_id is None else int(user_id), datetime.now())
+        try:
+            # 队列满时阻塞调用方形成背压，而不是无限增长内存
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            return False
+        with self._stats_lock:
+            self._submitted += 1
+        return True
+
+    def flush(self, timeout=None):
+        """等待此前提交的日志全部写入"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        """写入剩余日志并停止后台线程，无法写入的日志保存到暂存文件"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stopping.set()
+        try:
+            # 队列已满时写入线程不在等待队列，下一轮会看到停止标志
+            self._queue.put_nowait(_AUDIT_STOP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        """返回写入统计信息"""
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'submitted': self._submitted,
+                'written': self._written,
+                'retried': self._retried,
+                'spooled': self._spooled,
+                'invalid': self._invalid,
+                'dropped': self._dropped,
+                'rejected': self._rejected,
+            }
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, waiters = self._retry, []
+            self._retry = []
+            if batch:
+                # 上一批写入失败：退避等待后只重试这一批，新日志留在有界队列中
+                stop = self._stopping.wait(_retry_delay(self._failures, AUDIT_RETRY_BASE_DELAY,
+                                                        AUDIT_RETRY_MAX_DELAY))
+                item = None
+            else:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                if item is _AUDIT_STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.flush_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            stop = stop or self._stopping.is_set()
+            if stop:
+                # 停止前取出队列中剩余的日志一并写入
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif item is not _AUDIT_STOP:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch, final=stop)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch, final=False):
+        """写入一批日志；因连接错误未写入的日志留待退避后重试，final为True（退出前）时保存到暂存文件"""
+        conn = self.pool.acquire()
+        if not conn:
+            print("系统日志写入失败: 无法获取数据库连接")
+            self._defer(batch, final)
+            return
+
+        broken = False
+        try:
+            try:
+                self._insert(conn, batch)
+                written, pending = len(batch), []
+            except Exception as e:
+                print(f"系统日志写入失败: {str(e)}")
+                broken = _is_connection_error(e)
+                if broken:
+                    written, pending = 0, batch
+                else:
+                    # 语句本身的错误重试也不会成功：逐行写入，只拒收出错的行
+                    written, pending, broken = self._insert_rows(conn, batch)
+        finally:
+            self.pool.release(conn, broken=broken)
+
+        with self._stats_lock:
+            self._written += written
+        if pending:
+            self._defer(pending, final)
+        else:
+            self._failures = 0
+
+    def _insert(self, conn, batch):
+        """用多行INSERT在一个事务中写入一批日志，出错时抛出异常"""
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(batch), AUDIT_INSERT_ROWS):
+                chunk = batch[start:start + AUDIT_INSERT_ROWS]
+                values = ", ".join(["(?, ?, ?, ?)"] * len(chunk))
+                params = [value for entry in chunk for value in entry]
+                cursor.execute(
+                    f"INSERT INTO 系统日志 (操作类型, 详细信息, 用户编号, 操作时间) VALUES {values}", params
+                )
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def _insert_rows(self, conn, batch):
+        """逐行写入并提交，数据库拒绝的行追加到拒收文件
+
+        返回 (写入行数, 因连接错误未写入的行, 连接是否已损坏)。
+        """
+        written, rejected, pending = 0, [], []
+        for i, entry in enumerate(batch):
+            try:
+                conn.rollback()
+                self._insert(conn, [entry])
+                written += 1
+            except Exception as e:
+                if _is_connection_error(e):
+                    pending = batch[i:]
+                    break
+                print(f"系统日志被数据库拒绝（{entry[0]}，{entry[3]}）: {str(e)}")
+                rejected.append(entry)
+        if rejected:
+            self._save(rejected, self.reject_path, f"{len(rejected)} 条系统日志被数据库拒绝，已保存到 {self.reject_path}")
+            with self._stats_lock:
+                self._invalid += len(rejected)
+        return written, pending, bool(pending)
+
+    def _defer(self, batch, final):
+        """因连接错误未写入的日志：退出前保存到暂存文件，否则留待退避后重试"""
+        self._failures += 1
+        if final:
+            if self._save(batch, self.spool_path, f"数据库不可用，{len(batch)} 条系统日志已暂存到 {self.spool_path}"):
+                with self._stats_lock:
+                    self._spooled += len(batch)
+        else:
+            self._retry = batch
+            with self._stats_lock:
+                self._retried += 1
+
+    def _save(self, batch, path, message):
+        """把日志追加到文件（每行一条JSON），成功时打印message并返回True"""
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                for action_type, details, user_id, logged_at in batch:
+                    f.write(json.dumps([action_type, details, user_id, logged_at.isoformat()],
+                                       ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"系统日志保存到 {path} 失败，{len(batch)} 条日志未能保存: {str(e)}")
+            with self._stats_lock:
+                self._dropped += len(batch)
+            return False
+        print(message)
+        return True
+
+    def _load_spool(self):
+        """读取上次退出时暂存的日志，作为第一批重新写入"""
+        if not self.spool_path:
+            return []
+        # 先改名再读取，多个进程同时启动时只有一个进程取得暂存的日志
+        claimed = f"{self.spool_path}.{os.getpid()}"
+        try:
+            os.replace(self.spool_path, claimed)
+        except OSError:
+            return []
+        batch = []
+        try:
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        action_type, details, user_id, logged_at = json.loads(line)
+                        batch.append((action_type, details, user_id, datetime.fromisoformat(logged_at)))
+            os.remove(claimed)
+        except (OSError, ValueError) as e:
+            print(f"读取暂存的系统日志 {claimed} 失败: {str(e)}")
+            return []
+        if batch:
+            print(f"重新写入 {len(batch)} 条暂存的系统日志")
+        return batch
+
+
+@st.experimental_singleton
+def get_audit_writer():
+    """获取进程内共享的系统日志写入线程，进程退出时写完剩余日志"""
+    writer = AuditLogWriter(get_connection_pool())
+    atexit.register(writer.close)
+    return writer
+
+
+# ==================== 工作单元部分 ====================
+class _Transaction:
+    """一个工作单元使用的连接、游标和提交后回调"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor() if conn else None
+        # 无法获取连接时工作单元直接视为失败，其中的操作都返回None
+        self.failed = conn is None
+        self.wrote = False  # 是否执行过写入语句，用于读写分离判断
+        self.committed = False  # 提交成功后置位，调用方据此判断写入是否生效
+        self.after_commit = []
+
+
+# ==================== 库存状态部分 ====================
+STOCK_WARNING_RATIO = 0.5  # 当前库存量高于安全库存的该比例时为"预警"，否则为"严重不足"
+STOCK_STATUS_LABELS = ['正常', '充足', '预警', '严重不足']
+LOW_STOCK_STYLE = 'background-color: #fff2cc'
+
+
+def classify_stock_status(frame, warning_ratio=STOCK_WARNING_RATIO):
+    """按安全库存向量化计算库存状态，返回分类类型的Series
+
+    安全库存为0时为"正常"，高于安全库存为"充足"，高于安全库存的warning_ratio为"预警"，否则为"严重不足"
+    """
+    stock = frame['当前库存量'].to_numpy(dtype='float64')
+    safety = frame['安全库存'].to_numpy(dtype='float64')
+    codes = np.select(
+        [safety == 0, stock > safety, stock > safety * warning_ratio],
+        [0, 1, 2],
+        default=3,
+    )
+    return pd.Series(pd.Categorical.from_codes(codes, STOCK_STATUS_LABELS), index=frame.index)
+
+
+def low_stock_mask(frame):
+    """低于安全库存的商品为True，用于高亮显示"""
+    stock = frame['当前库存量'].to_numpy(dtype='float64')
+    safety = frame['安全库存'].to_numpy(dtype='float64')
+    return (safety > 0) & (stock < safety)
+
+
+# ==================== 库存台账部分 ====================
+LEDGER_RECONCILE_INTERVAL = 300  # 与当前库存视图核对的间隔（秒）
+LEDGER_DRIFT_TOLERANCE = 0  # 核对时允许不一致的商品数，超过时打印警告
+
+
+class InventoryLedger:
+    """进程内库存台账
+
+    从当前库存视图加载一次，库存量按商品编号存放在数组中；出入库成功后按增量更新，
+    单个商品的读取为O(1)，只有完整列表需要O(n)复制。定期重新读取视图核对偏差。
+    同一时间只有一个线程重新读取视图，期间其他线程继续使用现有台账；
+    读取期间发生的出入库增量在加载后重新应用到新台账上。
+    """
+
+    def __init__(self, reconcile_interval=LEDGER_RECONCILE_INTERVAL, drift_tolerance=LEDGER_DRIFT_TOLERANCE):
+        self.reconcile_interval = reconcile_interval
+        self.drift_tolerance = drift_tolerance
+
+        self._lock = threading.RLock()
+        self._loaded_cond = threading.Condition(self._lock)  # 重新加载结束时通知等待的线程
+        self._frame = None  # 视图中除当前库存量以外的列
+        self._ids = None
+        self._quantities = None
+        self._positions = {}  # 商品编号 -> 数组下标
+        self._loaded_at = 0.0
+        self._stale = True
+        self._version = 0  # 每次标记失效时加一，加载期间被标记失效时加载后仍为失效
+        self._reloading = False
+        self._pending = None  # 重新加载期间应用的增量 [(商品编号列表, 增量列表)]，未在加载时为None
+        self._deltas = 0
+        self._reloads = 0
+        self._last_drift = None
+
+    def _load(self, frame):
+        """用视图的查询结果替换台账内容（调用方需持有锁）"""
+        ids = frame['商品编号'].to_numpy(dtype='int64')
+        self._quantities = frame['当前库存量'].fillna(0).to_numpy(dtype='int64').copy()
+        self._frame = frame.drop(columns=['当前库存量'])
+        self._ids = ids
+        self._positions = {product_id: i for i, product_id in enumerate(ids.tolist())}
+        self._loaded_at = time.monotonic()
+        self._stale = False
+
+    def _ensure_loaded(self, loader):
+        """首次使用、被标记失效或到达核对时间时重新读取视图；读取失败时返回False
+
+        已有其他线程在重新读取时，有可用台账的线程直接使用现有台账，没有的线程等待其读取完成。
+        """
+        with self._lock:
+            while True:
+                loaded = self._frame is not None and not self._stale
+                if loaded and time.monotonic() - self._loaded_at < self.reconcile_interval:
+                    return True
+                if not self._reloading:
+                    break
+                if loaded:
+                    return True
+                self._loaded_cond.wait()
+            self._begin_reload()
+        return self._reload(loader, compare=loaded) is not None or loaded
+
+    def _begin_reload(self):
+        """标记开始重新读取视图，之后应用的增量会被记录（调用方需持有锁）"""
+        self._reloading = True
+        self._pending = []
+
+    def _reload(self, loader, compare):
+        """读取视图并替换台账，重新应用读取期间的增量；返回不一致的商品数（compare为False时为0），读取失败时返回None"""
+        version = self._version
+        frame = None
+        drift = None
+        try:
+            frame = loader()
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._reloading = False
+                if frame is not None:
+                    previous = pd.Series(self._quantities, index=self._ids) if compare else None
+                    self._load(frame)
+                    for product_ids, deltas in pending:
+                        self._add_deltas(product_ids, deltas)
+                    if self._version != version:
+                        self._stale = True
+                    drift = 0
+                    if previous is not None:
+                        current = pd.Series(self._quantities, index=self._ids)
+                        previous, current = previous.align(current, fill_value=0)
+                        drift = int((previous != current).sum())
+                        self._last_drift = drift
+                    self._reloads += 1
+                self._loaded_cond.notify_all()
+
+        if drift is not None and drift > self.drift_tolerance:
+            print(f"库存台账与当前库存视图有 {drift} 个商品不一致，已按视图重新加载")
+        return drift
+
+    def snapshot(self, loader):
+        """返回当前库存的完整列表（与当前库存视图的列相同）"""
+        if not self._ensure_loaded(loader):
+            return None
+        with self._lock:
+            frame = self._frame.copy()
+            frame['当前库存量'] = self._quantities.copy()
+        return frame
+
+    def quantity(self, product_id, loader):
+        """返回单个商品的当前库存量，商品不存在时返回None"""
+        if not self._ensure_loaded(loader):
+            return None
+        with self._lock:
+            position = self._positions.get(int(product_id))
+            return None if position is None else int(self._quantities[position])
+
+    def apply_delta(self, product_id, delta):
+        """按出入库数量更新单个商品的库存量"""
+        self.apply_deltas([product_id], [delta])
+
+    def apply_deltas(self, product_ids, deltas):
+        """按出入库数量批量更新库存量；台账中没有的商品会使台账在下次读取时重新加载"""
+        with self._lock:
+            if self._pending is not None:
+                # 正在重新读取视图，读取结果可能不含这次出入库，加载后重新应用
+                self._pending.append((list(product_ids), list(deltas)))
+            if self._frame is None or self._stale:
+                return
+            self._add_deltas(product_ids, deltas)
+
+    def _add_deltas(self, product_ids, deltas):
+        """把增量加到库存量数组上（调用方需持有锁）"""
+        positions = [self._positions.get(int(product_id), -1) for product_id in product_ids]
+        positions = np.asarray(positions, dtype='int64')
+        deltas = np.asarray(deltas, dtype='int64')
+        known = positions >= 0
+        # 同一商品出现多次时np.add.at会逐次累加
+        np.add.at(self._quantities, positions[known], deltas[known])
+        self._deltas += int(known.sum())
+        if not known.all():
+            self._stale = True
+
+    def invalidate(self):
+        """标记台账失效，下次读取时重新加载（商品信息变化后使用）"""
+        with self._lock:
+            self._stale = True
+            self._version += 1
+
+    def reconcile(self, loader):
+        """重新读取视图并与台账比较，返回不一致的商品数；读取失败时返回None
+
+        其他线程正在重新读取时先等待其完成。
+        """
+        with self._lock:
+            while self._reloading:
+                self._loaded_cond.wait()
+            compare = self._frame is not None and not self._stale
+            self._begin_reload()
+        return self._reload(loader, compare=compare)
+
+    def stats(self):
+        """返回台账统计信息"""
+        with self._lock:
+            return {
+                'products': 0 if self._ids is None else len(self._ids),
+                'deltas': self._deltas,
+                'stale': self._stale,
+                'reloading': self._reloading,
+                'reloads': self._reloads,
+                'age': time.monotonic() - self._loaded_at if self._frame is not None else None,
+                'last_drift': self._last_drift,
+            }
+
+
+@st.experimental_singleton
+def get_inventory_ledger():
+    """获取进程内共享的库存台账"""
+    return InventoryLedger()
+
+
+# ==================== 商品索引部分 ====================
+PRODUCT_SEARCH_LIMIT = 20  # 商品搜索返回的最多条数
+PRODUCT_NGRAM_SIZE = 2  # 搜索索引的n-gram长度，中文名称按二元组切分
+PRODUCT_INDEX_REFRESH_INTERVAL = 300  # 重新读取整张商品表核对索引的间隔（秒）
+
+
+def _normalize_search_text(text):
+    """统一搜索文本的大小写与空白"""
+    return ' '.join(str(text or '').lower().split())
+
+
+def _ngrams(text, size=PRODUCT_NGRAM_SIZE):
+    """返回文本中长度为1到size的所有片段"""
+    return {text[i:i + n] for n in range(1, size + 1) for i in range(len(text) - n + 1)}
+
+
+class ProductIndex:
+    """商品编号与名称的进程内索引
+
+    保存 商品编号 -> (商品名称, 规格型号)，并为名称和规格型号建立n-gram倒排表，
+    搜索时先按片段求交集得到候选，再按前缀、长度排序取前k个，无需扫描整张商品表。
+    新增商品只读取比已知最大编号更大的商品，修改商品只更新该商品的条目。
+    """
+
+    def __init__(self, ngram_size=PRODUCT_NGRAM_SIZE, refresh_interval=PRODUCT_INDEX_REFRESH_INTERVAL):
+        self.ngram_size = ngram_size
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.RLock()
+        self._entries = {}  # 商品编号 -> (商品名称, 规格型号)
+        self._texts = {}  # 商品编号 -> 规范化后的搜索文本
+        self._grams = {}  # 片段 -> 商品编号集合
+        self._max_id = 0
+        self._loaded_at = 0.0
+        self._loaded = False
+        self._pending = False  # 有新增商品尚未读入
+
+    def _add(self, product_id, name, spec):
+        """加入或替换单个商品的索引条目（调用方需持有锁）"""
+        self._remove(product_id)
+        name = '' if name is None else str(name)
+        spec = '' if spec is None or (isinstance(spec, float) and np.isnan(spec)) else str(spec)
+        text = _normalize_search_text(name)
+        spec_text = _normalize_search_text(spec)
+        self._entries[product_id] = (name, spec)
+        self._texts[product_id] = (text, spec_text)
+        for gram in _ngrams(text, self.ngram_size) | _ngrams(spec_text, self.ngram_size):
+            self._grams.setdefault(gram, set()).add(product_id)
+        self._max_id = max(self._max_id, product_id)
+
+    def _remove(self, product_id):
+        """删除单个商品的索引条目（调用方需持有锁）"""
+        texts = self._texts.pop(product_id, None)
+        self._entries.pop(product_id, None)
+        if texts is None:
+            return
+        for gram in _ngrams(texts[0], self.ngram_size) | _ngrams(texts[1], self.ngram_size):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._grams[gram]
+
+    def _add_frame(self, frame):
+        """把 商品编号/商品名称/规格型号 查询结果加入索引（调用方需持有锁）"""
+        for product_id, name, spec in zip(frame['商品编号'].tolist(), frame['商品名称'].tolist(),
+                                          frame['规格型号'].tolist()):
+            self._add(int(product_id), name, spec)
+
+    def _ensure_loaded(self, loader):
+        """首次使用或到达核对时间时整表加载，有新增商品时只读取新商品；读取失败时返回False"""
+        with self._lock:
+            due = not self._loaded or time.monotonic() - self._loaded_at >= self.refresh_interval
+            since = None if due else (self._max_id if self._pending else False)
+        if since is False:
+            return True
+
+        frame = loader(since)
+        if frame is None:
+            return self._loaded
+        with self._lock:
+            if since is None:
+                self._entries, self._texts, self._grams, self._max_id = {}, {}, {}, 0
+                self._loaded_at = time.monotonic()
+                self._loaded = True
+            self._add_frame(frame)
+            self._pending = False
+        return True
+
+    def upsert(self, product_id, name, spec):
+        """更新单个商品的名称和规格型号（修改商品后使用）"""
+        with self._lock:
+            if self._loaded:
+                self._add(int(product_id), name, spec)
+
+    def mark_added(self):
+        """标记有新增商品，下次使用时读取编号大于已知最大编号的商品"""
+        with self._lock:
+            self._pending = True
+
+    def invalidate(self):
+        """标记索引失效，下次使用时整表重新加载"""
+        with self._lock:
+            self._loaded = False
+
+    def label(self, product_id, loader):
+        """返回商品的显示名称，同名商品以规格型号和编号区分"""
+        if not self._ensure_loaded(loader):
+            return str(product_id)
+        with self._lock:
+            entry = self._entries.get(int(product_id))
+        if entry is None:
+            return str(product_id)
+        name, spec = entry
+        return f"{name}（{spec}）#{product_id}" if spec else f"{name} #{product_id}"
+
+    def search(self, query, loader, limit=PRODUCT_SEARCH_LIMIT, ids=None):
+        """按名称或规格型号搜索商品，返回最多limit个商品编号
+
+        ids不为None时只在这些商品中搜索；查询为空时按编号返回前limit个商品。
+        """
+        if not self._ensure_loaded(loader):
+            return []
+        text = _normalize_search_text(query)
+        with self._lock:
+            if not text:
+                candidates = self._entries.keys() if ids is None else (int(i) for i in ids if int(i) in self._entries)
+                return heapq.nsmallest(limit, candidates)
+
+            grams = [text[i:i + self.ngram_size] for i in range(max(1, len(text) - self.ngram_size + 1))]
+            postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            if ids is not None:
+                candidates &= {int(i) for i in ids}
+
+            def rank(product_id):
+                name, spec = self._texts[product_id]
+                if name == text:
+                    order = 0
+                elif name.startswith(text):
+                    order = 1
+                elif text in name:
+                    order = 2
+                elif text in spec:
+                    order = 3
+                else:
+                    return None  # 片段都命中但不连续
+                return order, len(name), product_id
+
+            ranked = ((rank(product_id), product_id) for product_id in candidates)
+            return [product_id for key, product_id in heapq.nsmallest(
+                limit, ((key, product_id) for key, product_id in ranked if key is not None))]
+
+    def stats(self):
+        """返回索引统计信息"""
+        with self._lock:
+            return {
+                'products': len(self._entries),
+                'grams': len(self._grams),
+                'pending': self._pending,
+                'age': time.monotonic() - self._loaded_at if self._loaded else None,
+            }
+
+
+@st.experimental_singleton
+def get_product_index():
+    """获取进程内共享的商品索引"""
+    return ProductIndex()
+
+
+# ==================== 出入库汇总部分 ====================
+ROLLUP_REFRESH_INTERVAL = 60  # 两次增量汇总的最短间隔（秒）
+ROLLUP_BATCH_SIZE = 100000  # 命令行补齐汇总时每个事务最多汇总的单号范围，避免首次汇总时事务过大
+ROLLUP_PAGE_BATCH_SIZE = 10000  # 页面读取时每个事务最多汇总的单号范围
+ROLLUP_PAGE_MAX_BATCHES = 5  # 页面读取时每类记录最多汇总的批数，其余留到下次刷新或由命令行补齐
+ROLLUP_TREND_DAYS = 30  # 趋势图默认显示的天数
+ROLLUP_TOP_K = 10  # 排行榜显示的商品数
+
+# 各类出入库记录的汇总来源：(记录表, 单号列, 时间列, 汇总数量列, 汇总笔数列)
+ROLLUP_SOURCES = {
+    '入库': ('入库记录', '入库单号', '入库时间', '入库数量', '入库笔数'),
+    '出库': ('出库记录', '出库单号', '出库时间', '出库数量', '出库笔数'),
+}
+
+# 汇总表与汇总进度表由程序首次使用时创建；汇总进度记录每类记录已汇总到的单号
+ROLLUP_SCHEMA_SQL = """
+IF OBJECT_ID(N'每日出入库汇总', N'U') IS NULL
+    CREATE TABLE 每日出入库汇总 (
+        日期 DATE NOT NULL,
+        商品编号 INT NOT NULL,
+        入库数量 BIGINT NOT NULL DEFAULT 0,
+        入库笔数 INT NOT NULL DEFAULT 0,
+        出库数量 BIGINT NOT NULL DEFAULT 0,
+        出库笔数 INT NOT NULL DEFAULT 0,
+        CONSTRAINT PK_每日出入库汇总 PRIMARY KEY (日期, 商品编号)
+    );
+IF OBJECT_ID(N'汇总进度', N'U') IS NULL
+    CREATE TABLE 汇总进度 (
+        汇总名称 NVARCHAR(20) NOT NULL PRIMARY KEY,
+        最后单号 BIGINT NOT NULL DEFAULT 0,
+        更新时间 DATETIME NOT NULL DEFAULT GETDATE()
+    );
+IF NOT EXISTS (SELECT 1 FROM 汇总进度 WHERE 汇总名称 = N'入库')
+    INSERT INTO 汇总进度 (汇总名称, 最后单号) VALUES (N'入库', 0);
+IF NOT EXISTS (SELECT 1 FROM 汇总进度 WHERE 汇总名称 = N'出库')
+    INSERT INTO 汇总进度 (汇总名称, 最后单号) VALUES (N'出库', 0);
+"""
+
+
+def _rollup_merge_sql(kind):
+    """生成把一段单号范围内的记录按日、按商品合并进汇总表的MERGE语句"""
+    table, key, time_column, quantity_column, count_column = ROLLUP_SOURCES[kind]
+    return f"""
+    MERGE 每日出入库汇总 AS t
+    USING (
+        SELECT CAST({time_column} AS DATE) AS 日期, 商品编号, SUM(数量) AS 数量, COUNT(*) AS 笔数
+        FROM {table}
+        WHERE {key} > ? AND {key} <= ?
+        GROUP BY CAST({time_column} AS DATE), 商品编号
+    ) AS s
+    ON t.日期 = s.日期 AND t.商品编号 = s.商品编号
+    WHEN MATCHED THEN
+        UPDATE SET {quantity_column} = t.{quantity_column} + s.数量, {count_column} = t.{count_column} + s.笔数
+    WHEN NOT MATCHED THEN
+        INSERT (日期, 商品编号, {quantity_column}, {count_column}) VALUES (s.日期, s.商品编号, s.数量, s.笔数);
+    """
+
+
+class MovementRollup:
+    """每日出入库汇总的刷新状态
+
+    汇总表按 (日期, 商品编号) 保存入库、出库的数量和笔数，按汇总进度中的单号只合并新增记录，
+    图表和排行只读取汇总表中所选日期范围的行，与历史记录的总量无关。同一进程中按间隔限制刷新频率。
+    页面读取时只汇总有限的批数且不等待其他线程的刷新；历史记录由 python warehouse_cli.py rollup 一次补齐。
+    """
+
+    def __init__(self, refresh_interval=ROLLUP_REFRESH_INTERVAL, batch_size=ROLLUP_PAGE_BATCH_SIZE,
+                 max_batches=ROLLUP_PAGE_MAX_BATCHES):
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._refreshed_at = None
+        self._rows = 0
+        self._behind = False  # 上次刷新达到批数上限时仍有未汇总的记录
+
+    def refresh(self, db, force=False, backfill=False, batch_size=None):
+        """到达刷新间隔时把新增的出入库记录合并进汇总表，返回本次汇总的单号数；失败时返回None
+
+        页面读取时每类记录最多汇总max_batches批，其他线程正在刷新时直接返回0，使用现有汇总；
+        backfill为True时等待其他线程并汇总全部新增记录（每批batch_size，默认ROLLUP_BATCH_SIZE）。
+        """
+        if not self._lock.acquire(blocking=backfill):
+            return 0
+        try:
+            if (not force and not backfill and self._refreshed_at is not None
+                    and time.monotonic() - self._refreshed_at < self.refresh_interval):
+                return 0
+            if not self._schema_ready:
+                if db.execute_query(ROLLUP_SCHEMA_SQL) is None:
+                    return None
+                self._schema_ready = True
+
+            batch_size = batch_size or (ROLLUP_BATCH_SIZE if backfill else self.batch_size)
+            max_batches = None if backfill else self.max_batches
+            total, behind = 0, False
+            for kind in ROLLUP_SOURCES:
+                batches = 0
+                while True:
+                    rows = db.refresh_rollup(kind, batch_size)
+                    if rows is None:
+                        return None
+                    total += rows
+                    batches += 1
+                    if rows < batch_size:
+                        break
+                    if max_batches is not None and batches >= max_batches:
+                        behind = True
+                        break
+            if behind and not self._behind:
+                print("出入库汇总尚未完成，请运行 python warehouse_cli.py rollup 补齐历史记录")
+            self._behind = behind
+            self._refreshed_at = time.monotonic()
+            self._rows += total
+            return total
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        """返回汇总刷新统计信息（不等待正在进行的刷新）"""
+        return {
+            'rows': self._rows,
+            'behind': self._behind,
+            'age': None if self._refreshed_at is None else time.monotonic() - self._refreshed_at,
+        }
+
+
+@st.experimental_singleton
+def get_movement_rollup():
+    """获取进程内共享的出入库汇总刷新状态"""
+    return MovementRollup()
+
+
+# ==================== 增量读取部分 ====================
+TAIL_WINDOW = 1000  # 实时刷新时保留的最近记录数
+TAIL_POLL_INTERVAL = 5  # 同一记录表两次轮询的最短间隔（秒），多个会话共用轮询结果
+TAIL_OVERLAP = 50  # 每次轮询回看的单号数，用于补上并发事务晚于后续单号提交的记录
+TAIL_BATCH_SIZE = 5000  # 单次增量读取的最多行数
+
+
+class RecordTail:
+    """某个记录表最近记录的快照，轮询时只读取新增的记录并合并"""
+
+    def __init__(self, table, window=TAIL_WINDOW, poll_interval=TAIL_POLL_INTERVAL, overlap=TAIL_OVERLAP):
+        self.table = table
+        self.key = RECORD_SOURCES[table][1]
+        self.window = window
+        self.poll_interval = poll_interval
+        self.overlap = overlap
+
+        self._lock = threading.Lock()
+        self._frame = None
+        self._last_key = None
+        self._polled_at = 0.0
+        self._new_rows = 0
+
+    def refresh(self, db, force=False):
+        """按需轮询新记录，返回最近记录（单号倒序）和本次新增的行数"""
+        with self._lock:
+            if not force and self._frame is not None and time.monotonic() - self._polled_at < self.poll_interval:
+                return self._frame.copy(), 0
+
+            if self._frame is None:
+                frame = db.get_latest_records(self.table, self.window)
+                new_rows = 0 if frame is None else len(frame)
+            else:
+                since = db.get_records_since(self.table, self._last_key - self.overlap)
+                if since is None:
+                    return self._frame.copy(), 0
+                new_rows = int((since[self.key] > self._last_key).sum()) if not since.empty else 0
+                frame = self._frame if since.empty else pd.concat([since, self._frame], ignore_index=True)
+            if frame is None:
+                return None, 0
+
+            if not frame.empty:
+                frame = (frame.drop_duplicates(subset=self.key, keep='first')
+                         .sort_values(self.key, ascending=False)
+                         .head(self.window)
+                         .reset_index(drop=True))
+                self._last_key = int(frame[self.key].iloc[0])
+            elif self._last_key is None:
+                self._last_key = 0
+            self._frame = frame
+            self._polled_at = time.monotonic()
+            self._new_rows += new_rows
+            return frame.copy(), new_rows
+
+
+@st.experimental_singleton
+def get_record_tails():
+    """获取进程内共享的各记录表增量快照"""
+    return {table: RecordTail(table) for table in RECORD_SOURCES}
+
+
+# ==================== 数据导出部分 ====================
+EXPORT_BATCH_SIZE = 50000  # 导出时每批从游标读取并写出的行数
+EXPORT_FORMATS = {'csv': 'gzip', 'parquet': 'snappy'}  # 导出格式及默认压缩方式
+EXPORT_UI_MAX_ROWS = 1000000  # 页面下载的最多行数，更大的范围请使用命令行导出
+EXPORT_CSV_ENCODING = 'utf-8-sig'  # 带BOM，Excel可直接识别中文
+
+# 导出筛选参数对应的列；supplier、customer按前缀匹配
+RECORD_FILTER_COLUMNS = {
+    'product_id': '商品编号',
+    'operator_id': '操作员编号',
+    'user_id': '用户编号',
+    'action_type': '操作类型',
+    'supplier': '供应商',
+    'customer': '客户名称',
+}
+RECORD_PREFIX_FILTERS = {'supplier', 'customer'}
+RECORD_TIME_COLUMNS = {'入库记录': '入库时间', '出库记录': '出库时间', '系统日志': '操作时间'}
+
+# Parquet文件中整批为空时无法推断类型的列
+_ARROW_INT_COLUMNS = {'入库单号', '出库单号', '日志编号', '商品编号', '数量', '操作员编号', '用户编号'}
+_ARROW_TIME_COLUMNS = {'入库时间', '出库时间', '操作时间'}
+
+
+def _export_file_name(table, fmt, compression):
+    """生成导出文件名，例如 入库记录_20240101_120000.csv.gz"""
+    suffix = '.csv.gz' if fmt == 'csv' and compression == 'gzip' else f'.{fmt}'
+    return f"{table}_{datetime.now():%Y%m%d_%H%M%S}{suffix}"
+
+
+def _arrow_schema(frame):
+    """由第一批数据确定Parquet的列类型，全为空的列按列名补上类型"""
+    import pyarrow as pa
+
+    fields = []
+    for field in pa.Schema.from_pandas(frame, preserve_index=False):
+        if pa.types.is_null(field.type):
+            if field.name in _ARROW_INT_COLUMNS:
+                field = pa.field(field.name, pa.int64())
+            elif field.name in _ARROW_TIME_COLUMNS:
+                field = pa.field(field.name, pa.timestamp('us'))
+            else:
+                field = pa.field(field.name, pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _write_csv(frames, target, compression, max_rows):
+    """逐批写出CSV，target为文件路径或二进制文件对象"""
+    rows, truncated = 0, False
+    if compression == 'gzip':
+        raw = gzip.open(target, 'wb') if isinstance(target, str) else gzip.GzipFile(fileobj=target, mode='wb')
+    else:
+        raw = open(target, 'wb') if isinstance(target, str) else target
+    text = io.TextIOWrapper(raw, encoding=EXPORT_CSV_ENCODING, newline='')
+    try:
+        for frame in frames:
+            if max_rows is not None and rows + len(frame) > max_rows:
+                frame, truncated = frame.iloc[:max_rows - rows], True
+            frame.to_csv(text, index=False, header=rows == 0)
+            rows += len(frame)
+            if truncated:
+                break
+        text.flush()
+    finally:
+        # 不关闭调用方传入的文件对象
+        if isinstance(target, str) or compression == 'gzip':
+            text.close()
+        else:
+            text.detach()
+    return rows, truncated
+
+
+def _write_parquet(frames, target, compression, max_rows):
+    """逐批写出Parquet（每批一个行组），target为文件路径或二进制文件对象"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows, truncated, writer = 0, False, None
+    try:
+        for frame in frames:
+            if max_rows is not None and rows + len(frame) > max_rows:
+                frame, truncated = frame.iloc[:max_rows - rows], True
+            if writer is None:
+                writer = pq.ParquetWriter(target, _arrow_schema(frame), compression=compression)
+            writer.write_table(pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False))
+            rows += len(frame)
+            if truncated:
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, truncated
+
+
+def export_frames(frames, target, fmt='csv', compression=None, max_rows=None):
+    """把按批生成的DataFrame流式写入CSV或Parquet，内存中最多只有一批数据
+
+    compression为None时使用该格式的默认压缩方式；返回 (写出的行数, 是否因max_rows截断)。
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    if compression is None:
+        compression = EXPORT_FORMATS[fmt]
+    try:
+        if fmt == 'csv':
+            return _write_csv(frames, target, compression, max_rows)
+        return _write_parquet(frames, target, compression, max_rows)
+    finally:
+        # 提前结束时关闭生成器，使流式查询归还连接
+        if hasattr(frames, 'close'):
+            frames.close()
+
+
+def export_records(db, table, target, fmt='csv', compression=None, max_rows=None,
+                   batch_size=EXPORT_BATCH_SIZE, **filters):
+    """导出入库记录、出库记录或系统日志的明细，filters同iter_records；返回 (行数, 是否截断)"""
+    frames = db.iter_records(table, batch_size=batch_size, **filters)
+    return export_frames(frames, target, fmt, compression, max_rows)
+
+
+# ==================== 数据库操作类 ====================
+class WarehouseDB:
+    fetch_batch_size = FETCH_BATCH_SIZE
+    compact_frames = COMPACT_FRAMES
+    read_retries = DB_READ_RETRIES
+
+    def __init__(self, pool=None, cache=None, auth_cache=None, audit_writer=None, ledger=None, product_index=None,
+                 rollup=None, replica_pool=None, replica_monitor=None, session=None, metrics=None, breaker=None):
+        # 使用自定义连接池且未指定日志写入线程时，系统日志同步写入
+        if audit_writer is None and pool is None and AUDIT_LOG_ASYNC:
+            audit_writer = get_audit_writer()
+        self.audit_writer = audit_writer
+        self.pool = pool if pool is not None else get_connection_pool()
+        self.cache = cache if cache is not None else get_query_cache()
+        # 使用自定义连接池时台账只属于该连接池，避免与共享台账混用
+        if ledger is None:
+            ledger = get_inventory_ledger() if pool is None else InventoryLedger()
+        self.ledger = ledger
+        if product_index is None:
+            product_index = get_product_index() if pool is None else ProductIndex()
+        self.product_index = product_index
+        if rollup is None:
+            rollup = get_movement_rollup() if pool is None else MovementRollup()
+        self.rollup = rollup
+        # 只读副本：使用共享主库连接池时默认使用共享副本连接池（未配置副本时为None）
+        if replica_pool is None and pool is None:
+            replica_pool = get_replica_pool()
+        self.replica_pool = replica_pool
+        if replica_monitor is None:
+            replica_monitor = get_replica_monitor() if pool is None else ReplicaMonitor()
+        self.replica_monitor = replica_monitor
+        # 性能统计：使用共享连接池时默认记录到共享统计，性能监控关闭或使用自定义连接池时不记录
+        if metrics is None and pool is None and PERF_MONITOR_ENABLED:
+            metrics = get_performance_metrics()
+        self.metrics = metrics
+        # 主库熔断器：使用自定义连接池时只属于该连接池
+        if breaker is None:
+            breaker = get_circuit_breaker() if pool is None else CircuitBreaker()
+        self.breaker = breaker
+        # 会话状态（如st.session_state），记录本会话最近一次写入的时间；多个用户共用时用session_scope()按线程切换
+        self.session = session if session is not None else {}
+        # 工作单元按线程保存，同一个WarehouseDB可由多个线程共用
+        self._local = threading.local()
+        self.auth_cache = auth_cache if auth_cache is not None else get_auth_cache()
+
+    @property
+    def _tx(self):
+        """当前线程正在进行的工作单元"""
+        return getattr(self._local, 'tx', None)
+
+    @_tx.setter
+    def _tx(self, tx):
+        self._local.tx = tx
+
+    @contextmanager
+    def transaction(self):
+        """工作单元：其中的操作共用一个连接和游标，结束时提交一次，出错时整体回滚
+
+        用法: with db.transaction() as tx: db.stock_out(...); db.log_action(...)
+        嵌套使用时并入外层工作单元；任一语句执行失败时整个工作单元回滚。
+        块结束后以 tx.committed 判断是否真正提交，块内操作的返回值不代表最终结果。
+        """
+        if self._tx is not None:
+            yield self._tx
+            return
+
+        # 熔断期间不等待连接，工作单元中的语句直接失败
+        conn = None if self.breaker.is_open() else self.pool.acquire()
+        tx = _Transaction(conn)
+        self._tx = tx
+        if not conn:
+            try:
+                yield tx
+            finally:
+                self._tx = None
+            return
+
+        broken = False
+        try:
+            yield tx
+            if tx.failed:
+                conn.rollback()
+            else:
+                conn.commit()
+                tx.committed = True
+        except BaseException as e:
+            broken = _is_connection_error(e)
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._tx = None
+            try:
+                tx.cursor.close()
+            except Exception:
+                broken = True
+            self.pool.release(conn, broken=broken)
+
+        if tx.committed:
+            if tx.wrote:
+                self._mark_write()
+            for callback in tx.after_commit:
+                callback()
+
+    def _after_commit(self, callback):
+        """在工作单元提交后执行回调；不在工作单元中时立即执行"""
+        if self._tx is not None:
+            self._tx.after_commit.append(callback)
+        else:
+            callback()
+
+    @contextmanager
+    def session_scope(self, session):
+        """在当前线程中改用另一个会话状态记录和判断写入，用于多个用户共用一个WarehouseDB（如HTTP接口）
+
+        用法: with db.session_scope(sessions[user_id]): db.stock_in(...)
+        """
+        previous = getattr(self._local, 'session', None)
+        self._local.session = session
+        try:
+            yield self
+        finally:
+            self._local.session = previous
+
+    def _current_session(self):
+        """当前线程使用的会话状态"""
+        session = getattr(self._local, 'session', None)
+        return self.session if session is None else session
+
+    def _read_own_writes(self):
+        """本会话是否刚写入过数据，此时读取走主库以读到自己的写入"""
+        written = self._current_session().get('_db_last_write')
+        return written is not None and time.monotonic() - written < READ_YOUR_WRITES_WINDOW
+
+    def _mark_write(self):
+        """记录本会话的写入时间"""
+        self._current_session()['_db_last_write'] = time.monotonic()
+
+    def _route(self, is_select, route=None):
+        """选择执行查询的连接池：写入走主库；SELECT默认读副本，route可指定'primary'或'replica'"""
+        if not is_select or route == 'primary' or self.replica_pool is None:
+            return self.pool
+        if route == 'replica':
+            return self.replica_pool
+        if self._read_own_writes() or not self.replica_monitor.usable(self):
+            return self.pool
+        return self.replica_pool
+
+    def execute_query(self, query, params=None, route=None):
+        """执行查询并返回结果；在工作单元中执行时不单独提交
+
+        SELECT默认读只读副本，写入、工作单元中的查询以及本会话写入后不久的读取走主库；
+        route为'primary'或'replica'时覆盖默认路由。副本查询失败时回退到主库。
+        工作单元之外的SELECT在主库遇到暂时性错误时按随机退避重试，写入只执行一次。
+        """
+        is_select = query.strip().upper().startswith('SELECT')
+        pool = self.pool if self._tx else self._route(is_select, route)
+        if pool is not self.pool:
+            result = self._execute(pool, query, params, is_select)
+            if result is not None:
+                return result
+            self.replica_monitor.mark_failed()
+
+        retries = self.read_retries if is_select and not self._tx else 0
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(_retry_delay(attempt))
+            result = self._execute(self.pool, query, params, is_select)
+            if result is not None or not _is_retryable_error(self._local.error):
+                break
+        if result is not None and not is_select and not self._tx:
+            self._mark_write()
+        return result
+
+    def _execute(self, pool, query, params, is_select):
+        """在指定连接池（或当前工作单元）上执行查询，出错时返回None
+
+        主库查询经过熔断器，熔断期间直接返回None；启用性能统计时记录耗时。
+        """
+        guarded = pool is self.pool
+        if guarded and not self.breaker.allow():
+            self._local.error = _CIRCUIT_OPEN
+            return None
+        if self.metrics is None:
+            result = self._run_query(pool, query, params, is_select)
+        else:
+            started = time.perf_counter()
+            result = self._run_query(pool, query, params, is_select)
+            self.metrics.observe_query(query, time.perf_counter() - started, result)
+        if guarded:
+            if result is None and _is_connection_error(self._local.error):
+                self.breaker.record_failure()
+            elif result is None and self._local.error is _POOL_EXHAUSTED:
+                self.breaker.record_skipped()
+            else:
+                self.breaker.record_success()
+        return result
+
+    def _run_query(self, pool, query, params, is_select):
+        """执行查询，出错时返回None，错误保存在self._local.error中"""
+        self._local.error = None
+        tx = self._tx
+        conn = tx.conn if tx else pool.acquire()
+        if not conn:
+            # 连接池已满时等待超时不说明数据库不可用，不计入熔断也不重试
+            self._local.error = _NO_CONNECTION if pool.last_failure() == 'connect' else _POOL_EXHAUSTED
+            return None
+
+        broken = False
+        dirty = True  # 只有成功读完的SELECT归还时不需要回滚
+        try:
+            cursor = tx.cursor if tx else conn.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+
+            # 如果是SELECT查询
+            if is_select:
+                frame = _fetch_frame(cursor, self.fetch_batch_size)
+                dirty = False
+                return frame
+            else:
+                if tx:
+                    tx.wrote = True
+                else:
+                    conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            print(f"查询执行失败: {str(e)}")
+            self._local.error = e
+            if tx:
+                tx.failed = True
+            broken = _is_connection_error(e)
+            return None
+        finally:
+            if not tx:
+                if 'cursor' in locals():
+                    cursor.close()
+                pool.release(conn, broken=broken, dirty=dirty)
+
+    def iter_query(self, query, params=None, batch_size=None, route=None):
+        """流式执行SELECT查询，按批生成DataFrame；连接在迭代结束后归还，出错时抛出异常
+
+        默认读只读副本（路由规则同execute_query），副本无法连接时改用主库。
+        主库查询与execute_query一样经过熔断器，并记录成功或失败。
+        """
+        pool = self._route(True, route)
+        conn = None if pool is self.pool else pool.acquire()
+        if not conn and pool is not self.pool:
+            self.replica_monitor.mark_failed()
+            pool = self.pool
+        guarded = pool is self.pool
+        if guarded:
+            if not self.breaker.allow():
+                raise RuntimeError(str(_CIRCUIT_OPEN))
+            conn = pool.acquire()
+            if not conn:
+                # 与_execute相同：只有无法建立连接计入熔断，连接池已满时等待超时不计入
+                if pool.last_failure() == 'connect':
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_skipped()
+                raise RuntimeError("无法获取数据库连接")
+
+        broken = False
+        dirty = True  # 读完全部结果后归还时不需要回滚
+        cursor = None
+        # 流式查询记录从执行到读完（或提前结束）的总耗时，不含调用方处理各批的时间
+        elapsed, rows, nbytes, failed = 0.0, 0, 0, False
+        started = time.perf_counter()
+        try:
+            cursor = conn.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+
+            columns = [column[0] for column in cursor.description]
+            for arrays in _fetch_batches(cursor, batch_size or self.fetch_batch_size):
+                frame = _frame_from_columns(columns, arrays)
+                elapsed += time.perf_counter() - started
+                started = None
+                if self.metrics is not None:
+                    rows += len(frame)
+                    nbytes += _frame_nbytes(frame)
+                yield frame
+                started = time.perf_counter()
+            dirty = False
+        except pyodbc.Error as e:
+            print(f"查询执行失败: {str(e)}")
+            failed = True
+            broken = _is_connection_error(e)
+            raise
+        finally:
+            if guarded:
+                # 提前结束迭代也要记录结果，否则半开状态下的试探查询会一直占用名额
+                if broken:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+            if self.metrics is not None:
+                if started is not None:
+                    elapsed += time.perf_counter() - started
+                self.metrics.observe_stream(query, elapsed, rows, nbytes, error=failed)
+            if cursor is not None:
+                cursor.close()
+            pool.release(conn, broken=broken, dirty=dirty)
+
+    def cached_query(self, table, query, params=None):
+        """执行读取查询，结果按数据表缓存"""
+        key = (query, tuple(params) if params else None)
+        result = self.cache.get(table, key)
+        if result is None:
+            generation = self.cache.generation(table)
+            # 数据表刚被写入时从主库读取，避免把副本上的旧数据放入共享缓存
+            route = 'primary' if self.replica_monitor.recent_write(table) else None
+            result = self._compact(self.execute_query(query, params, route))
+            if result is not None:
+                self.cache.put(table, key, result, generation=generation)
+            else:
+                result = self._stale_result(table, key)
+        return result
+
+    def _stale_result(self, table, key):
+        """读取失败时返回保留的过期缓存结果，DataFrame的attrs['stale_age']为已缓存的秒数；没有时返回None"""
+        item = self.cache.get_stale(table, key)
+        if item is None:
+            return None
+        result, age = item
+        if isinstance(result, pd.DataFrame):
+            result.attrs['stale_age'] = age
+        self._local.stale_age = max(age, self.stale_age() or 0)
+        return result
+
+    def stale_age(self):
+        """本线程返回过的过期缓存结果中最久的已缓存秒数，没有返回过时为None"""
+        return getattr(self._local, 'stale_age', None)
+
+    def unavailable(self):
+        """主库是否处于熔断中"""
+        return self.breaker.is_open()
+
+    def _compact(self, frame):
+        """把读取的数据表转换为紧凑类型（未启用时原样返回）"""
+        if not self.compact_frames or frame is None:
+            return frame
+        return compact_frame(frame)
+
+    def memory_report(self):
+        """读取各数据表，比较原始类型与紧凑类型的内存占用；读取失败的表不列出"""
+        rows = []
+        for table, query in COMPACT_REPORT_QUERIES.items():
+            frame = self.execute_query(query)
+            if frame is None:
+                continue
+            before = frame_memory(frame)
+            after = frame_memory(compact_frame(frame))
+            rows.append({'数据表': table, '行数': len(frame), '原始(MB)': round(before / 2 ** 20, 2),
+                         '紧凑(MB)': round(after / 2 ** 20, 2), '节省(MB)': round((before - after) / 2 ** 20, 2),
+                         '压缩比': round(before / after, 2) if after else None})
+        return pd.DataFrame(rows, columns=['数据表', '行数', '原始(MB)', '紧凑(MB)', '节省(MB)', '压缩比'])
+
+    def _invalidate(self, result, *tables):
+        """写入成功后清除相关数据表的缓存；在工作单元中时等到提交后再清除"""
+        if result is not None:
+            def invalidate():
+                self.replica_monitor.note_write(*tables)
+                self.cache.invalidate(*tables)
+                self.auth_cache.invalidate(*tables)
+            self._after_commit(invalidate)
+        return result
+
+    def get_products(self):
+        """获取所有商品信息"""
+        return self.cached_query('商品信息', "SELECT * FROM 商品信息")
+
+    def get_product(self, product_id):
+        """获取单个商品的信息，商品不存在时返回None"""
+        result = self.cached_query('商品信息', "SELECT * FROM 商品信息 WHERE 商品编号 = ?", (int(product_id),))
+        if result is None or result.empty:
+            return None
+        return result.iloc[0]
+
+    def _load_product_names(self, since=None):
+        """读取商品索引需要的列；since不为None时只读取编号更大的商品"""
+        query = "SELECT 商品编号, 商品名称, 规格型号 FROM 商品信息"
+        # 从主库读取，新增商品提交后即可读到
+        if since is None:
+            return self.execute_query(query, route='primary')
+        return self.execute_query(query + " WHERE 商品编号 > ?", (since,), route='primary')
+
+    def search_products(self, query, limit=PRODUCT_SEARCH_LIMIT, ids=None):
+        """按商品名称或规格型号搜索，返回最多limit个商品编号"""
+        return self.product_index.search(query, self._load_product_names, limit, ids)
+
+    def product_label(self, product_id):
+        """返回商品的显示名称（带规格型号和编号）"""
+        return self.product_index.label(product_id, self._load_product_names)
+
+    def _load_inventory(self):
+        """读取当前库存视图（从主库读取，台账之后按增量更新，不能以副本上的旧数据为起点）"""
+        return self._compact(self.execute_query("SELECT * FROM 当前库存", route='primary'))
+
+    def get_inventory(self):
+        """获取当前库存（由库存台账提供，定期与视图核对）"""
+        return self.ledger.snapshot(self._load_inventory)
+
+    def get_stock_level(self, product_id):
+        """获取单个商品的当前库存量"""
+        return self.ledger.quantity(product_id, self._load_inventory)
+
+    def _product_changed(self, result):
+        """商品信息写入成功后清除缓存，台账中的商品名称和安全库存随之重新加载"""
+        if result is not None:
+            self._after_commit(self.ledger.invalidate)
+        return self._invalidate(result, '商品信息')
+
+    def _stock_moved(self, result, product_ids, deltas):
+        """出入库写入成功后，在提交时把数量增量应用到库存台账"""
+        if result is not None:
+            self._after_commit(lambda: self.ledger.apply_deltas(product_ids, deltas))
+        return result
+
+    def add_product(self, name, spec, unit, category_id, safety_stock):
+        """添加新商品"""
+        query = """
+        INSERT INTO 商品信息 (商品名称, 规格型号, 单位, 分类编号, 安全库存)
+        VALUES (?, ?, ?, ?, ?)
+        """
+        result = self.execute_query(query, (name, spec, unit, category_id, safety_stock))
+        if result is not None:
+            self._after_commit(self.product_index.mark_added)
+        return self._product_changed(result)
+
+    def stock_in(self, product_id, quantity, operator_id, supplier):
+
+        """商品入库"""
+        query = """
+                EXEC 商品入库 @商品编号=?, @数量=?, @操作员编号=?, @供应商=?
+                """
+        result = self.execute_query(query, (product_id, quantity, operator_id, supplier))
+        return self._stock_moved(result, [product_id], [quantity])
+
+    def stock_out(self, product_id, quantity, operator_id, customer):
+        """商品出库"""
+        query = """
+                INSERT INTO 出库记录 (商品编号, 数量, 操作员编号, 客户名称)
+                VALUES (?, ?, ?, ?)
+                """
+        result = self.execute_query(query, (product_id, quantity, operator_id, customer))
+        return self._stock_moved(result, [product_id], [-quantity])
+
+    def validate_movements(self, frame, party_column, check_stock=False):
+        """向量化校验批量出入库数据，返回 (有效行, 错误明细)
+
+        有效行包含 商品编号、数量 和 party_column 三列；行号为文件中的行号（表头为第1行）
+        """
+        missing = [c for c in ('商品编号', '数量') if c not in frame.columns]
+        if missing:
+            raise ValueError(f"缺少必填列: {', '.join(missing)}")
+
+        rows = pd.DataFrame({
+            '行号': np.arange(2, len(frame) + 2),
+            '商品编号': pd.to_numeric(frame['商品编号'], errors='coerce'),
+            '数量': pd.to_numeric(frame['数量'], errors='coerce'),
+            party_column: (frame[party_column].fillna('').astype(str).str.strip()
+                           if party_column in frame.columns else ''),
+        })
+
+        products = self.get_products()
+        known_ids = products['商品编号'] if products is not None and not products.empty else []
+        errors = pd.Series('', index=rows.index)
+
+        valid_quantity = (rows['数量'] > 0) & (rows['数量'] % 1 == 0)
+        known = rows['商品编号'].isin(known_ids)
+        # 按优先级从低到高赋值，每行保留最先出现的错误
+        if check_stock:
+            inventory = self.get_inventory()
+            stock = (inventory.set_index('商品编号')['当前库存量']
+                     if inventory is not None and not inventory.empty else pd.Series(dtype='int64'))
+            # 同一商品在文件中多次出库时按累计数量校验，只累计商品和数量都有效的行
+            checked = valid_quantity & known
+            requested = rows['数量'].where(checked, 0).groupby(rows['商品编号']).cumsum()
+            available = rows['商品编号'].map(stock).fillna(0)
+            errors[checked & (requested > available)] = '库存不足'
+        errors[~valid_quantity] = '数量必须为正整数'
+        errors[~known] = '商品不存在'
+        errors[rows['商品编号'].isna()] = '商品编号无效'
+
+        failed = errors != ''
+        valid = rows[~failed].astype({'商品编号': 'int64', '数量': 'int64'})
+        return valid, _bulk_errors(list(zip(rows.loc[failed, '行号'], errors[failed])))
+
+    def _savepoint(self, name):
+        """在当前工作单元中设置保存点"""
+        self._tx.cursor.execute(f"IF @@TRANCOUNT = 0 BEGIN TRANSACTION; SAVE TRANSACTION {name}")
+
+    def _rollback_to(self, name):
+        """回滚到当前工作单元中的保存点"""
+        self._tx.cursor.execute(f"ROLLBACK TRANSACTION {name}")
+
+    def _bulk_write(self, query, rows, continue_on_error):
+        """在一个工作单元中用fast_executemany批量写入，返回失败行的 [(位置, 错误)]
+
+        continue_on_error为True时，整批失败后回滚到保存点逐行重试，跳过出错的行
+        """
+        try:
+            with self.transaction():
+                cursor = self._tx.cursor
+                if cursor is None:
+                    return [(i, "无法获取数据库连接") for i in range(len(rows))]
+                self._tx.wrote = True
+                if hasattr(cursor, 'fast_executemany'):
+                    cursor.fast_executemany = True
+                try:
+                    self._savepoint('批量写入')
+                    try:
+                        for start in range(0, len(rows), BULK_WRITE_BATCH_SIZE):
+                            cursor.executemany(query, rows[start:start + BULK_WRITE_BATCH_SIZE])
+                        return []
+                    except pyodbc.Error as e:
+                        print(f"批量写入失败: {str(e)}")
+                        self._rollback_to('批量写入')
+                        if not continue_on_error:
+                            self._tx.failed = True
+                            return [(i, str(e)) for i in range(len(rows))]
+
+                    failures = []
+                    for i, row in enumerate(rows):
+                        self._savepoint('批量写入行')
+                        try:
+                            cursor.execute(query, row)
+                        except pyodbc.Error as e:
+                            self._rollback_to('批量写入行')
+                            failures.append((i, str(e)))
+                    return failures
+                finally:
+                    if hasattr(cursor, 'fast_executemany'):
+                        cursor.fast_executemany = False
+        except pyodbc.Error as e:
+            print(f"批量写入失败: {str(e)}")
+            return [(i, str(e)) for i in range(len(rows))]
+
+    def _bulk_movements(self, query, frame, party_column, operator_id, continue_on_error, sign):
+        """校验并批量写入出入库数据，sign为1表示入库、-1表示出库，返回 (写入行数, 错误明细)"""
+        valid, errors = self.validate_movements(frame, party_column, check_stock=sign < 0)
+        if valid.empty or (not errors.empty and not continue_on_error):
+            return 0, errors
+
+        operator_id = int(operator_id)
+        rows = [(product_id, quantity, operator_id, party) for product_id, quantity, party in zip(
+            valid['商品编号'].tolist(), valid['数量'].tolist(), valid[party_column].tolist())]
+        failures = self._bulk_write(query, rows, continue_on_error)
+
+        line_numbers = valid['行号'].tolist()
+        errors = pd.concat([errors, _bulk_errors([(line_numbers[i], error) for i, error in failures])],
+                           ignore_index=True)
+        written = len(rows) - len(failures)
+        if written:
+            failed = {i for i, _ in failures}
+            succeeded = [row for i, row in enumerate(rows) if i not in failed]
+            self._stock_moved(written, [row[0] for row in succeeded], [sign * row[1] for row in succeeded])
+        return written, errors.sort_values('行号', ignore_index=True)
+
+    def bulk_stock_in(self, frame, operator_id, continue_on_error=True):
+        """批量入库，按行调用商品入库存储过程并在一个事务中提交，返回 (写入行数, 错误明细)"""
+        query = "EXEC 商品入库 @商品编号=?, @数量=?, @操作员编号=?, @供应商=?"
+        return self._bulk_movements(query, frame, '供应商', operator_id, continue_on_error, sign=1)
+
+    def bulk_stock_out(self, frame, operator_id, continue_on_error=True):
+        """批量出库，在一个事务中写入出库记录，返回 (写入行数, 错误明细)"""
+        query = "INSERT INTO 出库记录 (商品编号, 数量, 操作员编号, 客户名称) VALUES (?, ?, ?, ?)"
+        return self._bulk_movements(query, frame, '客户名称', operator_id, continue_on_error, sign=-1)
+
+    def get_users(self):
+        """获取所有用户"""
+        # 密码哈希只在认证时按用户名读取，不随用户列表加载
+        return self.cached_query('用户账户', "SELECT 用户编号, 用户名, 角色 FROM 用户账户")
+
+    def authenticate(self, username, password):
+        """按用户名校验密码，成功时返回用户信息，失败时返回None"""
+        if not username or not password:
+            return None
+        key = self.auth_cache.key(username, password)
+        cached = self.auth_cache.get('用户账户', key)
+        if cached is not None:
+            return cached or None
+
+        generation = self.auth_cache.generation('用户账户')
+        rows = self.execute_query(
+            "SELECT 用户编号, 用户名, 密码, 角色 FROM 用户账户 WHERE 用户名 = ?", (username,)
+        )
+        if rows is None:
+            return None
+
+        user = None
+        if not rows.empty:
+            row = rows.iloc[0]
+            ok, needs_rehash = verify_password(password, row['密码'])
+            if ok:
+                user = {'用户编号': int(row['用户编号']), '用户名': row['用户名'], '角色': row['角色']}
+                if needs_rehash:
+                    self.set_password(user['用户编号'], password)
+                    generation = self.auth_cache.generation('用户账户')
+
+        # 失败结果缓存为空字典，以便与未命中区分
+        ttl = AUTH_CACHE_TTL if user else AUTH_NEGATIVE_CACHE_TTL
+        self.auth_cache.put('用户账户', key, user or {}, ttl=ttl, generation=generation)
+        return user
+
+    def set_password(self, user_id, password):
+        """以加盐哈希形式更新用户密码"""
+        query = "UPDATE 用户账户 SET 密码=? WHERE 用户编号=?"
+        result = self.execute_query(query, (hash_password(password), user_id))
+        return self._invalidate(result, '用户账户')
+
+    def get_stock_in_records(self):
+        """获取入库记录"""
+        return self._compact(self.execute_query("SELECT * FROM 入库记录"))
+
+    def get_stock_out_records(self):
+        """获取出库记录"""
+        return self._compact(self.execute_query("SELECT * FROM 出库记录"))
+
+    def get_logs(self):
+        """获取系统日志"""
+        return self._compact(self.execute_query("SELECT * FROM 系统日志 ORDER BY 操作时间 DESC"))
+
+    def get_stock_in_details(self):
+        """获取带商品名称和操作员的入库记录"""
+        return self._compact(self.execute_query(
+            f"SELECT {', '.join(STOCK_IN_COLUMNS)} FROM ({STOCK_IN_DETAIL_SQL}) AS 入库明细"))
+
+    def get_stock_out_details(self):
+        """获取带商品名称和操作员的出库记录"""
+        return self._compact(self.execute_query(
+            f"SELECT {', '.join(STOCK_OUT_COLUMNS)} FROM ({STOCK_OUT_DETAIL_SQL}) AS 出库明细"))
+
+    def get_log_details(self):
+        """获取带用户名的系统日志"""
+        return self._compact(self.execute_query(
+            f"SELECT {', '.join(LOG_COLUMNS)} FROM ({LOG_DETAIL_SQL}) AS 日志明细 ORDER BY 操作时间 DESC"
+        ))
+
+    def _record_page(self, source, key_columns, conditions, params, limit, cursor):
+        """按键集（seek）倒序读取一页记录，返回 (当前页, 下一页游标)"""
+        conditions = list(conditions)
+        params = list(params)
+        if cursor:
+            conditions.append(_seek_condition(key_columns))
+            params.extend(_seek_params(cursor))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = ", ".join(f"{c} DESC" for c in key_columns)
+        # 多取一行用于判断是否还有下一页
+        query = f"SELECT TOP (?) * FROM {source} {where} ORDER BY {order}"
+        page = self._compact(self.execute_query(query, [limit + 1] + params))
+        if page is None or len(page) <= limit:
+            return page, None
+
+        page = page.iloc[:limit]
+        last = page.iloc[-1]
+        next_cursor = tuple(_to_python(last[c]) for c in key_columns)
+        return page, next_cursor
+
+    @staticmethod
+    def _record_filters(time_column, start=None, end=None, prefixes=None, **equals):
+        """生成记录筛选条件：时间范围、等值条件，以及prefixes（{列: 前缀}）中的前缀匹配条件
+
+        等值条件的值原样比较；前缀中的%、_、[按字面匹配。
+        """
+        conditions, params = [], []
+        if start:
+            conditions.append(f"{time_column} >= ?")
+            params.append(_as_datetime(start))
+        if end:
+            conditions.append(f"{time_column} < ?")
+            params.append(_as_datetime(end, next_day=not isinstance(end, datetime)))
+        for column, value in equals.items():
+            if value is None or value == '':
+                continue
+            conditions.append(f"{column} = ?")
+            params.append(value)
+        for column, value in (prefixes or {}).items():
+            if not value:
+                continue
+            conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(value))
+        return conditions, params
+
+    def get_stock_in_records_page(self, limit=RECORD_PAGE_SIZE, cursor=None, start=None, end=None,
+                                  product_id=None, operator_id=None, supplier=None):
+        """分页获取入库记录（按入库单号倒序），返回 (当前页, 下一页游标)"""
+        conditions, params = self._record_filters(
+            '入库时间', start, end,
+            prefixes={'供应商': supplier}, 商品编号=product_id, 操作员编号=operator_id,
+        )
+        return self._record_page(f"({STOCK_IN_DETAIL_SQL}) AS 入库明细", ['入库单号'],
+                                 conditions, params, limit, cursor)
+
+    def get_stock_out_records_page(self, limit=RECORD_PAGE_SIZE, cursor=None, start=None, end=None,
+                                   product_id=None, operator_id=None, customer=None):
+        """分页获取出库记录（按出库单号倒序），返回 (当前页, 下一页游标)"""
+        conditions, params = self._record_filters(
+            '出库时间', start, end,
+            prefixes={'客户名称': customer}, 商品编号=product_id, 操作员编号=operator_id,
+        )
+        return self._record_page(f"({STOCK_OUT_DETAIL_SQL}) AS 出库明细", ['出库单号'],
+                                 conditions, params, limit, cursor)
+
+    def get_logs_page(self, limit=RECORD_PAGE_SIZE, cursor=None, start=None, end=None,
+                      user_id=None, action_type=None):
+        """分页获取系统日志（按操作时间倒序，日志编号区分同一时间的记录），返回 (当前页, 下一页游标)"""
+        conditions, params = self._record_filters(
+            '操作时间', start, end, 用户编号=user_id, 操作类型=action_type,
+        )
+        # 未指定开始日期或日期在保留期内时只查询系统日志表，更早的日期范围并入对应月份的归档表
+        source = self._record_source('系统日志', start, end)
+        return self._record_page(f"({source}) AS 日志明细", ['操作时间', '日志编号'],
+                                 conditions, params, limit, cursor)
+
+    def get_log_archives(self):
+        """获取已有的日志归档表，返回 [(月份, 表名), ...]（按月份升序）
+
+        不缓存：归档任务在其他进程中运行，缓存的表清单会使刚归档的日志从页面和导出中消失；
+        sys.tables的查询开销很小。
+        """
+        tables = self.execute_query("SELECT name FROM sys.tables WHERE name LIKE ?",
+                                    (f"{LOG_ARCHIVE_PREFIX.replace('_', '[_]')}%",))
+        if tables is None:
+            return []
+        archives = [(log_archive_month(name), name) for name in tables['name'].tolist()]
+        return sorted(archive for archive in archives if archive[0] is not None)
+
+    def _log_archives_between(self, start, end):
+        """返回与日期范围有交集的归档表；未指定任何日期时只查询系统日志表，只缺一端时该端不设限"""
+        if not start and not end:
+            return []
+        first = _month_start(start) if start else None
+        last = _month_start(end) if end else None
+        return [table for month, table in self.get_log_archives()
+                if (first is None or month >= first) and (last is None or month <= last)]
+
+    def _record_source(self, table, start=None, end=None):
+        """返回记录表的明细查询；系统日志在日期范围早于保留期时并入对应的归档表"""
+        if table == '系统日志':
+            return log_detail_sql(self._log_archives_between(start, end))
+        return RECORD_SOURCES[table][0]
+
+    def rollover_logs(self, hot_months=LOG_HOT_MONTHS, batch_size=LOG_ARCHIVE_BATCH_SIZE, now=None):
+        """把保留期之前的系统日志按月移入归档表，返回 {归档表: 移动行数}；失败时抛出RuntimeError"""
+        cutoff = log_hot_cutoff(now, hot_months)
+        oldest = self.execute_query("SELECT MIN(操作时间) AS 最早时间 FROM 系统日志 WHERE 操作时间 < ?", (cutoff,))
+        if oldest is None:
+            raise RuntimeError("读取系统日志失败")
+        if oldest.empty or pd.isna(oldest['最早时间'].iloc[0]):
+            return {}
+
+        moved = {}
+        month = _month_start(pd.Timestamp(oldest['最早时间'].iloc[0]).to_pydatetime())
+        while month < cutoff:
+            table = log_archive_table(month)
+            if self.execute_query(LOG_ARCHIVE_SCHEMA_SQL.format(table=table)) is None:
+                raise RuntimeError(f"创建归档表 {table} 失败")
+            moved[table] = 0
+            next_month = _add_months(month, 1)
+            # 每批单独提交，中断后重新运行即可继续
+            while True:
+                rows = self.execute_query(LOG_ARCHIVE_MOVE_SQL.format(table=table),
+                                          (batch_size, month, next_month))
+                if rows is None:
+                    raise RuntimeError(f"归档 {table} 失败")
+                moved[table] += rows
+                if rows < batch_size:
+                    break
+            month = next_month
+        return moved
+
+    def get_latest_records(self, table, limit=TAIL_WINDOW):
+        """获取记录表最新的limit条明细（按单号倒序）"""
+        source, key = RECORD_SOURCES[table]
+        page, _ = self._record_page(f"({source}) AS 明细", [key], [], [], limit, None)
+        return page
+
+    def get_records_since(self, table, last_key, limit=TAIL_BATCH_SIZE):
+        """获取单号大于last_key的记录明细（按单号升序），用于增量刷新"""
+        source, key = RECORD_SOURCES[table]
+        return self._compact(self.execute_query(
+            f"SELECT TOP (?) * FROM ({source}) AS 明细 WHERE {key} > ? ORDER BY {key}", (limit, last_key)
+        ))
+
+    def refresh_rollup(self, kind, batch_size=ROLLUP_BATCH_SIZE):
+        """把一批新增的入库或出库记录合并进每日汇总并推进汇总进度，返回汇总的单号数；失败时返回None"""
+        table, key = ROLLUP_SOURCES[kind][:2]
+        with self.transaction():
+            tx = self._tx
+            # UPDLOCK使多个进程同时刷新时依次执行，不会重复汇总同一段记录
+            progress = self.execute_query(
+                "SELECT 最后单号 FROM 汇总进度 WITH (UPDLOCK) WHERE 汇总名称 = ?", (kind,))
+            latest = self.execute_query(f"SELECT MAX({key}) AS 最大单号 FROM {table}")
+            if progress is None or progress.empty or latest is None:
+                tx.failed = True
+                return None
+
+            start = int(progress['最后单号'].iloc[0])
+            end = latest['最大单号'].iloc[0]
+            end = start if pd.isna(end) else min(int(end), start + batch_size)
+            if end <= start:
+                return 0
+            self.execute_query(_rollup_merge_sql(kind), (start, end))
+            self.execute_query("UPDATE 汇总进度 SET 最后单号 = ?, 更新时间 = GETDATE() WHERE 汇总名称 = ?",
+                               (end, kind))
+            if tx.failed:
+                return None
+        return end - start
+
+    def _rollup_filters(self, start, end, product_id=None, category_id=None):
+        """生成汇总查询的日期、商品和分类条件"""
+        conditions = ["s.日期 >= ?", "s.日期 <= ?"]
+        params = [start, end]
+        if product_id is not None:
+            conditions.append("s.商品编号 = ?")
+            params.append(int(product_id))
+        if category_id is not None:
+            conditions.append("p.分类编号 = ?")
+            params.append(int(category_id))
+        return " AND ".join(conditions), params
+
+    def get_daily_movements(self, start, end, product_id=None, category_id=None):
+        """按日获取入库、出库数量（来自每日汇总）"""
+        self.rollup.refresh(self)
+        where, params = self._rollup_filters(start, end, product_id, category_id)
+        return self.execute_query(f"""
+            SELECT s.日期, SUM(s.入库数量) AS 入库数量, SUM(s.出库数量) AS 出库数量,
+                   SUM(s.入库笔数) AS 入库笔数, SUM(s.出库笔数) AS 出库笔数
+            FROM 每日出入库汇总 s JOIN 商品信息 p ON p.商品编号 = s.商品编号
+            WHERE {where}
+            GROUP BY s.日期
+            ORDER BY s.日期
+        """, params)
+
+    def get_category_movements(self, start, end):
+        """按商品分类获取日期范围内的入库、出库数量（来自每日汇总）"""
+        self.rollup.refresh(self)
+        where, params = self._rollup_filters(start, end)
+        return self.execute_query(f"""
+            SELECT p.分类编号, SUM(s.入库数量) AS 入库数量, SUM(s.出库数量) AS 出库数量
+            FROM 每日出入库汇总 s JOIN 商品信息 p ON p.商品编号 = s.商品编号
+            WHERE {where}
+            GROUP BY p.分类编号
+            ORDER BY p.分类编号
+        """, params)
+
+    def get_top_movers(self, start, end, limit=ROLLUP_TOP_K, by='出库数量', category_id=None):
+        """获取日期范围内按入库或出库数量排名前limit的商品（来自每日汇总）"""
+        if by not in ('入库数量', '出库数量'):
+            raise ValueError(f"不支持的排序列: {by}")
+        self.rollup.refresh(self)
+        where, params = self._rollup_filters(start, end, category_id=category_id)
+        return self.execute_query(f"""
+            SELECT TOP (?) s.商品编号, p.商品名称, SUM(s.入库数量) AS 入库数量, SUM(s.出库数量) AS 出库数量
+            FROM 每日出入库汇总 s JOIN 商品信息 p ON p.商品编号 = s.商品编号
+            WHERE {where}
+            GROUP BY s.商品编号, p.商品名称
+            ORDER BY SUM(s.{by}) DESC, s.商品编号
+        """, [limit] + params)
+
+    def iter_records(self, table, start=None, end=None, batch_size=None, **filters):
+        """按单号顺序流式读取记录明细，按批生成DataFrame
+
+        filters为RECORD_FILTER_COLUMNS中的参数，例如 product_id=1, supplier='供应商0'（前缀匹配）。
+        """
+        key = RECORD_SOURCES[table][1]
+        source = self._record_source(table, start, end)
+        equals, prefixes = {}, {}
+        for name, value in filters.items():
+            if name not in RECORD_FILTER_COLUMNS:
+                raise ValueError(f"不支持的筛选参数: {name}")
+            target = prefixes if name in RECORD_PREFIX_FILTERS else equals
+            target[RECORD_FILTER_COLUMNS[name]] = value
+        conditions, params = self._record_filters(RECORD_TIME_COLUMNS[table], start, end, prefixes, **equals)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.iter_query(f"SELECT * FROM ({source}) AS 明细 {where} ORDER BY {key}", params, batch_size)
+
+    def add_user(self, username, password, role):
+        """添加新用户"""
+        query = """
+                INSERT INTO 用户账户 (用户名, 密码, 角色)
+                VALUES (?, ?, ?)
+                """
+        result = self.execute_query(query, (username, hash_password(password), role))
+        return self._invalidate(result, '用户账户')
+
+    def update_product(self, product_id, name, spec, unit, category_id, safety_stock):
+        """更新商品信息"""
+        query = """
+                UPDATE 商品信息 
+                SET 商品名称=?, 规格型号=?, 单位=?, 分类编号=?, 安全库存=?
+                WHERE 商品编号=?
+                """
+        result = self.execute_query(query, (name, spec, unit, category_id, safety_stock, product_id))
+        if result is not None:
+            self._after_commit(lambda: self.product_index.upsert(product_id, name, spec))
+        return self._product_changed(result)
+
+    def log_action(self, action_type, details, user_id, sync=None):
+        """记录系统日志；默认交给后台线程批量写入，审计关键操作或sync为True时同步写入"""
+        if sync is None:
+            sync = action_type in AUDIT_SYNC_ACTIONS
+        # 在工作单元中时与业务操作一起同步写入，保证操作与审计记录同时提交
+        if (not sync and self._tx is None and self.audit_writer is not None
+                and self.audit_writer.submit(action_type, details, user_id)):
+            return 1
+
+        query = """
+                INSERT INTO 系统日志 (操作类型, 详细信息, 用户编号)
+                VALUES (?, ?, ?)
+                """
+        return self.execute_query(query, (action_type, details, user_id))
+
+
+# ==================== 库存核对部分 ====================
+RECONCILE_RANGE_SIZE = 10000  # 每个核对任务包含的商品编号范围
+RECONCILE_WORKERS = os.cpu_count() or 1  # 核对进程数
+RECONCILE_BATCH_SIZE = 100000  # 核对时流式读取出入库记录的每批行数
+RECONCILE_CHECKPOINT = 'reconcile_checkpoint.json'  # 默认的核对进度文件
+RECONCILE_COLUMNS = ['商品编号', '入库合计', '出库合计', '应有库存', '当前库存量', '差异']
+
+
+def reconcile_db():
+    """核对进程使用的WarehouseDB：每个进程一个独立连接，不使用共享缓存和后台线程"""
+    return WarehouseDB(pool=ConnectionPool(create_connection, min_size=1, max_size=1),
+                       cache=QueryCache(), auth_cache=AuthCache())
+
+
+def product_ranges(first, last, range_size=RECONCILE_RANGE_SIZE):
+    """把商品编号first到last切分为 [(起始, 结束), ...] 闭区间"""
+    return [(low, min(low + range_size - 1, last)) for low in range(first, last + 1, range_size)]
+
+
+def _sum_movements(db, table, low, high, batch_size):
+    """流式读取商品编号范围内的出入库记录，返回按商品编号偏移累加的数量数组和行数"""
+    totals = np.zeros(high - low + 1, dtype='int64')
+    rows = 0
+    query = f"SELECT 商品编号, 数量 FROM {table} WHERE 商品编号 BETWEEN ? AND ?"
+    for frame in db.iter_query(query, (low, high), batch_size):
+        offsets = frame['商品编号'].to_numpy(dtype='int64') - low
+        totals += np.bincount(offsets, weights=frame['数量'].to_numpy(dtype='int64'),
+                              minlength=len(totals)).astype('int64')
+        rows += len(frame)
+    return totals, rows
+
+
+def reconcile_range(db_factory, low, high, batch_size=RECONCILE_BATCH_SIZE):
+    """核对一个商品编号范围：由出入库记录重新计算库存并与当前库存视图比较
+
+    在核对进程中执行，返回 (起始, 结束, 读取的记录行数, 差异DataFrame)。
+    """
+    db = db_factory()
+    try:
+        inbound, in_rows = _sum_movements(db, '入库记录', low, high, batch_size)
+        outbound, out_rows = _sum_movements(db, '出库记录', low, high, batch_size)
+        current = db.execute_query(
+            "SELECT 商品编号, 当前库存量 FROM 当前库存 WHERE 商品编号 BETWEEN ? AND ?", (low, high))
+        if current is None:
+            raise RuntimeError(f"读取商品 {low}-{high} 的当前库存失败")
+    finally:
+        db.pool.close()
+
+    expected = inbound - outbound
+    actual = np.zeros(len(expected), dtype='int64')
+    listed = np.zeros(len(expected), dtype=bool)
+    offsets = current['商品编号'].to_numpy(dtype='int64') - low
+    actual[offsets] = current['当前库存量'].fillna(0).to_numpy(dtype='int64')
+    listed[offsets] = True
+
+    # 有出入库记录但不在当前库存视图中的商品也作为差异报告
+    moved = (inbound != 0) | (outbound != 0)
+    differs = (listed | moved) & (expected != actual)
+    positions = np.flatnonzero(differs)
+    discrepancies = pd.DataFrame({
+        '商品编号': positions + low,
+        '入库合计': inbound[positions],
+        '出库合计': outbound[positions],
+        '应有库存': expected[positions],
+        '当前库存量': np.where(listed[positions], actual[positions], np.nan),
+    })
+    discrepancies['差异'] = discrepancies['当前库存量'] - discrepancies['应有库存']
+    return low, high, in_rows + out_rows, discrepancies
+
+
+def _load_checkpoint(path, ranges):
+    """读取核对进度；进度文件中的范围与本次不一致时从头开始"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if [tuple(r) for r in checkpoint.get('ranges', [])] != ranges:
+        print("核对进度文件与本次的商品范围不一致，将重新核对")
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    """原子地写入核对进度"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def reconcile_inventory(db, db_factory=reconcile_db, output='reconcile_discrepancies.csv',
+                        checkpoint=RECONCILE_CHECKPOINT, range_size=RECONCILE_RANGE_SIZE,
+                        workers=RECONCILE_WORKERS, batch_size=RECONCILE_BATCH_SIZE, resume=True):
+    """按商品编号范围并行核对库存，差异追加写入output（CSV），返回核对汇总
+
+    每完成一个范围即更新进度文件，中断后以resume=True再次运行时跳过已完成的范围；全部完成后删除进度文件。
+    db_factory须可在子进程中调用（模块级函数），用于为每个核对任务建立连接。
+    """
+    bounds = db.execute_query("SELECT MIN(商品编号) AS 最小编号, MAX(商品编号) AS 最大编号 FROM 商品信息")
+    if bounds is None:
+        raise RuntimeError("读取商品编号范围失败")
+    if bounds.empty or pd.isna(bounds['最小编号'].iloc[0]):
+        return {'ranges': 0, 'rows': 0, 'discrepancies': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    ranges = product_ranges(int(bounds['最小编号'].iloc[0]), int(bounds['最大编号'].iloc[0]), range_size)
+
+    state = _load_checkpoint(checkpoint, ranges) if resume else None
+    if state is None:
+        state = {'ranges': ranges, 'done': [], 'rows': 0, 'discrepancies': 0, 'seconds': 0.0}
+        if os.path.exists(output):
+            os.remove(output)
+    done = {tuple(r) for r in state['done']}
+    pending = [r for r in ranges if r not in done]
+    print(f"共 {len(ranges)} 个商品范围，已完成 {len(done)} 个，待核对 {len(pending)} 个")
+
+    started = time.perf_counter()
+    elapsed = state['seconds']
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(reconcile_range, db_factory, low, high, batch_size) for low, high in pending]
+        for future in concurrent.futures.as_completed(futures):
+            low, high, rows, discrepancies = future.result()
+            if not discrepancies.empty:
+                discrepancies.to_csv(output, mode='a', index=False, header=not os.path.exists(output),
+                                     encoding='utf-8')
+
+            state['done'].append([low, high])
+            state['rows'] += rows
+            state['discrepancies'] += len(discrepancies)
+            state['seconds'] = elapsed + time.perf_counter() - started
+            if checkpoint:
+                _save_checkpoint(checkpoint, state)
+            print(f"商品 {low}-{high}: {rows} 行记录，{len(discrepancies)} 个差异 "
+                  f"（{len(state['done'])}/{len(ranges)}，累计 {state['rows'] / max(state['seconds'], 1e-9):,.0f} 行/秒）")
+
+    # 全部完成后删除进度文件，下次运行重新核对
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {
+        'ranges': len(ranges),
+        'rows': state['rows'],
+        'discrepancies': state['discrepancies'],
+        'seconds': state['seconds'],
+        'rows_per_second': state['rows'] / max(state['seconds'], 1e-9),
+    }
@@ -0,0 +1,27 @@
+"""页面注册表：每个菜单功能是一个独立模块，选中时才导入并运行其render(db)
+
+菜单与权限见warehouse_core.MENU_OPTIONS和ROLE_MENUS；新增菜单功能时在两处同时登记。
+"""
+import importlib
+import sys
+
+PAGES = {  # (功能分类, 操作) -> 页面模块名
+    ("商品管理", "商品信息"): 'products',
+    ("商品管理", "新增商品"): 'product_new',
+    ("入库管理", "入库记录"): 'stock_in_records',
+    ("入库管理", "新增入库"): 'stock_in_new',
+    ("出库管理", "出库记录"): 'stock_out_records',
+    ("出库管理", "新增出库"): 'stock_out_new',
+    ("库存管理", "当前库存"): 'inventory',
+    ("库存管理", "出入库趋势"): 'trends',
+    ("系统管理", "用户管理"): 'users',
+    ("系统管理", "系统日志"): 'logs',
+    ("系统管理", "性能监控"): 'performance',
+}
+
+
+def load_page(category, option):
+    """导入所选功能的页面模块，返回 (render函数, 本次是否第一次导入)"""
+    name = f"{__name__}.{PAGES[(category, option)]}"
+    imported = name not in sys.modules
+    return importlib.import_module(name).render, imported
@@ -0,0 +1,187 @@
+"""各页面共用的组件：记录筛选、商品选择、批量出入库、分页表格、实时刷新与导出"""
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from warehouse_core import (EXPORT_FORMATS, EXPORT_UI_MAX_ROWS, LOW_STOCK_STYLE, TAIL_POLL_INTERVAL, TAIL_WINDOW,
+                            _export_file_name, export_records, get_record_tails)
+
+
+def record_filters(key, db, product=True, operator='operator_id', party=None):
+    """显示记录筛选条件，返回传给分页查询的筛选参数
+
+    party为 (参数名, 显示名称)，例如 ('supplier', '供应商')，按前缀匹配
+    """
+    filters = {}
+    with st.expander("筛选条件"):
+        col1, col2 = st.columns(2)
+        if col1.checkbox("按日期筛选", key=f"{key}_by_date"):
+            filters['start'] = col1.date_input("开始日期", key=f"{key}_start")
+            filters['end'] = col2.date_input("结束日期", key=f"{key}_end")
+
+        if product:
+            filters['product_id'] = product_picker(f"{key}_product", db, allow_all=True, container=col1)
+
+        if operator:
+            users = db.get_users()
+            if users is not None and not users.empty:
+                names = dict(zip(users['用户编号'].tolist(), users['用户名'].tolist()))
+                filters[operator] = col2.selectbox(
+                    "操作员", [None] + list(names), key=f"{key}_operator",
+                    format_func=lambda uid: "全部" if uid is None else names[uid])
+
+        if party:
+            name, label = party
+            filters[name] = col1.text_input(f"{label}（前缀匹配）", key=f"{key}_party").strip() or None
+    return filters
+
+
+def product_picker(key, db, label="选择商品", ids=None, allow_all=False, container=st):
+    """按名称或规格型号搜索并选择商品，返回商品编号
+
+    ids不为None时只能选择其中的商品；allow_all为True时可选择"全部"并返回None。
+    需放在st.form之外，输入搜索词后立即刷新候选列表。
+    """
+    query = container.text_input(f"{label}（输入名称或规格型号搜索）", key=f"{key}_search")
+    options = db.search_products(query, ids=ids)
+    if allow_all:
+        options = [None] + options
+    if not options:
+        container.info("没有匹配的商品")
+        return None
+    return container.selectbox(
+        label, options, key=f"{key}_id",
+        format_func=lambda pid: "全部" if pid is None else db.product_label(pid))
+
+
+def render_bulk_upload(db, kind):
+    """显示批量出入库的文件上传、校验与导入，kind为'入库'或'出库'"""
+    party_column = '供应商' if kind == '入库' else '客户名称'
+    st.subheader(f"批量{kind}")
+    template = pd.DataFrame(columns=['商品编号', '数量', party_column]).to_csv(index=False)
+    st.download_button("下载模板", template.encode('utf-8-sig'), file_name=f"批量{kind}模板.csv", mime='text/csv')
+
+    uploaded = st.file_uploader(f"上传{kind}文件（CSV或Excel）", type=['csv', 'xlsx'], key=f"bulk_{kind}")
+    if uploaded is None:
+        return
+
+    if uploaded.name.lower().endswith('.xlsx'):
+        frame = pd.read_excel(uploaded)
+    else:
+        frame = pd.read_csv(uploaded)
+    st.write(f"共 {len(frame)} 行，预览前10行：")
+    st.dataframe(frame.head(10))
+
+    continue_on_error = st.checkbox("跳过出错的行，其余行照常写入", value=True, key=f"bulk_{kind}_skip")
+    if st.button(f"开始批量{kind}", key=f"bulk_{kind}_submit"):
+        method = db.bulk_stock_in if kind == '入库' else db.bulk_stock_out
+        start = time.perf_counter()
+        try:
+            written, errors = method(frame, st.session_state['user_id'], continue_on_error=continue_on_error)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        elapsed = time.perf_counter() - start
+
+        if written:
+            st.success(f"成功写入 {written} 行，用时 {elapsed:.2f} 秒")
+            db.log_action(f"批量{kind}", f"批量{kind}: {written} 行，文件 {uploaded.name}",
+                          st.session_state['user_id'])
+        if not errors.empty:
+            st.error(f"{len(errors)} 行未写入：")
+            st.dataframe(errors)
+
+
+FRAME_PAGE_SIZE = 200  # 大表格每页显示的行数
+
+
+def render_frame_page(frame, key, highlight=None, page_size=FRAME_PAGE_SIZE):
+    """分页显示表格，只对当前页的行按预先计算的highlight掩码设置样式"""
+    pages = max(1, -(-len(frame) // page_size))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"页码（共 {pages} 页，{len(frame)} 行）", min_value=1, max_value=pages,
+                               value=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    view = frame.iloc[start:start + page_size]
+
+    if highlight is not None and highlight[start:start + page_size].any():
+        styles = np.where(highlight[start:start + page_size], LOW_STOCK_STYLE, '')
+        cell_styles = np.repeat(styles[:, None], view.shape[1], axis=1)
+        st.dataframe(view.style.apply(lambda _: cell_styles, axis=None))
+    else:
+        st.dataframe(view)
+
+
+def render_live_tail(key, db, table, columns, empty_message):
+    """实时刷新模式：显示记录表最近的记录，按轮询间隔自动重新运行页面；未开启时返回False"""
+    if not st.checkbox("实时刷新", key=f"{key}_live",
+                       help=f"每 {TAIL_POLL_INTERVAL} 秒读取新增记录，显示最近 {TAIL_WINDOW} 条，不应用筛选条件"):
+        return False
+
+    frame, new_rows = get_record_tails()[table].refresh(db)
+    if frame is None or frame.empty:
+        st.info(empty_message)
+    else:
+        st.caption(f"最近 {len(frame)} 条，本次新增 {new_rows} 条，更新于 {datetime.now():%H:%M:%S}")
+        render_frame_page(frame[columns], f"{key}_live")
+    time.sleep(TAIL_POLL_INTERVAL)
+    st.experimental_rerun()
+    return True
+
+
+def render_export(key, db, table, filters):
+    """按当前筛选条件导出记录明细：先流式写入临时文件，再提供下载"""
+    with st.expander("导出数据"):
+        fmt = st.radio("文件格式", list(EXPORT_FORMATS), key=f"{key}_export_format", horizontal=True,
+                       format_func=lambda f: "CSV（gzip压缩）" if f == 'csv' else "Parquet")
+        if not st.button("生成导出文件", key=f"{key}_export"):
+            return
+
+        with tempfile.TemporaryFile() as f:
+            try:
+                with st.spinner("正在导出..."):
+                    rows, truncated = export_records(db, table, f, fmt, max_rows=EXPORT_UI_MAX_ROWS, **filters)
+            except Exception as e:
+                st.error(f"导出失败: {str(e)}")
+                return
+            f.seek(0)
+            data = f.read()
+
+        db.log_action('数据导出', f"导出{table}: {rows}行", st.session_state['user_id'])
+        if truncated:
+            st.warning(f"超过 {EXPORT_UI_MAX_ROWS} 行，只导出了前 {rows} 行；更大的范围请使用命令行导出")
+        st.download_button(f"下载（{rows} 行，{len(data) / 1024 / 1024:.1f} MB）", data,
+                           file_name=_export_file_name(table, fmt, EXPORT_FORMATS[fmt]),
+                           key=f"{key}_download")
+
+
+def render_record_page(key, fetch_page, filters, display, empty_message):
+    """按游标分页显示记录，只读取和渲染当前页"""
+    state_key = f"{key}_pager"
+    pager = st.session_state.get(state_key)
+    if pager is None or pager['filters'] != filters:
+        # 筛选条件变化后回到第一页
+        pager = {'filters': filters, 'cursors': [None]}
+        st.session_state[state_key] = pager
+
+    page, next_cursor = fetch_page(cursor=pager['cursors'][-1], **filters)
+    if page is None:
+        st.error("读取记录失败，请稍后重试")
+    elif page.empty:
+        st.info(empty_message)
+    else:
+        st.dataframe(display(page))
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    if col1.button("上一页", key=f"{key}_prev", disabled=len(pager['cursors']) == 1):
+        pager['cursors'].pop()
+        st.experimental_rerun()
+    if col2.button("下一页", key=f"{key}_next", disabled=next_cursor is None):
+        pager['cursors'].append(next_cursor)
+        st.experimental_rerun()
+    col3.write(f"第 {len(pager['cursors'])} 页")
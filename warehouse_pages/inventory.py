@@ -0,0 +1,48 @@
+"""库存管理/当前库存：库存预警、库存表与库存分析图表"""
+import streamlit as st
+
+from warehouse_core import classify_stock_status
+from warehouse_pages.components import render_frame_page
+
+
+def render(db):
+    """显示当前库存情况"""
+    st.subheader("当前库存情况")
+    inventory = db.get_inventory()
+    if inventory is None:
+        st.error("读取库存失败，请稍后重试")
+        return
+
+    if not inventory.empty:
+        # 添加库存状态
+        inventory['库存状态'] = classify_stock_status(inventory)
+
+        # 库存预警
+        low_stock = inventory[inventory['库存状态'] != "充足"]
+        if not low_stock.empty:
+            st.warning("以下商品库存需要关注:")
+            render_frame_page(low_stock[['商品名称', '当前库存量', '安全库存', '库存状态']], 'low_stock')
+
+        # 显示所有库存
+        render_frame_page(inventory[['商品名称', '单位', '当前库存量', '安全库存', '库存状态']],
+                          'inventory')
+
+        # 库存分析图表
+        st.subheader("库存分析")
+
+        # 库存状态分布
+        status_counts = inventory['库存状态'].value_counts().reset_index()
+        status_counts.columns = ['库存状态', '商品数量']
+        st.bar_chart(status_counts.set_index('库存状态'))
+
+        # 库存量TOP10
+        st.subheader("库存量TOP10")
+        top10 = inventory.nlargest(10, '当前库存量')
+        st.bar_chart(top10.set_index('商品名称')['当前库存量'])
+
+        # 库存量BOTTOM10
+        st.subheader("库存量BOTTOM10")
+        bottom10 = inventory.nsmallest(10, '当前库存量')
+        st.bar_chart(bottom10.set_index('商品名称')['当前库存量'])
+    else:
+        st.info("没有库存数据")
@@ -0,0 +1,16 @@
+"""系统管理/系统日志：按条件分页查询、实时刷新与导出"""
+import streamlit as st
+
+from warehouse_core import LOG_COLUMNS, LOG_HOT_MONTHS
+from warehouse_pages.components import record_filters, render_export, render_live_tail, render_record_page
+
+
+def render(db):
+    """显示系统操作日志"""
+    st.subheader("系统操作日志")
+    st.caption(f"默认查询最近 {LOG_HOT_MONTHS} 个月的日志，按日期筛选更早的范围时会同时查询归档")
+    if not render_live_tail('logs', db, '系统日志', LOG_COLUMNS, "没有日志记录"):
+        filters = record_filters('logs', db, product=False, operator='user_id')
+        render_record_page('logs', db.get_logs_page, filters,
+                           lambda logs: logs[LOG_COLUMNS], "没有日志记录")
+        render_export('logs', db, '系统日志', filters)
@@ -0,0 +1,61 @@
+"""系统管理/性能监控：最慢的查询和页面、启动耗时、导出与组件状态"""
+import streamlit as st
+
+from warehouse_core import PERF_TOP_N
+
+
+def render(db):
+    """显示最慢的查询和页面、启动与重新运行耗时、导出性能统计以及各组件的运行状态"""
+    st.subheader("性能监控")
+    if db.metrics is None:
+        st.info("性能监控未开启（环境变量 WAREHOUSE_PERF_MONITOR=0）")
+        return
+    metrics = db.metrics
+
+    order_by = st.radio("排序方式", ['p95', 'total', 'count'], horizontal=True, key="perf_order",
+                        format_func={'p95': "p95耗时", 'total': "总耗时", 'count': "次数"}.get)
+    st.markdown(f"**最慢查询（前{PERF_TOP_N}个）**")
+    queries = metrics.summary('query', top=PERF_TOP_N, order_by=order_by)
+    if queries.empty:
+        st.info("还没有查询记录")
+    else:
+        st.dataframe(queries)
+    st.markdown(f"**页面渲染（前{PERF_TOP_N}个）**")
+    pages = metrics.summary('page', top=PERF_TOP_N, order_by=order_by)
+    if pages.empty:
+        st.info("还没有页面渲染记录")
+    else:
+        st.dataframe(pages)
+    st.markdown("**启动与重新运行**")
+    st.caption("冷启动为进程第一次运行页面脚本，会话首次渲染为新会话打开页面到第一次显示完成；"
+               "页面模块导入只在本进程第一次打开该页面时记录")
+    startup = metrics.summary('startup', order_by=order_by)
+    if startup.empty:
+        st.info("还没有启动记录")
+    else:
+        st.dataframe(startup)
+
+    col1, col2, col3 = st.columns(3)
+    col1.download_button("导出Prometheus格式", metrics.to_prometheus(), file_name="warehouse_metrics.prom",
+                         mime="text/plain", key="perf_prometheus")
+    col2.download_button("导出JSON", metrics.to_json(), file_name="warehouse_metrics.json",
+                         mime="application/json", key="perf_json")
+    if col3.button("清空统计", key="perf_reset"):
+        metrics.reset()
+        st.experimental_rerun()
+
+    with st.expander("数据表内存占用"):
+        st.caption("读取各数据表，比较原始类型与紧凑类型（32位整数、分类、时间类型）的内存占用；大表读取较慢")
+        if st.button("统计内存占用", key="perf_memory"):
+            st.dataframe(db.memory_report())
+
+    with st.expander("组件状态"):
+        components = {
+            "主库连接池": db.pool, "主库熔断器": db.breaker, "副本连接池": db.replica_pool, "副本监测": db.replica_monitor,
+            "查询缓存": db.cache, "登录缓存": db.auth_cache, "日志写入线程": db.audit_writer,
+            "库存台账": db.ledger, "商品索引": db.product_index, "出入库汇总": db.rollup,
+        }
+        for name, component in components.items():
+            if component is not None:
+                st.markdown(f"**{name}**")
+                st.json(component.stats())
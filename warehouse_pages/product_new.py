@@ -0,0 +1,32 @@
+"""商品管理/新增商品"""
+import time
+
+import streamlit as st
+
+
+def render(db):
+    """显示新增商品表单"""
+    st.subheader("新增商品")
+    with st.form("新增商品表单"):
+        name = st.text_input("商品名称", max_chars=100)
+        spec = st.text_input("规格型号", max_chars=50)
+        unit = st.text_input("单位", max_chars=20)
+        category = st.number_input("分类编号", min_value=1)
+        safety_stock = st.number_input("安全库存", min_value=0)
+
+        if st.form_submit_button("添加商品"):
+            if name and unit:
+                with db.transaction() as tx:
+                    result = db.add_product(name, spec, unit, category, safety_stock)
+                    if result == 1:
+                        # 记录日志
+                        db.log_action('商品添加', f"添加商品: {name}", st.session_state['user_id'])
+
+                if result == 1 and tx.committed:
+                    st.success("商品添加成功！")
+                    time.sleep(1)
+                    st.experimental_rerun()
+                else:
+                    st.error("添加失败")
+            else:
+                st.warning("请填写必填字段（商品名称和单位）")
@@ -0,0 +1,69 @@
+"""商品管理/商品信息：商品列表（标记低库存）与管理员编辑商品"""
+import time
+
+import streamlit as st
+
+from warehouse_core import low_stock_mask
+from warehouse_pages.components import product_picker, render_frame_page
+
+
+def render(db):
+    """显示商品列表，管理员可编辑商品信息"""
+    st.subheader("商品信息管理")
+    products = db.get_products()
+    if products is None:
+        st.error("读取商品信息失败，请稍后重试")
+        return
+
+    if not products.empty:
+        # 添加库存信息
+        inventory = db.get_inventory()
+        if inventory is not None and not inventory.empty:
+            products = products.merge(inventory[['商品编号', '当前库存量']], on='商品编号', how='left')
+
+        # 标记低库存商品，只对当前页设置样式
+        highlight = low_stock_mask(products) if '当前库存量' in products else None
+        render_frame_page(products, 'products', highlight)
+
+        # 编辑功能（仅管理员）
+        if st.session_state['role'] == '管理员':
+            st.markdown("---")
+            st.subheader("编辑商品信息")
+
+            selected_id = product_picker('edit_product', db, "选择商品编辑")
+            product_details = None if selected_id is None else db.get_product(selected_id)
+            if product_details is not None:
+                selected_product = product_details['商品名称']
+
+                with st.form("编辑商品表单"):
+                    st.write(f"编辑商品: **{selected_product}**")
+                    new_name = st.text_input("商品名称", value=product_details['商品名称'])
+                    new_spec = st.text_input("规格型号", value=product_details['规格型号'])
+                    new_unit = st.text_input("单位", value=product_details['单位'])
+                    new_category = st.number_input("分类编号", min_value=1, value=product_details['分类编号'])
+                    new_safety = st.number_input("安全库存", min_value=0, value=product_details['安全库存'])
+
+                    if st.form_submit_button("更新商品"):
+                        if new_name:
+                            # 更新与日志在同一工作单元中提交
+                            with db.transaction() as tx:
+                                result = db.update_product(
+                                    selected_id,
+                                    new_name, new_spec, new_unit,
+                                    new_category, new_safety
+                                )
+                                if result == 1:
+                                    # 记录日志
+                                    db.log_action('商品修改', f"修改商品: {selected_product}",
+                                                  st.session_state['user_id'])
+
+                            if result == 1 and tx.committed:
+                                st.success("商品信息更新成功！")
+                                time.sleep(1)
+                                st.experimental_rerun()
+                            else:
+                                st.error("更新失败")
+                        else:
+                            st.warning("商品名称不能为空")
+    else:
+        st.info("没有商品数据")
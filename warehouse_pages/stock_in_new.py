@@ -0,0 +1,44 @@
+"""入库管理/新增入库：单条入库与批量入库"""
+import time
+
+import streamlit as st
+
+from warehouse_pages.components import product_picker, render_bulk_upload
+
+
+def render(db):
+    """显示入库表单和批量入库"""
+    st.subheader("新增入库记录")
+    products = db.get_products()
+    if products is None:
+        st.error("读取商品信息失败，请稍后重试")
+        return
+
+    if not products.empty:
+        product_id = product_picker('stock_in_product', db)
+
+        with st.form("入库表单"):
+            quantity = st.number_input("入库数量", min_value=1, value=1)
+            supplier = st.text_input("供应商")
+
+            if st.form_submit_button("提交入库"):
+                if product_id is None:
+                    st.warning("请选择商品")
+                else:
+                    result = db.stock_in(
+                        product_id,
+                        quantity,
+                        st.session_state['user_id'],
+                        supplier
+                    )
+                    if result == 1:
+                        st.success("入库记录添加成功！")
+                        time.sleep(1)
+                        st.experimental_rerun()
+                    else:
+                        st.error("入库失败")
+
+        st.markdown("---")
+        render_bulk_upload(db, '入库')
+    else:
+        st.warning("请先添加商品")
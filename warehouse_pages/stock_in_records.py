@@ -0,0 +1,17 @@
+"""入库管理/入库记录：按条件分页查询、实时刷新与导出"""
+import streamlit as st
+
+from warehouse_core import STOCK_IN_COLUMNS
+from warehouse_pages.components import record_filters, render_export, render_live_tail, render_record_page
+
+
+def render(db):
+    """显示入库记录查询"""
+    st.subheader("入库记录查询")
+    if not render_live_tail('stock_in', db, '入库记录', STOCK_IN_COLUMNS, "没有入库记录"):
+        filters = record_filters('stock_in', db, party=('supplier', '供应商'))
+
+        # 显示入库记录（商品名称和操作员已在查询中连接）
+        render_record_page('stock_in', db.get_stock_in_records_page, filters,
+                           lambda records: records[STOCK_IN_COLUMNS], "没有入库记录")
+        render_export('stock_in', db, '入库记录', filters)
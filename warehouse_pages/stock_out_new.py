@@ -0,0 +1,61 @@
+"""出库管理/新增出库：单条出库与批量出库"""
+import time
+
+import streamlit as st
+
+from warehouse_pages.components import product_picker, render_bulk_upload
+
+
+def render(db):
+    """显示出库表单和批量出库"""
+    st.subheader("新增出库记录")
+    inventory = db.get_inventory()
+    if inventory is None:
+        st.error("读取库存失败，请稍后重试")
+        return
+
+    if not inventory.empty:
+        # 过滤掉库存为0的商品
+        available_products = inventory[inventory['当前库存量'] > 0]
+
+        if available_products.empty:
+            st.warning("没有可出库的商品")
+        else:
+            product_id = product_picker('stock_out_product', db,
+                                        ids=available_products['商品编号'].tolist())
+            product = None if product_id is None else db.get_product(product_id)
+            max_quantity = None if product is None else db.get_stock_level(product_id)
+            if product_id is not None and max_quantity is None:
+                st.error("读取商品库存失败，请稍后重试")
+            elif product_id is not None:
+                product_name = product['商品名称']
+
+                with st.form("出库表单"):
+                    quantity = st.number_input("出库数量", min_value=1, max_value=max_quantity, value=1)
+                    customer = st.text_input("客户名称")
+
+                    if st.form_submit_button("提交出库"):
+                        # 出库与日志在同一工作单元中提交
+                        with db.transaction() as tx:
+                            result = db.stock_out(
+                                product_id,
+                                quantity,
+                                st.session_state['user_id'],
+                                customer
+                            )
+                            if result == 1:
+                                # 记录日志
+                                db.log_action('出库', f"出库: {quantity}个 {product_name} 给 {customer}",
+                                              st.session_state['user_id'])
+
+                        if result == 1 and tx.committed:
+                            st.success("出库记录添加成功！")
+                            time.sleep(1)
+                            st.experimental_rerun()
+                        else:
+                            st.error("出库失败")
+
+            st.markdown("---")
+            render_bulk_upload(db, '出库')
+    else:
+        st.warning("没有库存数据")
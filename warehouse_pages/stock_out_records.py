@@ -0,0 +1,17 @@
+"""出库管理/出库记录：按条件分页查询、实时刷新与导出"""
+import streamlit as st
+
+from warehouse_core import STOCK_OUT_COLUMNS
+from warehouse_pages.components import record_filters, render_export, render_live_tail, render_record_page
+
+
+def render(db):
+    """显示出库记录查询"""
+    st.subheader("出库记录查询")
+    if not render_live_tail('stock_out', db, '出库记录', STOCK_OUT_COLUMNS, "没有出库记录"):
+        filters = record_filters('stock_out', db, party=('customer', '客户名称'))
+
+        # 显示出库记录（商品名称和操作员已在查询中连接）
+        render_record_page('stock_out', db.get_stock_out_records_page, filters,
+                           lambda records: records[STOCK_OUT_COLUMNS], "没有出库记录")
+        render_export('stock_out', db, '出库记录', filters)
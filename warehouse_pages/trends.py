@@ -0,0 +1,41 @@
+"""库存管理/出入库趋势：均来自每日出入库汇总"""
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from warehouse_core import ROLLUP_TOP_K, ROLLUP_TREND_DAYS
+
+
+def render(db):
+    """显示出入库趋势、分类汇总和商品排行（均来自每日出入库汇总）"""
+    st.subheader("出入库趋势")
+    col1, col2 = st.columns(2)
+    end = col2.date_input("结束日期", value=datetime.now().date(), key="trend_end")
+    start = col1.date_input("开始日期", value=end - timedelta(days=ROLLUP_TREND_DAYS - 1), key="trend_start")
+    if start > end:
+        st.warning("开始日期不能晚于结束日期")
+        return
+
+    daily = db.get_daily_movements(start, end)
+    if daily is None:
+        st.error("读取出入库汇总失败")
+        return
+    if db.rollup.stats()['behind']:
+        st.info("出入库汇总尚未补齐历史记录，图表可能不完整；请管理员运行 python warehouse_cli.py rollup")
+    if daily.empty:
+        st.info("所选日期范围内没有出入库记录")
+        return
+
+    st.line_chart(daily.set_index('日期')[['入库数量', '出库数量']])
+
+    st.subheader("按分类汇总")
+    categories = db.get_category_movements(start, end)
+    if categories is not None and not categories.empty:
+        st.bar_chart(categories.set_index('分类编号')[['入库数量', '出库数量']])
+
+    col1, col2 = st.columns(2)
+    for col, by in ((col1, '出库数量'), (col2, '入库数量')):
+        col.subheader(f"{by}TOP{ROLLUP_TOP_K}")
+        top = db.get_top_movers(start, end, by=by)
+        if top is not None and not top.empty:
+            col.bar_chart(top.set_index('商品名称')[by])
@@ -0,0 +1,47 @@
+"""系统管理/用户管理：用户列表与添加用户"""
+import time
+
+import streamlit as st
+
+
+def render(db):
+    """显示用户列表和添加用户表单"""
+    st.subheader("用户管理")
+    users = db.get_users()
+    if users is None:
+        st.error("读取用户失败，请稍后重试")
+        return
+
+    if not users.empty:
+        st.dataframe(users[['用户名', '角色']])
+
+        # 添加用户
+        st.subheader("添加新用户")
+        with st.form("添加用户表单"):
+            username = st.text_input("用户名")
+            password = st.text_input("密码", type="password")
+            confirm_password = st.text_input("确认密码", type="password")
+            role = st.selectbox("角色", ['管理员', '经理', '操作员'])
+
+            if st.form_submit_button("添加用户"):
+                if username and password:
+                    if password != confirm_password:
+                        st.error("两次输入的密码不一致")
+                    else:
+                        with db.transaction() as tx:
+                            result = db.add_user(username, password, role)
+                            if result == 1:
+                                # 记录日志
+                                db.log_action('用户添加', f"添加用户: {username}",
+                                              st.session_state['user_id'])
+
+                        if result == 1 and tx.committed:
+                            st.success("用户添加成功！")
+                            time.sleep(1)
+                            st.experimental_rerun()
+                        else:
+                            st.error("添加失败")
+                else:
+                    st.warning("请填写用户名和密码")
+    else:
+        st.info("没有用户数据")